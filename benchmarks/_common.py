@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+#
+""" Shared setup of the benchmark scripts """
+
+import os
+import sys
+import time
+
+# benchmark the source tree rather than the installed package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import speaking_clock_detection as scd
+
+def timed(func, *args, **kwargs):
+    """ return func result, wall time and CPU time (including children) """
+    t0, c0 = time.time(), sum(os.times()[:4])
+    ret = func(*args, **kwargs)
+    return ret, time.time() - t0, sum(os.times()[:4]) - c0
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+""" Comparison of two result files of bench_suite.py
+
+For each (media, configuration) run of both files, print the ratio of new
+to old throughput (above 1 when faster) and of peak RSS (above 1 when
+larger), and the ratio of the CPU time of each stage (above 1 when slower).
+Verdicts that changed are reported as well.
+Exits with a non-zero status if a throughput dropped, or a peak RSS grew,
+by more than the threshold, or if a verdict became wrong.
+"""
+
+import sys
+import json
+import argparse
+
+
+def ratio(new, old):
+    """ new / old, None if unknown """
+    if new is None or not old:
+        return None
+    return new / old
+
+def fmt(value):
+    return '%.3f' % value if value is not None else '-'
+
+def stage_cpu(stage):
+    return stage['cpu'] + stage['child_cpu']
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('old', type=argparse.FileType('r'), help='reference results')
+    parser.add_argument('new', type=argparse.FileType('r'), help='new results')
+    parser.add_argument('-t', '--threshold', default=0.1, type=float,
+                        help='relative change considered as a regression')
+    parser.add_argument('--stages', action='store_true', help='print stage ratios')
+    args = parser.parse_args()
+
+    old, new = json.load(args.old), json.load(args.new)
+    print('old: %s%s, new: %s%s' % (old['environment']['commit'],
+                                    ' (dirty)' if old['environment']['dirty'] else '',
+                                    new['environment']['commit'],
+                                    ' (dirty)' if new['environment']['dirty'] else ''))
+    old_runs = {(r['media'], r['config']): r for r in old['runs']}
+
+    regressions = 0
+    # CPU times of the runs of both files
+    old_cpu = new_cpu = 0.
+    print('%-60s %-26s %10s %8s %s' % ('media', 'config', 'throughput', 'RSS', 'status'))
+    for run in new['runs']:
+        key = (run['media'], run['config'])
+        if key not in old_runs:
+            continue
+        ref = old_runs.pop(key)
+        old_cpu += ref['cpu'] + ref['child_cpu']
+        new_cpu += run['cpu'] + run['child_cpu']
+        speedup = ratio(run['throughput'], ref['throughput'])
+        growth = ratio(run['max_rss'], ref['max_rss'])
+        status = []
+        if speedup is not None and speedup < 1 - args.threshold:
+            status.append('SLOWER')
+        if growth is not None and growth > 1 + args.threshold:
+            status.append('LARGER')
+        if ref['correct'] and not run['correct']:
+            status.append('WRONG (%s)' % run['verdict'])
+        elif run['correct'] and not ref['correct']:
+            status.append('FIXED')
+        regressions += len([s for s in status if s != 'FIXED'])
+        print('%-60s %-26s %10s %8s %s' % (run['media'], run['config'], fmt(speedup), fmt(growth),
+                                           ' '.join(status)))
+        if args.stages:
+            for name, stage in run['stages'].items():
+                if name in ref['stages']:
+                    print('    %-13s cpu %s' % (name, fmt(ratio(stage_cpu(stage),
+                                                                stage_cpu(ref['stages'][name])))))
+    if old_runs:
+        print('%d runs missing from new results' % len(old_runs))
+    print('throughput ratio of the runs of both files: %s' % fmt(ratio(old_cpu, new_cpu)))
+    print('%d regressions' % regressions)
+    sys.exit(regressions > 0)
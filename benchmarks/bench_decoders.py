@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+""" Benchmark of speaking clock detection decoder backends
+
+Decode the same media files with each available decoder backend, both as a
+whole and block by block, and report wall time, CPU time and decoding speed
+(seconds of media decoded per second).
+"""
+
+import os.path
+import argparse
+
+from _common import scd, timed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('media', nargs='+', help='media files to decode')
+    parser.add_argument('-f', '--ffmpeg', default='ffmpeg', help='full path to ffmpeg binary')
+    parser.add_argument('-b', '--decoders', nargs='+', default=['ffmpeg', 'soundfile', 'pyav'],
+                        help='decoder backends to benchmark')
+    args = parser.parse_args()
+
+    print('%-30s %-10s %-7s %10s %10s %10s' % ('media', 'decoder', 'mode', 'wall (s)', 'cpu (s)', 'speed (x)'))
+    for media in args.media:
+        for name in args.decoders:
+            decoder = scd.select_decoder(media, name, args.ffmpeg)
+            if not decoder.accepts(media):
+                continue
+            wav_data, wall, cpu = timed(scd.decode_media, media, ffmpeg=args.ffmpeg, decoder=name)
+            dur = len(wav_data) / 4000.
+            del wav_data
+            print('%-30s %-10s %-7s %10.3f %10.3f %10.1f' % (
+                os.path.basename(media)[-30:], name, 'whole', wall, cpu, dur / wall))
+            _, wall, cpu = timed(lambda: sum(len(block) for block in scd.iter_media_blocks(
+                media, args.ffmpeg, decoder=name)))
+            print('%-30s %-10s %-7s %10.3f %10.3f %10.1f' % (
+                os.path.basename(media)[-30:], name, 'blocks', wall, cpu, dur / wall))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+""" Benchmark and validation of frame energy computation methods
+
+Compute the energy around 1000Hz and the total energy of each frame of each
+channel of a set of media files, both with the full spectrogram ('fft') and
+with each other method: the 1000Hz DFT bins and Parseval bound ('dft'), or
+the 1000Hz band power gate ('gated'). Report frames processed per second by
+each method, the fraction of frames whose energies were computed exactly,
+the fraction of frames gated out, and the agreement of frame-level
+decisions (energy ratio > 0.5) and of detected bips. The approximate
+'baseband' method is checked by check_baseband.py instead.
+Exits with a non-zero status if a decision or a bip differs.
+"""
+
+import sys
+import os.path
+import argparse
+import numpy as np
+
+from _common import scd, timed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('media', nargs='+', help='media files to analyze')
+    parser.add_argument('-f', '--ffmpeg', default='ffmpeg', help='full path to ffmpeg binary')
+    parser.add_argument('-b', '--decoder', default='ffmpeg', help='decoder backend')
+    parser.add_argument('-p', '--precision', default='float64', help='numerical precision')
+    parser.add_argument('-x', '--features', default=['dft', 'gated'],
+                        type=lambda a: a.split(','),
+                        help='comma separated methods compared with fft')
+    args = parser.parse_args()
+
+    winlen = int(scd.WIN_SEC * 4000)
+    step = int(scd.STEP_SEC * 4000)
+    nerrors = 0
+    print('%-30s %7s %9s %11s %7s %11s %7s %7s %9s %5s' % (
+        'media', 'channel', 'frames', 'fft (fr/s)', 'method', 'fr/s', 'exact', 'gated',
+        'agreement', 'bips'))
+    for media in args.media:
+        wav_data = scd.decode_media(media, ffmpeg=args.ffmpeg, decoder=args.decoder,
+                                    precision=args.precision)
+        for i in range(wav_data.shape[1]):
+            data = scd.preemp(wav_data[:, i], scd.PREEMP_FACT)
+            (fft_1000hz, fft_all), tfft, _ = timed(scd.bip_frame_energies, data, winlen, step,
+                                                   winlen, 'fft')
+            fft_cand = fft_1000hz / fft_all > 0.5
+            fft_bips = scd.wavdata2bip(wav_data[:, i], 'fft')
+            nframes = len(fft_all)
+            for features in args.features:
+                if features == 'gated':
+                    (e1000, eall, gated), t, _ = timed(scd.gated_frame_energies, data, winlen,
+                                                       step, winlen, return_gated=True)
+                else:
+                    (e1000, eall), t, _ = timed(scd.bip_frame_energies, data, winlen, step,
+                                                winlen, features)
+                    gated = 0.
+                cand = e1000 / eall > 0.5
+                # frames computed exactly have the same energies with both methods
+                nexact = np.sum((fft_1000hz == e1000) & (fft_all == eall))
+                agreement = np.mean(fft_cand == cand)
+                same = (agreement == 1 and np.array_equal(fft_all[fft_cand], eall[cand])
+                        and np.array_equal(fft_bips, scd.wavdata2bip(wav_data[:, i], features)))
+                nerrors += not same
+                print('%-30s %7d %9d %11.0f %7s %11.0f %6.1f%% %6.1f%% %8.4f%% %5s' % (
+                    os.path.basename(media)[-30:], i, nframes, nframes / tfft, features,
+                    nframes / t, 100. * nexact / nframes, 100. * gated, 100. * agreement,
+                    'same' if same else 'DIFF'))
+    sys.exit(nerrors > 0)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+""" End-to-end benchmark suite on a synthetic speaking clock corpus
+
+Generate a synthetic corpus (see synthetic.py), or reuse the media already
+generated in the corpus directory, and detect the speaking clock of each
+media with each configuration: DECODE:FEATURES:PRECISION[:DECODER], such as
+pipe:fft:float64:ffmpeg (see speaking_clock_detection --help).
+Each detection runs in a new process, so that its peak resident set size is
+its own, and is profiled (see speaking_clock_detection.Profile).
+Results are written as a JSON document holding the environment (commit,
+versions, platform) and, for each run: throughput in seconds of audio per
+CPU second (ffmpeg included), real time factor, wall and CPU times, peak
+RSS, correctness of the verdict, and wall time, CPU time and peak RSS of
+each stage. Results of two commits can be compared with bench_compare.py.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import numpy as np
+import scipy
+import soundfile
+
+from _common import scd
+from synthetic import PROGRAMS, generate_corpus, float_list
+
+DEFAULT_CONFIGS = ['pipe:fft:float64:ffmpeg', 'stream:fft:float64:ffmpeg',
+                   'pipe:dft:float32:ffmpeg', 'pipe:gated:float32:ffmpeg']
+
+def parse_config(config):
+    """ detect keyword arguments of a DECODE:FEATURES:PRECISION[:DECODER] configuration """
+    fields = config.split(':')
+    if len(fields) not in (3, 4):
+        raise ValueError('invalid configuration %s' % config)
+    decoder = fields[3] if len(fields) == 4 else 'ffmpeg'
+    return dict(decode=fields[0], features=fields[1], precision=fields[2], decoder=decoder)
+
+def run_case(case):
+    """ profiled detection of a media, in the current process """
+    options = parse_config(case['config'])
+    with scd.Profile(memory=case['trace_memory'], rss=True) as profile:
+        result = scd.detect(case['media'], ffmpeg=case['ffmpeg'], **options)
+        result.stats
+    profile = profile.as_dict()
+    summary = result.as_dict()
+    cpu = profile['cpu'] + profile['child_cpu']
+    return {'media': os.path.basename(case['media']), 'config': case['config'],
+            'duration': result.duration, 'tracks': len(result.tracks),
+            'label': case['label'], 'verdict': summary['speaking_clock'] or summary['verdict'],
+            'correct': summary['speaking_clock'] == case['label'],
+            'confidence': summary['confidence'],
+            'throughput': round(result.duration / cpu, 3) if cpu > 0 else None,
+            'realtime': round(result.duration / profile['wall'], 3),
+            'wall': profile['wall'], 'cpu': profile['cpu'], 'child_cpu': profile['child_cpu'],
+            'max_rss': profile['max_rss'], 'child_max_rss': profile['child_max_rss'],
+            'stages': profile['stages'], 'counters': profile['counters']}
+
+def run_subprocess(case):
+    """ run_case in a new interpreter """
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', json.dumps(case)],
+                         stdout=subprocess.PIPE, check=True).stdout
+    return json.loads(out.decode())
+
+def command_output(cmd):
+    """ first line of the output of a command, None if it failed """
+    try:
+        return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              check=True).stdout.decode().split('\n')[0].strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment(ffmpeg):
+    """ description of the benchmarked code and of the machine """
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    status = command_output(['git', '-C', repo, 'status', '--porcelain', '--untracked-files=no'])
+    return {'commit': command_output(['git', '-C', repo, 'rev-parse', 'HEAD']),
+            'dirty': bool(status), 'version': scd.__version__,
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'scipy': scipy.__version__, 'soundfile': soundfile.__version__,
+            'ffmpeg': command_output([ffmpeg, '-version']), 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpus': os.cpu_count(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-o', '--output', default=sys.stdout, type=argparse.FileType('w'),
+                        help='output JSON file. Default value: stdout')
+    parser.add_argument('--corpus', default=os.path.join(tempfile.gettempdir(),
+                                                         'speaking_clock_benchmark'),
+                        help='directory of the synthetic corpus, generated if needed')
+    parser.add_argument('-d', '--durations', default=[30., 600., 3600.], type=float_list,
+                        help='comma separated durations in seconds (86400 for 24 hours)')
+    parser.add_argument('-p', '--programs', default=['noise', 'tones'],
+                        type=lambda a: a.split(','),
+                        help='comma separated programs of the channels without clock: %s, '
+                        'or media paths' % ', '.join(PROGRAMS))
+    parser.add_argument('-c', '--channels', default=2, type=int, help='amount of channels')
+    parser.add_argument('-r', '--samplerate', default=16000, type=int, help='sampling rate')
+    parser.add_argument('--no-negatives', action='store_true',
+                        help='do not analyze media without speaking clock')
+    parser.add_argument('--configs', default=DEFAULT_CONFIGS, type=lambda a: a.split(','),
+                        help='comma separated DECODE:FEATURES:PRECISION[:DECODER] '
+                        'configurations. Default: %s' % ','.join(DEFAULT_CONFIGS))
+    parser.add_argument('-n', '--repeat', default=1, type=int,
+                        help='runs of each case, the fastest one being kept')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='report peak traced memory of stages, slowing down processing')
+    parser.add_argument('-f', '--ffmpeg', default='ffmpeg', help='full path to ffmpeg binary')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_case(json.loads(args.run))))
+        sys.exit(0)
+
+    for config in args.configs:
+        parse_config(config)
+    print('generating corpus in %s' % args.corpus, file=sys.stderr)
+    corpus = generate_corpus(args.corpus, args.durations, args.programs, args.channels,
+                             args.samplerate, not args.no_negatives)
+
+    runs = []
+    print('%-60s %-26s %8s %9s %9s %8s %7s' % ('media', 'config', 'correct', 'audio/cpu',
+                                             'realtime', 'RSS (MB)', 'wall (s)'),
+          file=sys.stderr)
+    for media, label in corpus:
+        for config in args.configs:
+            case = dict(media=media, label=label, config=config, ffmpeg=args.ffmpeg,
+                        trace_memory=args.trace_memory)
+            results = [run_subprocess(case) for _ in range(args.repeat)]
+            run = min(results, key=lambda r: r['cpu'] + r['child_cpu'])
+            runs.append(run)
+            print('%-60s %-26s %8s %9.1f %9.1f %8.1f %7.2f' % (
+                run['media'], config, run['correct'], run['throughput'], run['realtime'],
+                run['max_rss'] / 2.**20 if run['max_rss'] else float('nan'), run['wall']),
+                  file=sys.stderr)
+
+    total_audio = sum(r['duration'] for r in runs)
+    total_cpu = sum(r['cpu'] + r['child_cpu'] for r in runs)
+    summary = {'runs': len(runs), 'correct': sum(r['correct'] for r in runs),
+               'audio': total_audio, 'cpu': round(total_cpu, 3),
+               'throughput': round(total_audio / total_cpu, 3) if total_cpu > 0 else None}
+    settings = {k: getattr(args, k) for k in ('durations', 'programs', 'channels', 'samplerate',
+                                              'configs', 'repeat', 'trace_memory')}
+    settings['negatives'] = not args.no_negatives
+    json.dump({'environment': environment(args.ffmpeg), 'settings': settings,
+               'summary': summary, 'runs': runs}, args.output, indent=1)
+    args.output.write('\n')
+    print('%d/%d correct verdicts, %.1f seconds of audio per CPU second' % (
+        summary['correct'], summary['runs'], summary['throughput'] or 0), file=sys.stderr)
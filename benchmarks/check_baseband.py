@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+""" Agreement of baseband envelope detection with the spectrogram method
+
+Detect the bips of each channel of a set of media files with frame energies
+computed from the spectrogram ('fft') and from the baseband envelopes of
+the 1000Hz band ('baseband'), and report the time spent computing frame
+energies with each method, the fraction of the bips of each method found
+by the other one (within 'tolerance' seconds), and the speaking clock
+verdict of each method. Overall agreement rates are printed at the end.
+Exits with a non-zero status if a verdict differs.
+The agreement on synthetic signals is checked in the test suite (see
+tests/test_dsp.py), this script extends it to real media.
+"""
+
+import sys
+import os.path
+import argparse
+import numpy as np
+
+from _common import scd
+
+
+def matched(bips, others, tolerance):
+    """ amount of bips having another bip less than 'tolerance' seconds away """
+    others = np.asarray(others)
+    return sum(1 for b in bips if len(others) and np.min(np.abs(others - b)) <= tolerance)
+
+def energies_time(wav_data, features):
+    """ bips of a channel, and CPU time spent computing its frame energies """
+    with scd.Profile(memory=False, rss=False) as profile:
+        bips = scd.wavdata2bip(wav_data, features)
+    return bips, profile.as_dict()['stages']['spectrogram']['cpu']
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('media', nargs='+', help='media files to analyze')
+    parser.add_argument('-f', '--ffmpeg', default='ffmpeg', help='full path to ffmpeg binary')
+    parser.add_argument('-b', '--decoder', default='ffmpeg', help='decoder backend')
+    parser.add_argument('-p', '--precision', default='float64', help='numerical precision')
+    parser.add_argument('-t', '--tolerance', default=scd.STEP_SEC, type=float,
+                        help='max distance in seconds between matching bips')
+    args = parser.parse_args()
+
+    totals = np.zeros(6)
+    nchannels = nagree = 0
+    print('%-30s %7s %9s %9s %6s %6s %9s %9s %6s %6s' % (
+        'media', 'channel', 'fft (s)', 'base (s)', 'fft', 'base', 'fft in', 'base in',
+        'fft', 'base'))
+    for media in args.media:
+        wav_data = scd.decode_media(media, ffmpeg=args.ffmpeg, decoder=args.decoder,
+                                    precision=args.precision)
+        duration = wav_data.shape[0] / 4000.
+        for i in range(wav_data.shape[1]):
+            fft_bips, tfft = energies_time(wav_data[:, i], 'fft')
+            base_bips, tbase = energies_time(wav_data[:, i], 'baseband')
+            fft_in = matched(fft_bips, base_bips, args.tolerance)
+            base_in = matched(base_bips, fft_bips, args.tolerance)
+            fft_verdict = bool(scd.is_bip_pattern(fft_bips, duration))
+            base_verdict = bool(scd.is_bip_pattern(base_bips, duration))
+            nchannels += 1
+            nagree += fft_verdict == base_verdict
+            totals += (tfft, tbase, len(fft_bips), len(base_bips), fft_in, base_in)
+            print('%-30s %7d %9.3f %9.3f %6d %6d %8.1f%% %8.1f%% %6s %6s' % (
+                os.path.basename(media)[-30:], i, tfft, tbase, len(fft_bips), len(base_bips),
+                100. * fft_in / max(len(fft_bips), 1), 100. * base_in / max(len(base_bips), 1),
+                fft_verdict, base_verdict))
+    tfft, tbase, nfft, nbase, fft_in, base_in = totals
+    print('frame energies %.1f times faster, %.2f%% of fft bips and %.2f%% of baseband bips '
+          'matched, %d/%d verdicts agree' % (
+              tfft / max(tbase, 1e-9), 100. * fft_in / max(nfft, 1),
+              100. * base_in / max(nbase, 1), nagree, nchannels))
+    sys.exit(nagree < nchannels)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+""" Audio needed by the epoch folding and intervals pattern tests on noisy signals
+
+Generate 2 channels signals at 4kHz: a speaking clock mixed with program
+audio at a given signal to noise ratio on the first channel (bip power to
+program power, in dB), and program audio alone on the second one, the
+clock minute starting at a random time. Detect the speaking clock in the
+first seconds of each signal, with the 'intervals' and 'folding' pattern
+tests, and report for each program and SNR the shortest duration from which
+all the verdicts are correct (SPEAKING_CLOCK_TRACK 0), and the fraction of
+correct verdicts over all durations.
+Exits with a non-zero status if the folding test finds a speaking clock in
+program audio alone.
+Detection and rejection by epoch folding of synthetic signals are checked in
+the test suite (see tests/test_patterns.py), this script measures them on
+programs at decreasing signal to noise ratios.
+"""
+
+import sys
+import argparse
+import numpy as np
+
+from _common import scd
+from synthetic import PROGRAMS, ChannelGenerator, float_list
+
+SAMPLERATE = 4000
+
+def mixture(program, snr, seed, duration):
+    """ 2 channels signal: speaking clock and program at 'snr' dB, and program alone """
+    n = int(duration * SAMPLERATE)
+    # media start at a random time of a clock minute
+    offset = -np.random.RandomState(seed).uniform(0, 60)
+    clock = ChannelGenerator('silence', SAMPLERATE, seed, True, clock_offset=offset)
+    bips = clock.block(0, n)
+    channels = []
+    for i in range(2):
+        audio = ChannelGenerator(program, SAMPLERATE, seed * 2 + i).block(0, n)
+        # bips are sines: their power is half the square of their level
+        audio *= clock.bip_level / np.sqrt(2) / max(np.std(audio), 1e-9) * 10 ** (-snr / 20.)
+        channels.append(audio)
+    return np.column_stack((bips + channels[0], channels[1]))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-p', '--programs', default=['noise', 'pink', 'tones'],
+                        type=lambda a: a.split(','),
+                        help='comma separated programs: %s, or media paths' % ', '.join(PROGRAMS))
+    parser.add_argument('-s', '--snr', default=[24., 12., 0., -6., -12., -18.], type=float_list,
+                        help='comma separated signal to noise ratios, in dB')
+    parser.add_argument('-d', '--durations', default=[10., 20., 30., 45., 60., 90., 120., 180.],
+                        type=float_list, help='comma separated durations analyzed, in seconds')
+    parser.add_argument('-n', '--trials', default=5, type=int,
+                        help='signals generated for each program and SNR')
+    parser.add_argument('-x', '--features', default='fft', help='frame energy computation')
+    args = parser.parse_args()
+
+    patterns = scd.PATTERNS
+    false_alarms = 0
+    print('%-20s %6s %s' % ('program', 'SNR', ' '.join('%9s %7s' % (p[:9], 'correct')
+                                                     for p in patterns)))
+    for program in args.programs:
+        for snr in args.snr:
+            # correct verdicts of each pattern test, per trial and duration
+            correct = np.zeros((len(patterns), args.trials, len(args.durations)), dtype=bool)
+            for trial in range(args.trials):
+                signal = mixture(program, snr, trial, max(args.durations))
+                for j, duration in enumerate(args.durations):
+                    data = signal[:int(duration * SAMPLERATE)]
+                    for i, pattern in enumerate(patterns):
+                        result = scd.detect(data, SAMPLERATE, features=args.features,
+                                            pattern=pattern)
+                        correct[i, trial, j] = result.verdict == 0
+                        false_alarms += pattern == 'folding' and bool(result.matches[1])
+            line = '%-20s %6.1f' % (program[-20:], snr)
+            for i in range(len(patterns)):
+                # shortest duration from which all verdicts are correct
+                settled = np.all(correct[i], axis=0)
+                needed = [d for j, d in enumerate(args.durations) if np.all(settled[j:])]
+                line += ' %8s %7.1f%%' % ('%.0fs' % needed[0] if needed else '-',
+                                          100. * np.mean(correct[i]))
+            print(line, flush=True)
+    print('%d false alarms of the folding test on program audio' % false_alarms)
+    sys.exit(false_alarms > 0)
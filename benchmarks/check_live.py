@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+""" Check of live speaking clock monitoring on a local stream
+
+Build a mono feed alternating segments of a media having a speaking clock
+and of a media without any, and stream it with ffmpeg (NUT format) to a
+named pipe monitored by live_events. Check that the speaking clock status
+events follow the segments, and report the delay between each segment
+change and the corresponding event, in seconds of stream.
+With '--realtime', the feed is streamed at its native rate ('ffmpeg -re'),
+and the wall clock latency of events is reported too.
+Exits with a non-zero status if an expected event is missing.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from _common import scd
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('clock', help='media with a speaking clock on its first channel')
+    parser.add_argument('other', help='media without speaking clock on its first channel')
+    parser.add_argument('-d', '--segment-dur', default=180., type=float,
+                        help='duration of each segment, in seconds')
+    parser.add_argument('-n', '--segments', default=4, type=int, help='amount of segments')
+    parser.add_argument('-w', '--window', default=60., type=float, help='analysis window')
+    parser.add_argument('--hop', default=1., type=float, help='hop between verdicts')
+    parser.add_argument('--realtime', action='store_true', help='stream at native rate')
+    parser.add_argument('-f', '--ffmpeg', default='ffmpeg', help='full path to ffmpeg binary')
+    args = parser.parse_args()
+
+    # segments alternate clock / other, starting with the speaking clock
+    inputs, filters = [], []
+    for i in range(args.segments):
+        inputs += ['-t', '%.3f' % args.segment_dur, '-i', args.clock if i % 2 == 0 else args.other]
+        filters.append('[%d:a]pan=mono|c0=c0,aresample=8000[s%d]' % (i, i))
+    graph = ';'.join(filters) + ';' + ''.join(['[s%d]' % i for i in range(args.segments)]) + \
+        'concat=n=%d:v=0:a=1[a]' % args.segments
+
+    tmpdir = tempfile.mkdtemp()
+    fifo = os.path.join(tmpdir, 'feed.nut')
+    os.mkfifo(fifo)
+    cmd = [args.ffmpeg, '-nostdin', '-v', 'error', '-y'] + (['-re'] if args.realtime else []) + \
+        inputs + ['-filter_complex', graph, '-map', '[a]', '-f', 'nut', fifo]
+    feeder = subprocess.Popen(cmd)
+    t0 = time.time()
+    events = list(scd.live_events(fifo, args.ffmpeg, window=args.window, hop=args.hop))
+    feeder.wait()
+    os.remove(fifo)
+    os.rmdir(tmpdir)
+
+    nerrors = 0
+    print('%8s %8s %10s %9s %12s' % ('segment', 'change', 'status', 'delay (s)', 'latency (s)'))
+    for i in range(args.segments):
+        expected = i % 2 == 0
+        start = i * args.segment_dur
+        # first event of the segment: status of the first window, then changes
+        found = [e for e in events if start < e['time'] <= start + args.segment_dur + args.window
+                 and e['speaking_clock'] == expected]
+        if not found:
+            nerrors += 1
+            print('%8d %8.1f %10s %9s %12s' % (i, start, expected, 'MISSING', '-'))
+            continue
+        event = found[0]
+        latency = '%.3f' % (event['timestamp'] - t0 - event['time']) if args.realtime else '-'
+        print('%8d %8.1f %10s %9.1f %12s' % (i, start, expected, event['time'] - start, latency))
+    unexpected = len(events) - args.segments
+    if unexpected > 0:
+        print('%d unexpected status changes' % unexpected)
+        nerrors += unexpected
+    sys.exit(nerrors > 0)
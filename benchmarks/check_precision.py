@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+""" Regression check of single precision speaking clock detection
+
+Detect bips in each channel of a reference corpus of media files, both in
+double precision (float64) and in single precision (int16 samples processed
+in float32), and check that detected bip timestamps are the same.
+Exits with a non-zero status if a difference is found.
+The same check runs on synthetic signals in the test suite (see
+tests/test_dsp.py), this script extends it to real media.
+"""
+
+import sys
+import os.path
+import argparse
+import numpy as np
+
+from _common import scd, timed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('media', nargs='+', help='reference corpus media files')
+    parser.add_argument('-f', '--ffmpeg', default='ffmpeg', help='full path to ffmpeg binary')
+    parser.add_argument('-b', '--decoder', default='ffmpeg', help='decoder backend')
+    args = parser.parse_args()
+
+    nerrors = 0
+    print('%-30s %7s %7s %7s %10s %10s' % ('media', 'channel', 'bips64', 'bips32', 'time64 (s)', 'time32 (s)'))
+    for media in args.media:
+        wav64 = scd.decode_media(media, ffmpeg=args.ffmpeg, decoder=args.decoder)
+        wav32 = scd.decode_media(media, ffmpeg=args.ffmpeg, decoder=args.decoder, precision='float32')
+        for i in range(wav64.shape[1]):
+            bips64, t64, _ = timed(scd.wavdata2bip, wav64[:, i])
+            bips32, t32, _ = timed(scd.wavdata2bip, wav32[:, i])
+            same = len(bips64) == len(bips32) and np.allclose(bips64, bips32)
+            nerrors += not same
+            print('%-30s %7d %7d %7d %10.3f %10.3f%s' % (
+                os.path.basename(media)[-30:], i, len(bips64), len(bips32), t64, t32,
+                '' if same else ' MISMATCH'))
+    sys.exit(nerrors > 0)
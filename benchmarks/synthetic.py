@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+""" Synthetic speaking clock corpus generator
+
+Write multichannel WAV files (RF64 beyond 4GB) having a speaking clock on
+one channel: 1kHz bips at seconds 0, 10, 20, 30, 40, 57, 58 and 59 of each
+minute over a low level background noise, and program audio
+on the other channels: white noise, pink noise, random tones (some of them
+at 1kHz), silence, or the first channel of a media file looped.
+Bips last 80 to 120 ms by default: regions of frames found by the detector
+are about 30 ms longer, and should last between 80 and 160 ms.
+Media are generated block by block, so that durations up to 24 hours or
+more only require a constant amount of memory.
+A labels file is written with the speaking clock channel of each media (or
+NONE), as expected by speaking_clock_detection_sweep.
+"""
+
+import os
+import argparse
+import numpy as np
+import soundfile
+from scipy.signal import lfilter
+
+from _common import scd
+
+# seconds of each minute starting with a bip
+CLOCK_SECONDS = (0, 10, 20, 30, 40, 57, 58, 59)
+
+# synthetic program audio, other values being paths to media files
+PROGRAMS = ('noise', 'pink', 'tones', 'silence')
+
+# samples generated at once
+BLOCK_SEC = 60
+
+# pink noise filter (Paul Kellet's economy method), with its gain
+PINK_B = [0.049922035, -0.095993537, 0.050612699, -0.004408786]
+PINK_A = [1, -2.494956002, 2.017265875, -0.522189400]
+PINK_GAIN = 10.
+
+def bip_times(start, end, offset=0.):
+    """
+    bip start times of a speaking clock, in seconds, between start and end,
+    for a clock whose minutes start 'offset' seconds after the start of media
+    """
+    first_minute = int(np.floor((start - offset) / 60.)) - 1
+    last_minute = int(np.ceil((end - offset) / 60.)) + 1
+    ret = []
+    for minute in range(first_minute, last_minute + 1):
+        for sec in CLOCK_SECONDS:
+            t = offset + minute * 60 + sec
+            if start <= t + 1 and t < end:
+                ret.append((minute * len(CLOCK_SECONDS) + CLOCK_SECONDS.index(sec), t))
+    return ret
+
+
+class ChannelGenerator:
+    """
+    Samples of a synthetic channel, generated block by block at 'samplerate'
+    Hz. program: one of PROGRAMS, or path to a media file. clock: tell if
+    the channel has a speaking clock, which is mixed with the program.
+    """
+    def __init__(self, program, samplerate, seed=0, clock=False, level=0.1, bip_level=0.3,
+                 bip_dur=(0.08, 0.12), clock_offset=0.):
+        self.program = program
+        self.samplerate = samplerate
+        self.seed = seed
+        self.clock = clock
+        self.level = level
+        self.bip_level = bip_level
+        self.bip_dur = bip_dur
+        self.clock_offset = clock_offset
+        self.pink_zi = np.zeros(len(PINK_A) - 1)
+        self.media = None
+        if program not in PROGRAMS:
+            media = scd.decode_media(program, outsr=samplerate, tracks=[(0, 0)])[:, 0]
+            self.media = media * level / max(np.std(media), 1e-6)
+
+    def rng(self, *key):
+        """ random generator depending on the channel seed and on 'key' only """
+        return np.random.RandomState([self.seed] + list(key))
+
+    def block(self, first, n):
+        """ samples first to first + n """
+        if self.program == 'noise':
+            ret = self.rng(first).standard_normal(n) * self.level
+        elif self.program == 'pink':
+            white = self.rng(first).standard_normal(n)
+            ret, self.pink_zi = lfilter(PINK_B, PINK_A, white, zi=self.pink_zi)
+            ret *= self.level * PINK_GAIN
+        elif self.program == 'tones':
+            ret = self.tones(first, n)
+        elif self.program == 'silence':
+            ret = np.zeros(n)
+        else:
+            idx = np.arange(first, first + n) % len(self.media)
+            ret = self.media[idx]
+        if self.clock:
+            ret = ret * 0.05 + self.bips(first, n)
+        return ret
+
+    def tones(self, first, n):
+        """ random notes of 0.25 to 1 second with harmonics, 1kHz ones included """
+        sr = self.samplerate
+        ret = np.zeros(n)
+        # notes start at each quarter of second, and are chosen per second
+        for sec in range(first // sr, (first + n - 1) // sr + 1):
+            rng = self.rng(sec)
+            for quarter in range(4):
+                lo = sec * sr + quarter * sr // 4
+                hi = lo + int(sr * rng.choice([0.25, 0.5, 0.75, 1.]))
+                freq = 1000. if rng.uniform() < 0.05 else 110. * 2 ** (rng.randint(0, 48) / 12.)
+                lo, hi = max(lo, first), min(hi, first + n, sec * sr + sr)
+                if hi <= lo or rng.uniform() < 0.5:
+                    continue
+                t = np.arange(lo, hi) / float(sr)
+                note = sum(np.sin(2 * np.pi * freq * k * t) / k for k in (1, 2, 3) if
+                           freq * k < sr / 2)
+                ret[(lo - first):(hi - first)] += note * self.level
+        return ret
+
+    def bips(self, first, n):
+        """ speaking clock bips and background noise, samples first to first + n """
+        sr = self.samplerate
+        ret = self.rng(first, 1).standard_normal(n) * self.level * 0.01
+        for index, t in bip_times(first / float(sr), (first + n) / float(sr), self.clock_offset):
+            dur = self.rng(index, 2).uniform(*self.bip_dur)
+            lo, hi = int(round(t * sr)), int(round((t + dur) * sr))
+            clo, chi = max(lo, first), min(hi, first + n)
+            if chi <= clo:
+                continue
+            pos = np.arange(clo, chi)
+            # 5 ms fades
+            fade = np.minimum(1., np.minimum(pos - lo, hi - pos) / (0.005 * sr))
+            ret[(clo - first):(chi - first)] += self.bip_level * fade * \
+                np.sin(2 * np.pi * 1000. * pos / sr)
+        return ret
+
+
+def write_media(path, duration, programs, clock_channel=0, samplerate=16000, seed=0,
+                clock_offset=0., bip_dur=(0.08, 0.12)):
+    """
+    Write a synthetic media of 'duration' seconds, whose channels have the
+    given programs, the speaking clock being on channel clock_channel (None
+    for a media without speaking clock)
+    """
+    channels = [ChannelGenerator(program, samplerate, seed * 1000 + i, i == clock_channel,
+                                 bip_dur=bip_dur, clock_offset=clock_offset)
+                for i, program in enumerate(programs)]
+    nsamples = int(round(duration * samplerate))
+    large = nsamples * len(programs) * 2 >= 2**32 - 2**20
+    block = BLOCK_SEC * samplerate
+    with soundfile.SoundFile(path, 'w', samplerate, len(programs), 'PCM_16',
+                             format='RF64' if large else 'WAV') as f:
+        for first in range(0, nsamples, block):
+            n = min(block, nsamples - first)
+            data = np.column_stack([c.block(first, n) for c in channels])
+            f.write(np.clip(data, -1, 32767 / 32768.))
+
+def media_name(duration, programs, clock_channel, samplerate, seed, bip_dur=(0.08, 0.12)):
+    """ file name of a synthetic media, encoding its parameters """
+    programs = [p if p in PROGRAMS else os.path.splitext(os.path.basename(p))[0]
+                for p in programs]
+    clock = 'none' if clock_channel is None else 'clock%d_bip%d-%dms' % (
+        clock_channel, round(bip_dur[0] * 1000), round(bip_dur[1] * 1000))
+    return 'synthetic_%ds_%s_%s_%dhz_seed%d.wav' % (duration, '-'.join(programs), clock,
+                                                   samplerate, seed)
+
+def generate_corpus(directory, durations, programs=('noise',), nchannels=2, samplerate=16000,
+                    negatives=True, seed=0, bip_dur=(0.08, 0.12)):
+    """
+    Write a synthetic corpus in 'directory': for each duration and program,
+    a media having a speaking clock on one channel (rotating from one media
+    to the next) and the program on the other ones, and a media without
+    speaking clock if 'negatives' is True. Existing media are kept.
+    Returns a list of (path, label) tuples, label being None without clock
+    """
+    os.makedirs(directory, exist_ok=True)
+    ret = []
+    for duration in durations:
+        for program in programs:
+            nclocks = len([label for _, label in ret if label is not None])
+            clocks = [nclocks % nchannels] + ([None] if negatives else [])
+            for clock in clocks:
+                path = os.path.join(directory, media_name(duration, [program] * nchannels,
+                                                          clock, samplerate, seed, bip_dur))
+                if not os.path.exists(path):
+                    tmp = path + '.tmp.wav'
+                    # media start 5.5 seconds after the start of a clock minute
+                    write_media(tmp, duration, [program] * nchannels, clock, samplerate, seed,
+                                clock_offset=-5.5, bip_dur=bip_dur)
+                    os.replace(tmp, path)
+                ret.append((path, None if clock is None else str(clock)))
+    return ret
+
+def write_labels(path, corpus):
+    """ write (media, label) tuples as read by speaking_clock_detection.load_labels """
+    with open(path, 'w') as f:
+        for media, label in corpus:
+            f.write('%s %s\n' % (media, 'NONE' if label is None else label))
+
+def float_list(arg):
+    return [float(x) for x in arg.split(',')]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directory', help='output directory')
+    parser.add_argument('-d', '--durations', default=[30., 600., 3600.], type=float_list,
+                        help='comma separated durations in seconds (86400 for 24 hours)')
+    parser.add_argument('-p', '--programs', default=['noise', 'pink', 'tones'],
+                        type=lambda a: a.split(','),
+                        help='comma separated programs of the channels without clock: %s, '
+                        'or media paths' % ', '.join(PROGRAMS))
+    parser.add_argument('-c', '--channels', default=2, type=int, help='amount of channels')
+    parser.add_argument('-r', '--samplerate', default=16000, type=int, help='sampling rate')
+    parser.add_argument('--no-negatives', action='store_true',
+                        help='do not generate media without speaking clock')
+    parser.add_argument('-s', '--seed', default=0, type=int, help='random seed')
+    parser.add_argument('--bip-dur', default=[0.08, 0.12], type=float_list,
+                        help='comma separated bounds of bip durations, in seconds')
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.directory, args.durations, args.programs, args.channels,
+                             args.samplerate, not args.no_negatives, args.seed, args.bip_dur)
+    write_labels(os.path.join(args.directory, 'labels.txt'), corpus)
+    for media, label in corpus:
+        print(media, 'NONE' if label is None else label)
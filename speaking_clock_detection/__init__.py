@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+#
+""" Speaking Clock Detection - version 1.3 2024-07-17
+Author: David Doukhan <ddoukhan@ina.fr>
+
+The detection of Speaking clock is based on the detection of bips
+Bips are 1kHz impulses, of duration variying between 80 and 160 ms
+The pattern corresponding to bips is 0 10 20 30 40 57 58 59
+Which leads to diff bip pattern of 17, 3*1; 4*10
+
+Example:
+>>> from speaking_clock_detection import detect
+>>> result = detect('/path/to/media.wav')
+>>> result.speaking_clock
+(0, 1)
+"""
+
+__version__ = '1.0.1'
+
+from .segmentaxis import segment_axis
+from .profiling import STAGES, Profile
+from .decode import (probe_audio, parse_tracks, select_tracks, track_labels, PRECISIONS,
+                     DECODE_METHODS, FFmpegDecoder, SoundfileDecoder, PyAVDecoder, ArrayDecoder,
+                     DECODERS,
+                     select_decoder, decode_media, iter_media_blocks)
+from .dsp import (PREEMP_FACT, WIN_SEC, STEP_SEC, RATIO_THR, MIN_DUR, MAX_DUR, ENERGY_THR,
+                  FEATURES, FOLDING_FEATURES, check_pattern_features, preemp, my_specgram,
+                  framed_specgram, frame_energies, bip_frame_energies, gated_frame_energies,
+                  wavdata2bip, blockwise_frame_energies, multichannel_frame_energies,
+                  multichannel_wavdata2bip, energies2bip, StreamingEnergies, StreamingBip)
+from .patterns import (TOLERANCE, SHORT_TOLERANCE, PATTERNS, is_bip_pattern,
+                       is_windowed_bip_pattern, sequential_bip_pattern, channel_verdict,
+                       interval_stats, bip_pattern_stats, EpochFolding, folded_pattern,
+                       sequential_folded_pattern, folding_stats)
+from .detection import (DetectionResult, detect, stream_bips, follow_detection,
+                        early_exit_detection, windowed_detection, detect_tracks,
+                        speaking_clock_detection)
+from .cache import media_fingerprint, ResultCache, cached_detect
+from .features import (ChannelFeatures, MediaFeatures, extract_features, FeatureStore,
+                       stored_detect)
+from .sweep import load_labels, SweepMedia, load_corpus, threshold_sweep
+from .live import RollingDetector, live_events
+from .batch import iter_media_paths, detect_job, batch_detection
+from .server import DetectionService, remote_detect
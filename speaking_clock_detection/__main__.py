@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+#
+""" python -m speaking_clock_detection """
+
+from .cli import main
+
+main()
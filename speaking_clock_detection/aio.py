@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+"""
+asyncio speaking clock detection: ffmpeg decoding runs as an asyncio
+subprocess whose output is read without blocking the event loop, and bip
+detection runs in an executor. A semaphore shared by all detections caps
+the amount of media decoded and analyzed at once, so that hundreds of
+detections may be awaited from a single event loop.
+
+Example:
+>>> import asyncio
+>>> from speaking_clock_detection import aio
+>>> async def main(paths):
+...     return await asyncio.gather(*[aio.detect(p) for p in paths])
+>>> results = asyncio.run(main(paths))
+"""
+
+import os
+import sys
+import asyncio
+import weakref
+import numpy as np
+from subprocess import CalledProcessError, PIPE, STDOUT
+
+from .decode import (ffprobe_path, probe_command, parse_probe, missing_ffprobe, select_tracks,
+                     pipe_command, decoded_duration, pcm_samples, check_precision, check_media)
+from .dsp import multichannel_wavdata2bip
+from .patterns import is_bip_pattern
+from .detection import DetectionResult
+
+# bytes read from ffmpeg standard output at once
+READ_SIZE = 2**20
+
+# default semaphore of each event loop
+_semaphores = weakref.WeakKeyDictionary()
+
+def default_semaphore():
+    """
+    Semaphore shared by the detections of the running event loop that are
+    not given one, allowing as many detections at once as there are CPUs
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(os.cpu_count() or 1)
+    return _semaphores[loop]
+
+async def _run(cmd, stderr):
+    """ run cmd, returning its standard output and raising CalledProcessError on failure """
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=PIPE, stderr=stderr)
+    out, err = await proc.communicate()
+    if proc.returncode != 0:
+        output = out if stderr == STDOUT else err
+        print(output, file=sys.stderr)
+        raise CalledProcessError(proc.returncode, cmd, output=output)
+    return out
+
+async def probe_audio(infname, ffprobe='ffprobe'):
+    """ asyncio version of decode.probe_audio """
+    try:
+        out = await _run(probe_command(infname, ffprobe), STDOUT)
+    except FileNotFoundError:
+        raise missing_ffprobe(ffprobe)
+    return parse_probe(out, infname)
+
+async def decode_media(infname, ffmpeg='ffmpeg', outsr=4000, start=None, duration=None,
+                       precision='float64', tracks=None, ffprobe=None):
+    """
+    Decode (stream, channel) audio tracks of a media with an ffmpeg asyncio
+    subprocess writing raw s16le samples to its standard output, read into
+    a buffer preallocated from the media duration.
+    Returns the same array as decode.decode_media with method 'pipe'. The
+    ffmpeg process is killed if the coroutine is cancelled.
+    """
+    _, wav_data = await _decode(infname, ffmpeg, outsr, start, duration, precision, tracks,
+                                ffprobe)
+    return wav_data
+
+async def _decode(infname, ffmpeg, outsr, start, duration, precision, tracks, ffprobe=None):
+    """ returns the tracks selected and the array decoded by decode_media """
+    check_precision(precision)
+    stream_channels, media_duration = await probe_audio(infname, ffprobe_path(ffmpeg, ffprobe))
+    tracks = select_tracks(stream_channels, tracks)
+    frame_bytes = 2 * len(tracks)
+    expected = decoded_duration(media_duration, start, duration)
+    # one extra second of margin for resampler delay and duration rounding
+    buf = bytearray((int((expected if expected else 60) * outsr) + outsr) * frame_bytes)
+    pos = 0
+
+    cmd = pipe_command(infname, ffmpeg, outsr, start, duration, tracks, stream_channels)
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE, limit=READ_SIZE)
+    # stderr is consumed concurrently to avoid pipe deadlocks
+    errors = asyncio.ensure_future(proc.stderr.read())
+    try:
+        while True:
+            chunk = await proc.stdout.read(READ_SIZE)
+            if not chunk:
+                break
+            if pos + len(chunk) > len(buf):
+                # duration was unknown or underestimated
+                buf.extend(bytes(max(len(buf) // 2, len(chunk)) + frame_bytes))
+            buf[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+        await proc.wait()
+        err = await errors
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        errors.cancel()
+        raise
+    if proc.returncode != 0:
+        print(err, file=sys.stderr)
+        raise CalledProcessError(proc.returncode, cmd, output=err)
+    assert pos % frame_bytes == 0
+
+    pcm = np.frombuffer(buf, dtype='<i2', count=pos // 2).reshape(-1, len(tracks))
+    return tracks, pcm_samples(pcm, precision)
+
+def _analyze(wav_data, tracks, features):
+    """ CPU bound part of detect, run in an executor """
+    duration = wav_data.shape[0] / 4000.
+    bips = multichannel_wavdata2bip(wav_data, features)
+    return DetectionResult(tracks, [is_bip_pattern(b, duration) for b in bips], bips, duration)
+
+async def detect(media, tracks=None, precision='float64', features='fft', ffmpeg='ffmpeg',
+                 semaphore=None, executor=None, ffprobe=None):
+    """
+    asyncio version of detection.detect, for media files decoded with
+    ffmpeg.
+    * tracks, precision, features, ffmpeg, ffprobe: see detection.detect
+    * semaphore: asyncio.Semaphore held while the media is decoded and
+      analyzed, limiting the amount of decoding processes and of decoded
+      signals kept in memory. Default: semaphore shared by all the
+      detections of the event loop, see default_semaphore.
+    * executor: concurrent.futures executor running bip detection, the
+      default executor of the event loop if None. A ProcessPoolExecutor
+      avoids contention on the GIL, at the cost of sending decoded signals
+      to the worker processes.
+    Returns a DetectionResult
+    """
+    check_media(media)
+    if semaphore is None:
+        semaphore = default_semaphore()
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        tracks, wav_data = await _decode(media, ffmpeg, 4000, None, None, precision, tracks,
+                                         ffprobe)
+        return await loop.run_in_executor(executor, _analyze, wav_data, tracks, features)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Batch speaking clock detection of many media with a pool of processes
+"""
+
+import os
+import sys
+import time
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from .cache import cached_detect
+from .features import stored_detect
+
+def iter_media_paths(paths=(), file_list=None):
+    """
+    Yield the paths of the media to analyze: paths given as arguments, files
+    found in directories given as arguments (scanned recursively, in sorted
+    order), and paths read from a file list, one per line ('-' for stdin).
+    Paths are generated lazily, so that huge archives can be processed.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for fname in sorted(files):
+                    yield os.path.join(root, fname)
+        else:
+            yield path
+    if file_list is not None:
+        f = sys.stdin if file_list == '-' else open(file_list)
+        try:
+            for line in f:
+                line = line.rstrip('\n')
+                if line:
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+def detect_job(media, options):
+    """
+    Detect speaking clock in a media with cached_detect keyword arguments
+    'options' (detect keyword arguments, and cache settings), or with
+    stored_detect keyword arguments if options include 'features_dir'.
+    Returns a JSON serializable dict with the media path, the summary of the
+    DetectionResult (see DetectionResult.as_dict), the elapsed time in
+    seconds, and an error message if detection failed (None otherwise).
+    """
+    t0 = time.time()
+    try:
+        if options.get('features_dir'):
+            result = stored_detect(media, **options)
+        else:
+            result = cached_detect(media, **options)
+        ret = dict(media=media, **result.as_dict())
+        ret['error'] = None
+    except Exception as err:
+        ret = failed_job(media, err)
+    ret['elapsed'] = round(time.time() - t0, 3)
+    return ret
+
+def failed_job(media, err):
+    """ detect_job result of a media whose detection raised 'err' """
+    return {'media': media, 'verdict': None, 'speaking_clock': None, 'index': None,
+            'confidence': None, 'duration': None, 'tracks': None, 'error': '%s: %s' % (type(err).__name__, err),
+            'elapsed': None}
+
+def batch_detection(paths, jobs=None, max_pending=None, **options):
+    """
+    Detect speaking clock in each media of an iterable of paths with a pool
+    of 'jobs' processes (default: number of CPUs), keeping at most
+    'max_pending' media (default: 2 * jobs) submitted at once, so that paths
+    are consumed lazily.
+    options: cached_detect or stored_detect keyword arguments, see detect_job
+    Yield detect_job results in completion order, as soon as each media has
+    been processed. If a worker process dies, the media being processed are
+    reported with an error, and a new pool is started.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    max_pending = max_pending or 2 * jobs
+    paths = iter(paths)
+    pending = {}
+    executor = ProcessPoolExecutor(jobs)
+    try:
+        while True:
+            for media in islice(paths, max_pending - len(pending)):
+                pending[executor.submit(detect_job, media, options)] = media
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                media = pending.pop(future)
+                try:
+                    yield future.result()
+                except BrokenProcessPool as err:
+                    broken = True
+                    yield failed_job(media, err)
+            if broken:
+                executor.shutdown(wait=False)
+                executor = ProcessPoolExecutor(jobs)
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
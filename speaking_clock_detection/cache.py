@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Persistent cache of detection results, stored in a SQLite database that may
+be shared by several processes.
+
+Results are keyed by a media fingerprint, which is cheap to compute even
+for huge files (size, modification time, and hash of a few blocks sampled
+over the file), and by the detector parameters: detector version, signal
+processing and pattern constants, default thresholds and detection options.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import inspect
+import numpy as np
+
+from . import __version__
+from . import dsp, patterns
+from .detection import DetectionResult, detect
+
+# version of the detection algorithms, to be increased by any change of
+# detection results that is not a change of the constants of
+# detector_constants
+DETECTOR_VERSION = 1
+
+# blocks hashed by media_fingerprint
+FINGERPRINT_BLOCKS = 16
+FINGERPRINT_BLOCK_SIZE = 2**16
+
+# detect options that do not change the result
+NEUTRAL_OPTIONS = ('tmpdir', 'follow', 'profile', 'ffprobe')
+
+def media_fingerprint(path, nblocks=FINGERPRINT_BLOCKS, blocksize=FINGERPRINT_BLOCK_SIZE):
+    """
+    Fingerprint of a media file: size, modification time and SHA-1 of
+    'nblocks' blocks of 'blocksize' bytes evenly spread over the file, the
+    first and the last blocks included. Files smaller than the sampled
+    blocks are fully hashed.
+    """
+    st = os.stat(path)
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        if st.st_size <= nblocks * blocksize:
+            h.update(f.read())
+        else:
+            for offset in np.linspace(0, st.st_size - blocksize, nblocks).astype(np.int64):
+                f.seek(int(offset))
+                h.update(f.read(blocksize))
+    return '%d:%d:%s' % (st.st_size, st.st_mtime_ns, h.hexdigest())
+
+def default_arguments(func):
+    """ default values of the keyword arguments of a function """
+    params = inspect.signature(func).parameters.values()
+    return {p.name: p.default for p in params if p.default is not inspect.Parameter.empty}
+
+def detector_constants():
+    """
+    Constants of frame features, and thresholds of bip detection and
+    pattern tests, which are the default values of all detection functions
+    """
+    return dict(preemp=dsp.PREEMP_FACT, win_sec=dsp.WIN_SEC, step_sec=dsp.STEP_SEC,
+                ratio_thr=dsp.RATIO_THR, min_dur=dsp.MIN_DUR, max_dur=dsp.MAX_DUR,
+                energy_thr=dsp.ENERGY_THR,
+                gate_ratio=dsp.GATE_RATIO, gate_margin=dsp.GATE_MARGIN,
+                baseband_rate=dsp.BASEBAND_RATE, baseband_ratio=dsp.BASEBAND_RATIO,
+                tolerance=patterns.TOLERANCE, short_tolerance=patterns.SHORT_TOLERANCE,
+                short_dur=patterns.SHORT_DUR, valid_factor=patterns.VALID_FACTOR,
+                p_clock=patterns.P_CLOCK, p_other=patterns.P_OTHER, max_gap=patterns.MAX_GAP,
+                clock_seconds=patterns.CLOCK_SECONDS, clock_period=patterns.CLOCK_PERIOD,
+                folding_bip_dur=patterns.FOLDING_BIP_DUR, folding_guard=patterns.FOLDING_GUARD,
+                folding_min_bips=patterns.FOLDING_MIN_BIPS,
+                folding_threshold=patterns.FOLDING_THRESHOLD,
+                folding_reject=patterns.FOLDING_REJECT)
+
+def detector_key(options, func=detect):
+    """
+    Serialization of the detector parameters leading to a detection result:
+    package and detector versions, detector constants (see
+    detector_constants), and detect keyword arguments 'options', completed
+    with detect default values. Keyword arguments of another function 'func'
+    may be given instead.
+    """
+    options = {k: v for k, v in dict(default_arguments(func), **options).items()
+               if k not in NEUTRAL_OPTIONS}
+    params = dict(version=__version__, detector=DETECTOR_VERSION,
+                  constants=detector_constants(), options=options)
+    return json.dumps(params, sort_keys=True)
+
+
+class ResultCache:
+    """
+    DetectionResult cache stored in a SQLite database at 'path'.
+    Entries older than 'max_age' seconds are ignored and evicted, and the
+    least recently used entries are evicted when there are more than
+    'max_entries' of them (None: no limit).
+    The database uses write-ahead logging, so that several processes may
+    read and update it concurrently.
+    """
+    def __init__(self, path, max_entries=100000, max_age=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        dirname = os.path.dirname(os.path.abspath(path))
+        os.makedirs(dirname, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS results (
+            fingerprint TEXT NOT NULL, detector TEXT NOT NULL, result TEXT NOT NULL,
+            created REAL NOT NULL, accessed REAL NOT NULL,
+            PRIMARY KEY (fingerprint, detector))''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+
+    def get(self, fingerprint, detector):
+        """ cached DetectionResult, None if not found or expired """
+        now = time.time()
+        row = self.db.execute('SELECT result, created FROM results '
+                              'WHERE fingerprint = ? AND detector = ?',
+                              (fingerprint, detector)).fetchone()
+        if row is None or (self.max_age is not None and row[1] < now - self.max_age):
+            return None
+        self.db.execute('UPDATE results SET accessed = ? WHERE fingerprint = ? AND detector = ?',
+                        (now, fingerprint, detector))
+        return result_from_dict(json.loads(row[0]))
+
+    def put(self, fingerprint, detector, result):
+        """ store a DetectionResult, and evict old entries """
+        now = time.time()
+        self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                        (fingerprint, detector, json.dumps(result_to_dict(result)), now, now))
+        self.evict(now)
+
+    def evict(self, now=None):
+        """ remove expired entries, and least recently used entries in excess """
+        now = time.time() if now is None else now
+        if self.max_age is not None:
+            self.db.execute('DELETE FROM results WHERE created < ?', (now - self.max_age,))
+        if self.max_entries is not None:
+            self.db.execute('DELETE FROM results WHERE rowid IN (SELECT rowid FROM results '
+                            'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+def result_to_dict(result):
+    """ JSON serializable content of a DetectionResult """
+    return {'tracks': [list(t) for t in result.tracks],
+            'matches': [bool(m) for m in result.matches],
+            'bips': [[float(b) for b in bips] for bips in result.bips],
+            'duration': result.duration, 'stats': result.stats}
+
+def result_from_dict(d):
+    """ DetectionResult serialized by result_to_dict """
+    return DetectionResult([tuple(t) for t in d['tracks']], d['matches'],
+                           [np.array(bips) for bips in d['bips']], d['duration'], d.get('stats'))
+
+# caches opened by the current process, by path
+_caches = {}
+
+def open_cache(path, max_entries=100000, max_age=None):
+    """ ResultCache at 'path', opened once per process """
+    key = (path, max_entries, max_age)
+    if key not in _caches:
+        _caches[key] = ResultCache(path, max_entries, max_age)
+    return _caches[key]
+
+def cached_detect(media, cache=None, refresh=False, cache_max_entries=100000,
+                  cache_max_age=None, **options):
+    """
+    detect, returning the result stored in a ResultCache when the media and
+    the detector parameters have already been analyzed.
+    * cache: ResultCache, or path to its database. No cache is used if None,
+      or if media is not a file path.
+    * refresh: ignore the cached result, and replace it with a new one.
+      Profiled detections ignore cached results too.
+    * cache_max_entries, cache_max_age: eviction settings of a cache given
+      by path, see ResultCache
+    * options: detect keyword arguments
+    """
+    if cache is None or not isinstance(media, (str, bytes, os.PathLike)):
+        return detect(media, **options)
+    if not isinstance(cache, ResultCache):
+        cache = open_cache(cache, cache_max_entries, cache_max_age)
+    detector = detector_key(options)
+    if options.get('follow') is not None:
+        # media is being written: cache the result of the complete file
+        result = detect(media, **options)
+        cache.put(media_fingerprint(media), detector, result)
+        return result
+    fingerprint = media_fingerprint(media)
+    if not refresh and not options.get('profile'):
+        result = cache.get(fingerprint, detector)
+        if result is not None:
+            return result
+    result = detect(media, **options)
+    cache.put(fingerprint, detector, result)
+    return result
@@ -0,0 +1,518 @@
+# -*- coding: utf-8 -*-
+#
+"""
+speaking_clock_detection command line interface
+"""
+
+import os
+import sys
+import json
+import signal
+import argparse
+import threading
+
+from .decode import DECODERS, PRECISIONS, DECODE_METHODS, parse_tracks, track_labels
+from .dsp import FEATURES, FOLDING_FEATURES, RATIO_THR, MIN_DUR, MAX_DUR, ENERGY_THR
+from .patterns import PATTERNS, TOLERANCE, SHORT_TOLERANCE, SHORT_DUR
+from .detection import follow_detection
+from .profiling import format_profile
+from .cache import open_cache, media_fingerprint, detector_key, cached_detect
+from .batch import iter_media_paths, batch_detection
+from .server import DetectionService, DetectionHTTPServer, UnixDetectionHTTPServer, serve
+from .features import REGIONS_RATIO
+from .sweep import load_labels, load_corpus, threshold_sweep
+from .live import live_events
+
+def add_detection_arguments(parser):
+    """ add the arguments setting speaking clock detection options """
+    parser.add_argument('-t', '--tmpdir', default='/dev/shm/',
+                        help=''' Temporary directory used to store intermediate files
+        when using '--decode file'. Should be a fast access directory such as
+        Ram Disk or SSD hard drive. Default value: /dev/shm (linux ram disk)''')
+
+    parser.add_argument('-d', '--decode', default='pipe', choices=DECODE_METHODS,
+                        help='''Decoding method. 'pipe' reads decoded samples directly
+        from ffmpeg output, without any temporary file. 'file' stores a
+        temporary wav file in TMPDIR. 'stream' processes decoded samples
+        block by block, with a memory usage that does not depend on media
+        duration: recommended for long media. Default value: pipe''')
+
+    parser.add_argument('-b', '--decoder', default='ffmpeg', choices=['auto'] + sorted(DECODERS),
+                        help='''Decoder backend. 'ffmpeg' spawns an ffmpeg process, and is
+        able to decode any media. 'soundfile' decodes WAV, BWF, FLAC and AIFF
+        files in-process, resampling them with scipy instead of ffmpeg, which
+        may shift frame energies slightly. 'pyav' decodes any media
+        in-process, and requires PyAV to be installed. 'auto' uses soundfile
+        for the files it supports, and ffmpeg otherwise. Default value: ffmpeg''')
+
+    parser.add_argument('-p', '--precision', default='float64', choices=PRECISIONS,
+                        help='''Numerical precision. 'float32' keeps decoded samples as int16
+        when possible, and processes them in single precision, halving memory
+        usage. Default value: float64''')
+
+    parser.add_argument('-x', '--features', default='fft', choices=FEATURES,
+                        help='''Frame energy computation. 'fft' computes the spectrum of each
+        frame. 'dft' only computes the DFT bins around 1000Hz, and computes
+        the whole spectrum of the frames that may contain a bip, which is
+        faster and gives the same result. 'gated' only computes the spectrum
+        of the frames having enough power around 1000Hz, skipping silence
+        and most program audio, which is faster and gives the same bips in
+        practice. 'baseband' approximates frame energies from the 1000Hz band
+        shifted to baseband and sampled at 250Hz, which is an order of
+        magnitude faster than 'fft', and finds the same bips in more than 99%%
+        of the cases. Default value: fft''')
+
+    parser.add_argument('--pattern', default='intervals', choices=PATTERNS,
+                        help='''Speaking clock pattern test of each track. 'intervals' tests
+        the time intervals between detected bips. 'folding' folds the frame
+        energy ratios around 1000Hz modulo 60 seconds, and matches the
+        folded minute against the pattern: it finds speaking clocks in much
+        noisier tracks, from less audio, so that '--early-exit' stops sooner
+        and '--windows' may be shorter. It relies on the energy ratio of every
+        frame, and requires fft or baseband features. Default value:
+        intervals''')
+
+    parser.add_argument('-a', '--tracks',
+                        help='''Comma separated list of audio tracks to analyze:
+        STREAM:CHANNEL for a single channel of an audio stream, or STREAM for
+        all its channels, streams and channels being numbered from 0. All
+        tracks are decoded by a single decoding pass. Default: all the
+        channels of all audio streams. Example: 0:1,2''')
+
+    parser.add_argument('-f', '--ffmpeg', default='ffmpeg',
+                        help='''Full path to ffmpeg binary. If not provided, this will used
+        default binary installed on the system. This program has been tested
+        with ffmpeg version 2.8.8-0ubuntu0.16.04.1''')
+
+    parser.add_argument('--ffprobe',
+                        help='''Full path to ffprobe binary, used by the ffmpeg decoder to
+        find the audio streams and the duration of media. Default: ffprobe
+        binary found next to FFMPEG''')
+
+    parser.add_argument('-e', '--early-exit', action='store_true',
+                        help='''Stop decoding media as soon as a single channel has been
+        found to be a speaking clock, and all the other ones have been found
+        not to be, or as soon as all the channels have been found not to be.
+        Media is processed block by block, and the duration of media actually
+        consumed is reported, on stderr for a single media.''')
+
+    parser.add_argument('-c', '--confidence', default=0.999, type=float,
+                        help='''Confidence required by '--early-exit' sequential test
+        before stopping. Default value: 0.999''')
+
+    parser.add_argument('-w', '--windows', type=int,
+                        help='''Analyze only WINDOWS windows evenly spread over the media,
+        instead of the whole media. Recommended for very long media.''')
+
+    parser.add_argument('--window-dur', default=180., type=float,
+                        help='''Duration in seconds of the windows analyzed with '--windows'.
+        The amount of bips of windows shorter than a few minutes depends on
+        their position in the minute, which the intervals pattern test allows
+        for, but makes it less selective: '--pattern folding' is more
+        reliable for such windows. Default value: 180''')
+
+    parser.add_argument('--profile', action='store_true',
+                        help='''Record the wall time, CPU time (of the process and of ffmpeg)
+        and peak memory of each processing stage: probe, decode, load,
+        preemphasis, spectrogram, energy_ratio, regions and pattern. The
+        peak resident set size of each stage is measured on Linux by
+        resetting the peak of the process before each stage. The profile is
+        printed on stderr for a single media, and added to JSON results.
+        Memory tracing slows down detection, and cached results are not
+        used.''')
+
+    parser.add_argument('--cache', default=os.environ.get('SPEAKING_CLOCK_DETECTION_CACHE'),
+                        help='''SQLite database caching detection results, keyed by a
+        fingerprint of the media and by the detection options: media already
+        analyzed are not decoded again. The database may be shared by
+        several processes. Default value: SPEAKING_CLOCK_DETECTION_CACHE
+        environment variable if set, no cache otherwise''')
+
+    parser.add_argument('--no-cache', action='store_true',
+                        help='''Do not use the cache, even if SPEAKING_CLOCK_DETECTION_CACHE
+        is set.''')
+
+    parser.add_argument('--refresh', action='store_true',
+                        help='''Analyze media even if their result is cached, and replace the
+        cached results.''')
+
+    parser.add_argument('--cache-max-entries', default=100000, type=int,
+                        help='''Maximum number of cached results: the least recently used
+        ones are evicted. Default value: 100000''')
+
+    parser.add_argument('--cache-max-age', type=float,
+                        help='''Maximum age of cached results, in days. Default: no limit''')
+
+def check_detection_arguments(parser, args):
+    """ exit with a usage error if detection arguments are not compatible """
+    if args.pattern == 'folding' and args.features not in FOLDING_FEATURES:
+        parser.error('--pattern folding requires %s features'
+                     % ' or '.join(FOLDING_FEATURES))
+
+def detection_options(args):
+    """ return detect keyword arguments corresponding to parsed arguments """
+    return dict(tracks=parse_tracks(args.tracks) if args.tracks else None, decode=args.decode,
+                decoder=args.decoder, precision=args.precision, features=args.features,
+                early_exit=args.early_exit, confidence=args.confidence,
+                windows=args.windows, window_dur=args.window_dur,
+                profile='rss' if args.profile else False,
+                tmpdir=args.tmpdir, ffmpeg=args.ffmpeg, pattern=args.pattern,
+                ffprobe=args.ffprobe)
+
+def cache_options(args):
+    """ return cached_detect cache keyword arguments corresponding to parsed arguments """
+    max_age = args.cache_max_age * 86400 if args.cache_max_age is not None else None
+    return dict(cache=None if args.no_cache else args.cache, refresh=args.refresh,
+                cache_max_entries=args.cache_max_entries, cache_max_age=max_age)
+
+def main(argv=None):
+    """ speaking_clock_detection command line entry point """
+    parser = argparse.ArgumentParser(description='''Speaking Clock detection.
+    Prints the number of the channel corresponding to the speaking clock
+    (0 ... N) preceded by SPEAKING_CLOCK_TRACK. For media having several
+    audio streams, the speaking clock is identified by STREAM:CHANNEL.
+    If no speaking clock has been found, prints SPEAKING_CLOCK_NONE.
+    If speaking clock has been found on several channels, this is likely to
+    be an error and the program will print SPEAKING_CLOCK_MULTIPLE.''')
+
+    parser.add_argument('-m', '--media', required=True,
+                        help='full path to media to analyze')
+
+    parser.add_argument('-o', '--output', default=sys.stdout, type=argparse.FileType('w'),
+                        help='output file for the result. Default value: /dev/stdout.')
+
+    parser.add_argument('--json', action='store_true',
+                        help='''Print the result as a JSON object instead of the verdict: verdict,
+        speaking clock track label, confidence of the verdict between 0 and 1
+        (low values denoting borderline results), duration analyzed, and for
+        each track: decision, amount of bips, amounts of 1, 10 and 17 seconds
+        intervals between bips and of invalid intervals, ratio of invalid
+        intervals, expected and observed amounts of intervals (phase of the
+        pattern in seconds and folding score with '--pattern folding'),
+        decision score and confidence.''')
+
+    parser.add_argument('--follow', nargs='?', const=10., type=float, metavar='IDLE',
+                        help='''Media is a file still being written, such as a recording in
+        progress (WAV, MXF...). Newly appended audio is analyzed as it is
+        written, and the verdict of the audio analyzed so far is printed on
+        stderr every 10 seconds of audio. The final verdict is printed once
+        the file has not grown for IDLE seconds. Requires the ffmpeg decoder.
+        Default value of IDLE: 10''')
+
+    add_detection_arguments(parser)
+    args = parser.parse_args(argv)
+    check_detection_arguments(parser, args)
+    if args.follow is None:
+        result = cached_detect(args.media, **cache_options(args), **detection_options(args))
+    else:
+        if args.early_exit or args.windows or args.profile or args.decode == 'file' or \
+           args.decoder not in ('auto', 'ffmpeg'):
+            parser.error('--follow is not compatible with --early-exit, --windows, --profile, '
+                         '--decode file and in-process decoders')
+        result = follow_main(args)
+    if args.early_exit:
+        print('media consumed: %.3f seconds' % result.duration, file=sys.stderr)
+    if args.profile and not args.json:
+        print(format_profile(result.profile), file=sys.stderr)
+    if args.json:
+        print(json.dumps(dict(media=args.media, **result.as_dict())), file=args.output)
+    else:
+        print_verdict(result, args.output)
+
+def print_verdict(result, output, prefix=()):
+    """ print the verdict of a DetectionResult, preceded by 'prefix' words """
+    ret = result.verdict
+    if ret >= 0:
+        print(*prefix, 'SPEAKING_CLOCK_TRACK', track_labels(result.tracks)[ret], file=output)
+    elif ret == -1:
+        print(*prefix, 'SPEAKING_CLOCK_NONE', file=output)
+    else:
+        assert ret == -2
+        print(*prefix, 'SPEAKING_CLOCK_MULTIPLE', file=output)
+
+def follow_main(args):
+    """
+    follow_detection of a growing media file, printing the intermediate
+    verdicts on stderr, and caching the final result of the complete file
+    """
+    options = detection_options(args)
+    for result in follow_detection(args.media, args.follow, args.ffmpeg,
+                                   precision=options['precision'], tracks=options['tracks'],
+                                   features=options['features'], pattern=options['pattern'],
+                                   ffprobe=options['ffprobe']):
+        print_verdict(result, sys.stderr, ('%.1f seconds analyzed:' % result.duration,))
+    cache = cache_options(args)
+    if cache['cache'] is not None:
+        # options of a detection of the complete file
+        options['decoder'] = 'ffmpeg'
+        open_cache(cache['cache'], cache['cache_max_entries'], cache['cache_max_age']).put(
+            media_fingerprint(args.media), detector_key(options), result)
+    return result
+
+def batch_main(argv=None):
+    """ speaking_clock_detection_batch command line entry point """
+    parser = argparse.ArgumentParser(description='''Batch Speaking Clock detection.
+    Analyzes many media with a pool of processes, and prints one JSON line
+    per media as soon as it has been processed, with fields: media,
+    verdict (SPEAKING_CLOCK_TRACK, SPEAKING_CLOCK_NONE or
+    SPEAKING_CLOCK_MULTIPLE), speaking_clock (track label), confidence,
+    duration analyzed, tracks (decision, amount of bips and interval
+    statistics of each track, see speaking_clock_detection --json), error
+    (null unless detection failed) and elapsed time in seconds.''')
+
+    parser.add_argument('media', nargs='*',
+                        help='''media to analyze. Directories are scanned recursively.''')
+
+    parser.add_argument('-l', '--file-list',
+                        help='''file containing the paths of media to analyze, one per line.
+        Use - for reading paths from stdin.''')
+
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='''Number of worker processes. Default value: number of CPUs''')
+
+    parser.add_argument('--max-pending', type=int,
+                        help='''Maximum number of media submitted to the workers at once.
+        Default value: twice the number of workers''')
+
+    parser.add_argument('-o', '--output', default=sys.stdout, type=argparse.FileType('w'),
+                        help='output JSON lines file. Default value: /dev/stdout.')
+
+    parser.add_argument('--features-dir',
+                        help='''Directory storing compact frame features of each media, from
+        which bips are detected. Later runs with the same options reuse the
+        stored features instead of decoding media, and detection thresholds
+        can be tuned from them (see speaking_clock_detection.features).
+        '--refresh' extracts features again. Not compatible with
+        '--early-exit' and '--windows', and the result cache is not used.''')
+
+    add_detection_arguments(parser)
+    args = parser.parse_args(argv)
+    check_detection_arguments(parser, args)
+    if not args.media and args.file_list is None:
+        parser.error('no media to analyze: provide media paths or a file list')
+
+    paths = iter_media_paths(args.media, args.file_list)
+    if args.features_dir:
+        if args.early_exit or args.windows:
+            parser.error('--features-dir requires analyzing whole media')
+        if args.profile:
+            parser.error('--features-dir is not compatible with --profile')
+        options = detection_options(args)
+        for name in ('early_exit', 'confidence', 'windows', 'window_dur', 'profile'):
+            del options[name]
+        options.update(features_dir=args.features_dir, refresh=args.refresh)
+    else:
+        options = dict(cache_options(args), **detection_options(args))
+    for result in batch_detection(paths, args.jobs, args.max_pending, **options):
+        print(json.dumps(result), file=args.output, flush=True)
+
+def server_main(argv=None):
+    """ speaking_clock_detection_server command line entry point """
+    parser = argparse.ArgumentParser(description='''Speaking Clock detection server.
+    Keeps a pool of worker processes ready, and processes detection jobs
+    received over HTTP. POST /detect with a JSON object such as
+    {"media": "/path/to/media.wav", "tracks": "0:1,2"} returns the same JSON
+    object as speaking_clock_detection_batch. Detection options given on
+    the command line are the defaults of every request, which may override
+    tracks, decode, decoder, precision, features, pattern, early_exit,
+    confidence, windows, window_dur, profile and refresh. GET /health returns the server status.
+    SIGTERM and SIGINT stop the server once pending jobs are done.''')
+
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='''Address listened to. Default value: 127.0.0.1''')
+
+    parser.add_argument('--port', default=8642, type=int,
+                        help='''TCP port listened to. Default value: 8642''')
+
+    parser.add_argument('-u', '--unix-socket',
+                        help='''Listen to a Unix domain socket created at this path, instead
+        of a TCP port.''')
+
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='''Number of worker processes. Default value: number of CPUs''')
+
+    parser.add_argument('-q', '--queue-depth', default=16, type=int,
+                        help='''Maximum number of jobs waiting for a free worker. Requests
+        received when the queue is full are rejected with HTTP status 503.
+        Default value: 16''')
+
+    add_detection_arguments(parser)
+    args = parser.parse_args(argv)
+    check_detection_arguments(parser, args)
+
+    service = DetectionService(args.jobs, args.queue_depth,
+                               dict(cache_options(args), **detection_options(args)))
+    if args.unix_socket:
+        server = UnixDetectionHTTPServer(args.unix_socket, service)
+    else:
+        server = DetectionHTTPServer((args.host, args.port), service)
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever to return: call it from another thread
+        threading.Thread(target=server.shutdown).start()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print('listening on %s with %d workers' % (args.unix_socket or '%s:%d' % (args.host, args.port),
+                                              service.jobs), file=sys.stderr, flush=True)
+    serve(server)
+
+def float_list(spec):
+    """ parse a comma separated list of numbers """
+    return [float(v) for v in spec.split(',')]
+
+def tolerance_list(spec):
+    """ parse a comma separated list of LOW:HIGH tolerances """
+    try:
+        return [tuple(float(v) for v in t.split(':')) for t in spec.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid tolerances %s' % spec)
+
+def sweep_main(argv=None):
+    """ speaking_clock_detection_sweep command line entry point """
+    parser = argparse.ArgumentParser(description='''Speaking Clock detection thresholds sweep.
+    Evaluates every combination of the given detection thresholds over a
+    labeled corpus, using the frame features stored in a features
+    directory (see speaking_clock_detection_batch --features-dir), which
+    are extracted first for media that have not been processed yet.
+    Prints one JSON line per combination, sorted by decreasing accuracy,
+    with the thresholds, the accuracy, and the amount of media whose
+    speaking clock track or absence has been correctly found (correct),
+    whose speaking clock has been missed (missed), has been found in a
+    media without speaking clock (false_alarm), in a wrong track
+    (wrong_track) or in several tracks (multiple).''')
+
+    parser.add_argument('labels',
+                        help='''labeled corpus: one media per line, followed by the label of its
+        speaking clock track as printed by speaking_clock_detection (such as 1
+        or 2:0), or NONE''')
+
+    parser.add_argument('--features-dir', required=True,
+                        help='''Directory storing the frame features of the media''')
+
+    parser.add_argument('--ratio', default=[RATIO_THR], type=float_list,
+                        help='''Comma separated frame energy ratio thresholds around 1000Hz.
+        Values below %g require fft features. Default value: %g'''
+                        % (REGIONS_RATIO, RATIO_THR))
+
+    parser.add_argument('--min-dur', default=[MIN_DUR], type=float_list,
+                        help='''Comma separated minimal bip durations, in seconds.
+        Default value: %g''' % MIN_DUR)
+
+    parser.add_argument('--max-dur', default=[MAX_DUR], type=float_list,
+                        help='''Comma separated maximal bip durations, in seconds.
+        Default value: %g''' % MAX_DUR)
+
+    parser.add_argument('--energy', default=[ENERGY_THR], type=float_list,
+                        help='''Comma separated bip energy thresholds, relative to the max
+        energy of bip candidates. Default value: %g''' % ENERGY_THR)
+
+    parser.add_argument('--tolerance', default=[TOLERANCE], type=tolerance_list,
+                        help='''Comma separated LOW:HIGH bounds of the amount of bips relative
+        to the expected amount, for media lasting at least %g seconds.
+        Default value: %g:%g''' % ((SHORT_DUR,) + TOLERANCE))
+
+    parser.add_argument('--short-tolerance', default=[SHORT_TOLERANCE], type=tolerance_list,
+                        help='''Same as '--tolerance', for media shorter than %g seconds.
+        Default value: %g:%g''' % ((SHORT_DUR,) + SHORT_TOLERANCE))
+
+    parser.add_argument('--top', type=int,
+                        help='''Print only the TOP most accurate combinations''')
+
+    parser.add_argument('-b', '--decoder', default='ffmpeg', choices=['auto'] + sorted(DECODERS),
+                        help='''Decoder backend used to extract missing features, see
+        speaking_clock_detection. Default value: ffmpeg''')
+
+    parser.add_argument('-p', '--precision', default='float64', choices=PRECISIONS,
+                        help='''Numerical precision of features. Default value: float64''')
+
+    parser.add_argument('-x', '--features', default='fft', choices=FEATURES,
+                        help='''Frame energy computation of features. Default value: fft''')
+
+    parser.add_argument('-f', '--ffmpeg', default='ffmpeg',
+                        help='''Full path to ffmpeg binary''')
+
+    parser.add_argument('--ffprobe',
+                        help='''Full path to ffprobe binary. Default: ffprobe binary found
+        next to FFMPEG''')
+
+    parser.add_argument('-o', '--output', default=sys.stdout, type=argparse.FileType('w'),
+                        help='output JSON lines file. Default value: /dev/stdout.')
+
+    args = parser.parse_args(argv)
+    if args.features != 'fft' and min(args.ratio) < REGIONS_RATIO:
+        parser.error('ratio thresholds below %g require fft features' % REGIONS_RATIO)
+
+    # features are loaded once, media that cannot be analyzed are skipped
+    corpus = []
+    labels = load_labels(args.labels)
+    options = dict(decoder=args.decoder, precision=args.precision, features=args.features,
+                   ffmpeg=args.ffmpeg, ffprobe=args.ffprobe)
+    for media, label in labels:
+        try:
+            corpus.extend(load_corpus([(media, label)], args.features_dir, args.ratio, **options))
+        except Exception as err:
+            print('skipping %s: %s: %s' % (media, type(err).__name__, err), file=sys.stderr)
+    print('%d media loaded' % len(corpus), file=sys.stderr, flush=True)
+
+    results = threshold_sweep(corpus, args.ratio, args.min_dur, args.max_dur, args.energy,
+                              args.tolerance, args.short_tolerance)
+    results.sort(key=lambda r: r['accuracy'], reverse=True)
+    for result in results[:args.top]:
+        print(json.dumps(result), file=args.output)
+
+def live_main(argv=None):
+    """ speaking_clock_detection_live command line entry point """
+    parser = argparse.ArgumentParser(description='''Live Speaking Clock monitoring.
+    Decodes a live input with ffmpeg as it is received, analyzes each
+    channel in a rolling window, and prints a JSON line whenever the
+    speaking clock status of a channel changes, with fields: time (end of
+    the window, in seconds from the start of input), timestamp (wall
+    clock, in seconds since the epoch), track, speaking_clock (status) and
+    bips (amount of bips in the window). The first status of each channel
+    is printed once WINDOW seconds have been received.''')
+
+    parser.add_argument('input',
+                        help='''any input supported by ffmpeg: UDP or RTP URL, named pipe,
+        file... Use - for standard input.''')
+
+    parser.add_argument('-s', '--stream', default=0, type=int,
+                        help='''Audio stream to monitor. Default value: 0''')
+
+    parser.add_argument('-a', '--channels', type=lambda spec: [int(c) for c in spec.split(',')],
+                        help='''Comma separated list of the channels to monitor. Default: all
+        the channels of the audio stream''')
+
+    parser.add_argument('-w', '--window', default=60., type=float,
+                        help='''Duration in seconds of the rolling analysis window. Speaking
+        clocks have 8 bips per minute: windows should last at least 60
+        seconds. Default value: 60''')
+
+    parser.add_argument('--hop', default=1., type=float,
+                        help='''Duration in seconds of the signal received between two
+        verdicts, bounding the latency of events. Default value: 1''')
+
+    parser.add_argument('-p', '--precision', default='float64', choices=PRECISIONS,
+                        help='''Numerical precision, see speaking_clock_detection.
+        Default value: float64''')
+
+    parser.add_argument('-x', '--features', default='fft', choices=FEATURES,
+                        help='''Frame energy computation, see speaking_clock_detection.
+        Default value: fft''')
+
+    parser.add_argument('-f', '--ffmpeg', default='ffmpeg',
+                        help='''Full path to ffmpeg binary''')
+
+    parser.add_argument('-o', '--output', default=sys.stdout, type=argparse.FileType('w'),
+                        help='output JSON lines file. Default value: /dev/stdout.')
+
+    args = parser.parse_args(argv)
+    # SIGTERM stops monitoring like SIGINT, killing ffmpeg
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    events = live_events(args.input, args.ffmpeg, args.stream, args.channels, args.window,
+                         args.hop, args.features, args.precision)
+    try:
+        for event in events:
+            print(json.dumps(event), file=args.output, flush=True)
+    except KeyboardInterrupt:
+        events.close()
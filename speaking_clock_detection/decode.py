@@ -0,0 +1,790 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Media decoding to numpy arrays sampled at 4kHz, with ffmpeg, soundfile
+or PyAV decoder backends
+"""
+
+import sys
+import os.path
+import threading
+import importlib.util
+from math import gcd
+import soundfile
+import numpy as np
+
+from scipy.signal import resample_poly
+from subprocess import check_output, STDOUT, CalledProcessError, Popen, PIPE
+
+from .profiling import stage
+
+def ffprobe_path(ffmpeg, ffprobe=None):
+    """
+    Return the ffprobe binary 'ffprobe' if provided, or guess the ffprobe
+    binary shipped together with a given ffmpeg binary
+    """
+    if ffprobe:
+        return ffprobe
+    head, tail = os.path.split(ffmpeg)
+    return os.path.join(head, tail.replace('ffmpeg', 'ffprobe'))
+
+def probe_audio(infname, ffprobe='ffprobe'):
+    """
+    Return the number of channels of each audio stream of a media, and the
+    media duration (in seconds, None if unknown)
+    """
+    try:
+        with stage('probe'):
+            out = check_output(probe_command(infname, ffprobe), stderr=STDOUT)
+    except CalledProcessError as err:
+        print(err.output, file=sys.stderr)
+        raise err
+    except FileNotFoundError:
+        raise missing_ffprobe(ffprobe)
+    return parse_probe(out, infname)
+
+def missing_ffprobe(ffprobe):
+    """ error raised when the ffprobe binary cannot be found """
+    return FileNotFoundError('ffprobe binary %s not found: ffmpeg decoding requires ffprobe, '
+                             'whose path may be given with the ffprobe option' % ffprobe)
+
+def probe_command(infname, ffprobe='ffprobe'):
+    """ ffprobe command used by probe_audio """
+    return [ffprobe, '-v', 'error', '-select_streams', 'a',
+            '-show_entries', 'stream=channels:format=duration',
+            '-of', 'default=noprint_wrappers=1', infname]
+
+def parse_probe(out, infname):
+    """ parse the output of probe_command """
+    stream_channels = []
+    duration = None
+    for line in out.decode().split():
+        key, _, value = line.partition('=')
+        if key == 'channels':
+            stream_channels.append(int(value))
+        elif key == 'duration':
+            try:
+                duration = float(value)
+            except ValueError:
+                pass
+    assert len(stream_channels) > 0, 'no audio stream found in %s' % infname
+    return stream_channels, duration
+
+def parse_tracks(spec):
+    """
+    Parse a comma separated list of audio tracks: 'stream:channel' for a
+    single channel of an audio stream, or 'stream' for all its channels.
+    Streams and channels are numbered from 0. Example: '0:1,2'
+    """
+    tracks = []
+    for track in spec.split(','):
+        stream, _, channel = track.partition(':')
+        tracks.append((int(stream), int(channel) if channel else None))
+    return tracks
+
+def select_tracks(stream_channels, tracks=None):
+    """
+    Return the sorted list of (stream, channel) audio tracks to be decoded,
+    given the number of channels of each audio stream of a media.
+    tracks: list of (stream, channel) tuples, channel being None for all the
+    channels of a stream. Default: all the channels of all audio streams.
+    """
+    if tracks is None:
+        tracks = [(stream, None) for stream in range(len(stream_channels))]
+    ret = set()
+    for stream, channel in tracks:
+        if not 0 <= stream < len(stream_channels):
+            raise ValueError('audio stream %d not found: media has %d audio streams'
+                             % (stream, len(stream_channels)))
+        if channel is None:
+            ret.update((stream, c) for c in range(stream_channels[stream]))
+        elif not 0 <= channel < stream_channels[stream]:
+            raise ValueError('channel %d not found: audio stream %d has %d channels'
+                             % (channel, stream, stream_channels[stream]))
+        else:
+            ret.add((stream, channel))
+    return sorted(ret)
+
+def track_labels(tracks):
+    """
+    Return the labels of a list of (stream, channel) tracks: channel numbers
+    for media with a single audio stream, 'stream:channel' otherwise
+    """
+    if len(set(stream for stream, _ in tracks)) == 1 and tracks[0][0] == 0:
+        return [str(channel) for _, channel in tracks]
+    return ['%d:%d' % track for track in tracks]
+
+def seek_args(start=None, duration=None):
+    """
+    ffmpeg input options restricting decoding to 'duration' seconds of
+    media, starting at 'start' seconds
+    """
+    args = []
+    if start:
+        args += ['-ss', '%.3f' % start]
+    if duration is not None:
+        args += ['-t', '%.3f' % duration]
+    return args
+
+def map_args(tracks, stream_channels, outsr):
+    """
+    ffmpeg output options mapping (stream, channel) audio tracks to the
+    channels of a single audio output sampled at 'outsr' Hz.
+    Channels are selected with pan filter, and streams are merged with
+    amerge filter, which stops at the end of the shortest stream.
+    """
+    streams = sorted(set(stream for stream, _ in tracks))
+    if len(streams) == 1 and len(tracks) == stream_channels[streams[0]]:
+        return ['-map', '0:a:%d' % streams[0], '-ar', str(outsr)]
+
+    filters = []
+    for i, stream in enumerate(streams):
+        channels = [c for s, c in tracks if s == stream]
+        pan = ''
+        if len(channels) < stream_channels[stream]:
+            pan = 'pan=%dc|%s,' % (len(channels), '|'.join(
+                ['c%d=c%d' % (j, c) for j, c in enumerate(channels)]))
+        # unspecified channel layouts prevent amerge from reordering channels
+        filters.append('[0:a:%d]%saresample=%d,aformat=channel_layouts=%dc[a%d]'
+                       % (stream, pan, outsr, len(channels), i))
+    if len(streams) == 1:
+        return ['-filter_complex', filters[0], '-map', '[a0]']
+    filters.append(''.join(['[a%d]' % i for i in range(len(streams))])
+                   + 'amerge=inputs=%d[a]' % len(streams))
+    return ['-filter_complex', ';'.join(filters), '-map', '[a]']
+
+PRECISIONS = ('float64', 'float32')
+
+# detect decoding methods, see detection.detect
+DECODE_METHODS = ('pipe', 'file', 'stream')
+
+def check_precision(precision):
+    """ raise ValueError for unknown precisions """
+    if precision not in PRECISIONS:
+        raise ValueError('unknown precision %s' % precision)
+
+def pcm_samples(pcm, precision='float64'):
+    """
+    Convert 16 bits PCM samples to the given precision: 'float64' samples are
+    scaled to [-1, 1] as done by soundfile.read, while 'float32' precision
+    keeps samples as int16 until filtering (see preemp)
+    """
+    check_precision(precision)
+    if precision == 'float32':
+        return pcm
+    return pcm / 32768.
+
+def _decode_file(infname, tmpdir, ffmpeg, outsr, start=None, duration=None, precision='float64',
+                 tracks=None, ffprobe=None):
+    """
+    Decode media to a temporary wav file stored in tmpdir, and read it back
+    """
+    assert os.path.exists(tmpdir), 'temp directory %s should exist!' % tmpdir
+    # set temp wav file name
+    _, tail = os.path.split(infname)
+    tmp_wav = '%s/%s.wav' % (tmpdir, tail)
+    assert not os.path.exists(tmp_wav), 'Temp Wav %s already exists! Remove it first' % tmp_wav
+
+    stream_channels, _ = probe_audio(infname, ffprobe_path(ffmpeg, ffprobe))
+    tracks = select_tracks(stream_channels, tracks)
+
+    # performs media decoding to wav with ffmpeg
+    cmd = [ffmpeg] + seek_args(start, duration) + ['-i', infname] + \
+        map_args(tracks, stream_channels, outsr) + ['-acodec', 'pcm_s16le', tmp_wav]
+    try:
+        with stage('decode'):
+            check_output(cmd, stderr=STDOUT)
+    except CalledProcessError as err:
+        if os.path.exists(tmp_wav):
+            os.remove(tmp_wav)
+        print(err.output, file=sys.stderr)
+        raise err
+
+    # decode wav and check wav properties
+    with stage('load'):
+        wav_data, fs = soundfile.read(tmp_wav, dtype='int16', always_2d=True)
+        os.remove(tmp_wav)
+        assert fs == outsr
+        return pcm_samples(wav_data, precision)
+
+def pipe_command(infname, ffmpeg, outsr, start, duration, tracks, stream_channels,
+                 follow=None):
+    """
+    ffmpeg command decoding (stream, channel) audio tracks of a media, and
+    writing raw s16le samples sampled at 'outsr' Hz to its standard output.
+    follow: if set, media is a file still being written, which is read
+    until it has not grown for 'follow' seconds
+    """
+    follow_args = []
+    if follow is not None:
+        # file protocol waits for new data, until rw_timeout (microseconds)
+        follow_args = ['-follow', '1', '-rw_timeout', '%d' % (follow * 1e6)]
+        infname = 'file:' + infname
+    return [ffmpeg, '-nostdin', '-v', 'error'] + seek_args(start, duration) + follow_args + \
+        ['-i', infname] + map_args(tracks, stream_channels, outsr) + \
+        ['-f', 's16le', '-acodec', 'pcm_s16le'] + \
+        (['-flush_packets', '1'] if follow is not None else []) + ['-']
+
+def decoded_duration(media_duration, start=None, duration=None):
+    """
+    Expected duration of the samples decoded from 'start' during 'duration'
+    seconds of a media lasting 'media_duration' seconds (None if unknown)
+    """
+    ret = media_duration
+    if ret is not None:
+        ret = max(ret - (start or 0), 0)
+    if duration is not None:
+        ret = duration if ret is None else min(duration, ret)
+    return ret
+
+class FFmpegPipe:
+    """
+    ffmpeg process decoding (stream, channel) audio tracks of a media, all
+    the channels of all audio streams by default, and writing raw s16le
+    samples sampled at 'outsr' Hz to its standard output.
+    Decoding may be restricted to 'duration' seconds starting at 'start'.
+    follow: see pipe_command
+    ffprobe: ffprobe binary probing media, guessed from ffmpeg if None
+    """
+    def __init__(self, infname, ffmpeg='ffmpeg', outsr=4000, start=None, duration=None,
+                 tracks=None, follow=None, ffprobe=None):
+        stream_channels, media_duration = probe_audio(infname, ffprobe_path(ffmpeg, ffprobe))
+        self.tracks = select_tracks(stream_channels, tracks)
+        self.nchannels = len(self.tracks)
+        self.duration = decoded_duration(media_duration, start, duration)
+        self.frame_bytes = 2 * self.nchannels
+        self.cmd = pipe_command(infname, ffmpeg, outsr, start, duration, self.tracks,
+                                stream_channels, follow)
+        self._start()
+
+    def _start(self):
+        """ start ffmpeg process running self.cmd """
+        self.proc = Popen(self.cmd, stdout=PIPE, stderr=PIPE)
+        # stderr is consumed in a separate thread to avoid pipe deadlocks
+        self._errors = []
+        self._stderr_reader = threading.Thread(
+            target=lambda: self._errors.append(self.proc.stderr.read()))
+        self._stderr_reader.start()
+
+    def readinto(self, buf, pos=0):
+        """
+        Fill buf from position pos with decoded bytes, until buf is full or
+        decoding is over. Returns the position reached in buf
+        """
+        while pos < len(buf):
+            with memoryview(buf)[pos:] as view:
+                nread = self.proc.stdout.readinto(view)
+            if not nread:
+                break
+            pos += nread
+        return pos
+
+    def close(self, kill=False):
+        """
+        Wait for ffmpeg termination, raising CalledProcessError if decoding
+        failed. If kill is True, decoding is stopped without error.
+        """
+        if kill and self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.stdout.close()
+        self.proc.wait()
+        self._stderr_reader.join()
+        if not kill and self.proc.returncode != 0:
+            print(self._errors[0], file=sys.stderr)
+            raise CalledProcessError(self.proc.returncode, self.cmd, output=self._errors[0])
+
+def _decode_pipe(infname, ffmpeg, outsr, start=None, duration=None, precision='float64',
+                 tracks=None, follow=None, ffprobe=None):
+    """
+    Decode media with ffmpeg writing raw s16le samples to its standard output.
+    Samples are read directly into a buffer preallocated from the media
+    duration: no temporary file is used, and no intermediate copy is made.
+    """
+    pipe = FFmpegPipe(infname, ffmpeg, outsr, start, duration, tracks, follow, ffprobe)
+    try:
+        # one extra second of margin for resampler delay and duration rounding
+        nframes = int((pipe.duration if pipe.duration else 60) * outsr) + outsr
+        with stage('decode'):
+            buf = bytearray(nframes * pipe.frame_bytes)
+            pos = pipe.readinto(buf)
+            while pos == len(buf):
+                # duration was unknown or underestimated
+                buf.extend(bytes(len(buf) // 2 + pipe.frame_bytes))
+                pos = pipe.readinto(buf, pos)
+    except BaseException:
+        pipe.close(kill=True)
+        raise
+    with stage('decode'):
+        pipe.close()
+    assert pos % pipe.frame_bytes == 0
+
+    with stage('load'):
+        pcm = np.frombuffer(buf, dtype='<i2', count=pos // 2).reshape(-1, pipe.nchannels)
+        return pcm_samples(pcm, precision)
+
+def _pipe_blocks(infname, ffmpeg, outsr, blocksize, start=None, duration=None,
+                 precision='float64', tracks=None, follow=None, ffprobe=None):
+    """
+    Decode media with ffmpeg writing raw s16le samples to its standard
+    output, and yield successive blocks of 'blocksize' samples
+    """
+    pipe = FFmpegPipe(infname, ffmpeg, outsr, start, duration, tracks, follow, ffprobe)
+    try:
+        while True:
+            # samples are not copied: each block gets its own buffer
+            with stage('decode'):
+                buf = bytearray(blocksize * pipe.frame_bytes)
+                pos = pipe.readinto(buf)
+            assert pos % pipe.frame_bytes == 0
+            if pos > 0:
+                with stage('load'):
+                    pcm = np.frombuffer(buf, dtype='<i2', count=pos // 2)
+                    block = pcm_samples(pcm.reshape(-1, pipe.nchannels), precision)
+                yield block
+            if pos < len(buf):
+                break
+    except BaseException:
+        pipe.close(kill=True)
+        raise
+    with stage('decode'):
+        pipe.close()
+
+
+class FFmpegDecoder:
+    """
+    Decode any media with an ffmpeg subprocess.
+    method: 'pipe' reads samples from ffmpeg standard output, 'file' uses a
+    temporary wav file stored in tmpdir.
+    precision: 'float64' returns samples scaled to [-1, 1], 'float32' returns
+    int16 samples.
+    All the selected tracks are decoded by a single ffmpeg process.
+    follow: if set, media is a file still being written, such as a recording
+    in progress: decoding waits for new audio to be appended, and ends once
+    the file has not grown for 'follow' seconds. Requires method 'pipe'.
+    ffprobe: ffprobe binary probing media, guessed from ffmpeg if None (see
+    ffprobe_path)
+    """
+    name = 'ffmpeg'
+
+    def __init__(self, ffmpeg='ffmpeg', tmpdir=None, method='pipe', precision='float64',
+                 follow=None, ffprobe=None):
+        if method not in ('pipe', 'file'):
+            raise ValueError('unknown decoding method %s' % method)
+        if follow is not None and method != 'pipe':
+            raise ValueError('following growing files requires pipe decoding method')
+        check_precision(precision)
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe_path(ffmpeg, ffprobe)
+        self.tmpdir = tmpdir
+        self.method = method
+        self.precision = precision
+        self.follow = follow
+
+    @staticmethod
+    def accepts(infname):
+        """ ffmpeg is able to decode any media """
+        return True
+
+    def probe(self, infname):
+        """
+        return the number of channels of each audio stream of a media, and
+        its duration
+        """
+        return probe_audio(infname, self.ffprobe)
+
+    def select_tracks(self, infname, tracks=None):
+        """ return the list of (stream, channel) tracks to be decoded """
+        return select_tracks(self.probe(infname)[0], tracks)
+
+    def decode(self, infname, outsr=4000, start=None, duration=None, tracks=None):
+        """ decode media to a numpy array of shape (samples, tracks) """
+        if self.method == 'file':
+            return _decode_file(infname, self.tmpdir, self.ffmpeg, outsr, start, duration,
+                                self.precision, tracks, self.ffprobe)
+        return _decode_pipe(infname, self.ffmpeg, outsr, start, duration, self.precision,
+                            tracks, self.follow, self.ffprobe)
+
+    def blocks(self, infname, outsr=4000, blocksize=240000, start=None, duration=None,
+               tracks=None):
+        """ yield successive blocks of 'blocksize' decoded samples """
+        return _pipe_blocks(infname, self.ffmpeg, outsr, blocksize, start, duration,
+                            self.precision, tracks, self.follow, self.ffprobe)
+
+
+class SoundfileDecoder:
+    """
+    Decode audio files supported by libsndfile in-process with soundfile,
+    without spawning ffmpeg. Signals are read by blocks, and resampled with
+    a polyphase filter.
+    Blocks are read with enough overlap to obtain the same samples as those
+    obtained by resampling the whole file at once.
+    precision: samples are read and resampled as 'float64' or 'float32'.
+    """
+    name = 'soundfile'
+    extensions = ('.wav', '.bwf', '.rf64', '.w64', '.flac', '.aif', '.aiff')
+
+    def __init__(self, precision='float64'):
+        check_precision(precision)
+        self.precision = precision
+
+    @classmethod
+    def accepts(cls, infname):
+        """ tell if media is an audio file that can be read with soundfile """
+        if os.path.splitext(infname)[1].lower() not in cls.extensions:
+            return False
+        try:
+            soundfile.info(infname)
+        except RuntimeError:
+            return False
+        return True
+
+    def probe(self, infname):
+        """
+        return the number of channels of each audio stream of a media, and
+        its duration
+        """
+        with stage('probe'):
+            info = soundfile.info(infname)
+        return [info.channels], info.frames / float(info.samplerate)
+
+    def select_tracks(self, infname, tracks=None):
+        """ return the list of (stream, channel) tracks to be decoded """
+        return select_tracks(self.probe(infname)[0], tracks)
+
+    def decode(self, infname, outsr=4000, start=None, duration=None, tracks=None):
+        """ decode media to a numpy array of shape (samples, tracks) """
+        tracks = self.select_tracks(infname, tracks)
+        with soundfile.SoundFile(infname) as f:
+            first, last, up, down = sample_bounds(f.frames, f.samplerate, outsr, start, duration)
+        return concatenate_blocks(self.blocks(infname, outsr, 240000, start, duration, tracks),
+                                  -(-(last - first) * up // down), len(tracks), self.precision)
+
+    def blocks(self, infname, outsr=4000, blocksize=240000, start=None, duration=None,
+               tracks=None):
+        """ yield successive blocks of 'blocksize' decoded samples """
+        channels = [channel for _, channel in self.select_tracks(infname, tracks)]
+        with soundfile.SoundFile(infname) as f:
+            def read(lo, hi):
+                with stage('decode'):
+                    f.seek(lo)
+                    data = f.read(hi - lo, dtype=self.precision, always_2d=True)
+                with stage('load'):
+                    if len(channels) < f.channels:
+                        data = data[:, channels]
+                    return data
+            bounds = sample_bounds(f.frames, f.samplerate, outsr, start, duration)
+            for block in resampled_blocks(read, blocksize, *bounds):
+                yield block
+
+
+class ArrayDecoder:
+    """
+    Decoder backend for signals already loaded in memory, given as numpy
+    arrays of shape (samples,) or (samples, channels) sampled at 'samplerate'
+    Hz. Such signals have a single audio stream. int16 arrays are considered
+    as 16 bits PCM samples. Signals are resampled by blocks as done by
+    SoundfileDecoder.
+    precision: 'float64' returns samples scaled to [-1, 1] for int16 arrays,
+    'float32' keeps int16 samples when no resampling is needed, and returns
+    float32 samples otherwise.
+    """
+    name = 'array'
+
+    def __init__(self, samplerate, precision='float64'):
+        check_precision(precision)
+        self.samplerate = int(samplerate)
+        self.precision = precision
+
+    @staticmethod
+    def accepts(data):
+        """ tell if media is a numpy array """
+        return isinstance(data, np.ndarray)
+
+    def probe(self, data):
+        """
+        return the number of channels of the signal, as a single audio
+        stream, and its duration
+        """
+        data = as_2d(data)
+        return [data.shape[1]], data.shape[0] / float(self.samplerate)
+
+    def select_tracks(self, data, tracks=None):
+        """ return the list of (stream, channel) tracks to be decoded """
+        return select_tracks(self.probe(data)[0], tracks)
+
+    def decode(self, data, outsr=4000, start=None, duration=None, tracks=None):
+        """ return the signal as a numpy array of shape (samples, tracks) """
+        data = as_2d(data)
+        tracks = self.select_tracks(data, tracks)
+        first, last, up, down = sample_bounds(len(data), self.samplerate, outsr, start,
+                                              duration)
+        dtype = self.precision
+        if data.dtype == np.int16 and self.precision == 'float32' and up == down:
+            dtype = np.int16
+        return concatenate_blocks(self.blocks(data, outsr, 240000, start, duration, tracks),
+                                  -(-(last - first) * up // down), len(tracks), dtype)
+
+    def blocks(self, data, outsr=4000, blocksize=240000, start=None, duration=None,
+               tracks=None):
+        """ yield successive blocks of 'blocksize' samples """
+        channels = [channel for _, channel in self.select_tracks(data, tracks)]
+        data = as_2d(data)
+        bounds = sample_bounds(len(data), self.samplerate, outsr, start, duration)
+        resample = bounds[2] != bounds[3]
+
+        def read(lo, hi):
+            with stage('load'):
+                block = data[lo:hi, channels]
+                if block.dtype != np.int16:
+                    return block.astype(self.precision)
+                block = pcm_samples(block, self.precision)
+                return block.astype(np.float32) if resample and block.dtype == np.int16 else block
+        for block in resampled_blocks(read, blocksize, *bounds):
+            yield block
+
+
+def as_2d(data):
+    """ return a signal as an array of shape (samples, channels) """
+    data = np.asarray(data)
+    return data.reshape(len(data), -1)
+
+def sample_bounds(nframes, samplerate, outsr, start=None, duration=None):
+    """
+    return first and last samples to be read in a signal of 'nframes'
+    samples, together with the factors resampling it to 'outsr' Hz
+    """
+    first = min(nframes, int(round((start or 0) * samplerate)))
+    last = nframes
+    if duration is not None:
+        last = min(last, first + int(round(duration * samplerate)))
+    g = gcd(samplerate, outsr)
+    return first, last, outsr // g, samplerate // g
+
+def resampled_blocks(read, blocksize, first, last, up, down):
+    """
+    Yield successive blocks of 'blocksize' samples of a signal resampled by a
+    factor up / down with a polyphase filter. read(lo, hi) returns samples lo
+    to hi of the input signal, as a (samples, channels) array.
+    Blocks are read with enough overlap to obtain the same samples as those
+    obtained by resampling the whole signal at once.
+    """
+    # input block size and overlap are multiples of 'down', so that
+    # each block is aligned with the polyphase filter phases
+    in_block = max(1, blocksize // up) * down
+    half_len = 10 * max(up, down) // up + 1
+    margin = -(-half_len // down) * down if up != down else 0
+    nout = -(-(last - first) * up // down)
+    for pos in range(first, last, in_block):
+        lo = max(first, pos - margin)
+        hi = min(last, pos + in_block + margin)
+        data = read(lo, hi)
+        if up != down:
+            with stage('load'):
+                data = resample_poly(data, up, down, axis=0)
+        offset = (pos - lo) * up // down
+        out_pos = (pos - first) * up // down
+        yield data[offset:(offset + min(in_block * up // down, nout - out_pos))]
+
+def concatenate_blocks(blocks, nsamples, ntracks, dtype):
+    """ concatenate blocks of samples into a preallocated array """
+    ret = np.empty((nsamples, ntracks), dtype=dtype)
+    pos = 0
+    for block in blocks:
+        with stage('load'):
+            ret[pos:(pos + len(block))] = block
+        pos += len(block)
+    assert pos == len(ret)
+    return ret
+
+
+class PyAVDecoder:
+    """
+    Decode any media in-process with PyAV (ffmpeg libraries bindings),
+    without spawning ffmpeg. PyAV is an optional dependency.
+    precision: 'float64' returns samples scaled to [-1, 1], 'float32' returns
+    int16 samples.
+    All the selected audio streams are demuxed together, and decoding stops
+    at the end of the shortest one.
+    """
+    name = 'pyav'
+
+    def __init__(self, precision='float64'):
+        check_precision(precision)
+        self.precision = precision
+
+    @staticmethod
+    def accepts(infname):
+        """ PyAV is able to decode any media, if installed """
+        return importlib.util.find_spec('av') is not None
+
+    def probe(self, infname):
+        """
+        return the number of channels of each audio stream of a media, and
+        its duration
+        """
+        import av
+        with av.open(infname) as container:
+            streams = container.streams.audio
+            assert len(streams) > 0, 'no audio stream found in %s' % infname
+            duration = None
+            if streams[0].duration is not None:
+                duration = float(streams[0].duration * streams[0].time_base)
+            elif container.duration is not None:
+                duration = container.duration / float(av.time_base)
+            return [stream.channels for stream in streams], duration
+
+    def select_tracks(self, infname, tracks=None):
+        """ return the list of (stream, channel) tracks to be decoded """
+        return select_tracks(self.probe(infname)[0], tracks)
+
+    def decode(self, infname, outsr=4000, start=None, duration=None, tracks=None):
+        """ decode media to a numpy array of shape (samples, tracks) """
+        return np.concatenate(list(self.blocks(infname, outsr, 240000, start, duration, tracks)))
+
+    def blocks(self, infname, outsr=4000, blocksize=240000, start=None, duration=None,
+               tracks=None):
+        """ yield successive blocks of 'blocksize' decoded samples """
+        import av
+        with av.open(infname) as container:
+            audio = container.streams.audio
+            tracks = select_tracks([stream.channels for stream in audio], tracks)
+            streams = sorted(set(stream for stream, _ in tracks))
+            channels = [[c for s, c in tracks if s == stream] for stream in streams]
+            # global stream index -> position in streams
+            positions = dict((audio[stream].index, i) for i, stream in enumerate(streams))
+            resamplers = [av.AudioResampler(format='s16', layout=audio[stream].layout, rate=outsr)
+                          for stream in streams]
+            if start:
+                container.seek(int(start * av.time_base))
+            # samples to skip after seeking, and samples to be decoded
+            skip = [None] * len(streams)
+            remaining = None if duration is None else int(round(duration * outsr))
+            pending = [[] for _ in streams]
+            npending = [0] * len(streams)
+
+            def push(i, frame):
+                """ resample a decoded frame of the i-th stream """
+                if skip[i] is None and frame is not None:
+                    # seeking lands on the packet preceding start
+                    skip[i] = max(0, int(round(((start or 0) - (frame.time or 0)) * outsr)))
+                for out in resamplers[i].resample(frame):
+                    pcm = out.to_ndarray().reshape(-1, audio[streams[i]].channels)
+                    pcm = pcm[:, channels[i]]
+                    if skip[i]:
+                        nskip = min(skip[i], len(pcm))
+                        pcm = pcm[nskip:]
+                        skip[i] -= nskip
+                    pending[i].append(pcm)
+                    npending[i] += len(pcm)
+
+            def pop(n):
+                """ return n samples of all the streams """
+                with stage('load'):
+                    ret = []
+                    for i in range(len(streams)):
+                        data = np.concatenate(pending[i])
+                        ret.append(data[:n])
+                        pending[i] = [data[n:]]
+                        npending[i] -= n
+                    return pcm_samples(np.concatenate(ret, axis=1), self.precision)
+
+            for packet in container.demux([audio[stream] for stream in streams]):
+                i = positions[packet.stream.index]
+                with stage('decode'):
+                    for frame in packet.decode():
+                        push(i, frame)
+                while min(npending) >= blocksize and (remaining is None or remaining > 0):
+                    n = blocksize if remaining is None else min(blocksize, remaining)
+                    yield pop(n)
+                    if remaining is not None:
+                        remaining -= n
+                if remaining is not None and remaining <= 0:
+                    return
+            with stage('decode'):
+                for i in range(len(streams)):
+                    push(i, None)
+            n = min(npending) if remaining is None else min(min(npending), remaining)
+            while n > 0:
+                yield pop(min(n, blocksize))
+                n -= min(n, blocksize)
+
+
+DECODERS = {dec.name: dec for dec in (FFmpegDecoder, SoundfileDecoder, PyAVDecoder)}
+
+def check_media(infname):
+    """ check that a media to be decoded from a file can be accessed """
+    if isinstance(infname, (str, bytes, os.PathLike)):
+        assert os.path.exists(infname), 'input media %s cannot be accessed!' % infname
+
+def select_decoder(infname, decoder='ffmpeg', ffmpeg='ffmpeg', tmpdir=None, method='pipe',
+                   precision='float64', ffprobe=None):
+    """
+    Return the decoder object used to decode a media.
+    decoder: one of 'ffmpeg', 'soundfile', 'pyav', or 'auto' for choosing
+    soundfile for the audio files it supports, and ffmpeg otherwise.
+    Decoder objects, such as ArrayDecoder, are returned as is.
+    precision: 'float64', or 'float32' for decoding samples to the most
+    compact format supported by the decoder (int16 or float32).
+    ffprobe: ffprobe binary used by the ffmpeg decoder, see ffprobe_path
+    """
+    if not isinstance(decoder, str):
+        return decoder
+    if decoder == 'auto':
+        if method != 'file' and SoundfileDecoder.accepts(infname):
+            decoder = 'soundfile'
+        else:
+            decoder = 'ffmpeg'
+    if decoder == 'ffmpeg':
+        return FFmpegDecoder(ffmpeg, tmpdir, method, precision, ffprobe=ffprobe)
+    if decoder not in DECODERS:
+        raise ValueError('unknown decoder %s' % decoder)
+    return DECODERS[decoder](precision)
+
+def decode_media(infname, tmpdir=None, ffmpeg='ffmpeg', outsr=4000, method='pipe',
+                 start=None, duration=None, decoder='ffmpeg', precision='float64',
+                 tracks=None, ffprobe=None):
+    """
+    Decode any media to a numpy array sampled at 'outsr' Hz, of shape
+    (samples, tracks)
+    Args:
+    * infname: full path to input media, or numpy array decoded by an
+      ArrayDecoder
+    * tmpdir: directory used to store the temporary wav file (method='file').
+    * ffmpeg: full path to ffmpeg binary.
+    * outsr: output sampling rate.
+    * method: 'pipe' reads samples from ffmpeg standard output (default),
+      'file' uses a temporary wav file stored in tmpdir.
+    * start: if provided, media is decoded from 'start' seconds
+    * duration: if provided, only 'duration' seconds of media are decoded
+    * decoder: 'ffmpeg', 'soundfile', 'pyav', 'auto' or a decoder object (see
+      select_decoder)
+    * precision: 'float64' returns samples scaled to [-1, 1], 'float32'
+      returns int16 or float32 samples, depending on the decoder
+    * tracks: list of (stream, channel) audio tracks to be decoded, see
+      select_tracks. Default: all the channels of all audio streams.
+    * ffprobe: full path to ffprobe binary, guessed from ffmpeg if None.
+    """
+
+    # check input arguments
+    check_media(infname)
+
+    decoder = select_decoder(infname, decoder, ffmpeg, tmpdir, method, precision, ffprobe)
+    wav_data = decoder.decode(infname, outsr, start, duration, tracks)
+
+    assert len(wav_data) > 1  # media should not be empty
+    return wav_data
+
+
+def iter_media_blocks(infname, ffmpeg='ffmpeg', outsr=4000, blocksize=240000,
+                      start=None, duration=None, decoder='ffmpeg', precision='float64',
+                      tracks=None, ffprobe=None):
+    """
+    Decode any media and yield successive blocks of 'blocksize' samples
+    (the last block may be shorter), sampled at 'outsr' Hz, as numpy arrays
+    of shape (samples, tracks). Memory usage does not depend on media
+    duration. Decoding is stopped if the generator is closed before the end.
+    """
+    check_media(infname)
+
+    decoder = select_decoder(infname, decoder, ffmpeg, precision=precision, ffprobe=ffprobe)
+    return decoder.blocks(infname, outsr, blocksize, start, duration, tracks)
@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Speaking clock detection in media files, and in signals loaded in memory
+"""
+
+import os
+import numpy as np
+
+from .decode import (DECODE_METHODS, FFmpegDecoder, ArrayDecoder, as_2d, check_media, select_decoder,
+                     decode_media, iter_media_blocks, track_labels)
+from .dsp import (STEP_SEC, StreamingBip, check_pattern_features, multichannel_frame_energies,
+                  multichannel_wavdata2bip, energies2bip)
+from .profiling import Profile, stage
+from .patterns import (PATTERNS, FOLDING_THRESHOLD, is_bip_pattern, is_windowed_bip_pattern,
+                       sequential_bip_pattern, channel_verdict, bip_pattern_stats,
+                       windowed_bip_pattern_stats, EpochFolding, sequential_folded_pattern,
+                       folding_stats)
+
+
+# command line output of speaking clock verdicts
+VERDICTS = {-1: 'SPEAKING_CLOCK_NONE', -2: 'SPEAKING_CLOCK_MULTIPLE'}
+
+class DetectionResult:
+    """
+    Result of the speaking clock detection of a media
+    tracks: list of the (stream, channel) audio tracks analyzed
+    matches: list telling if each track is a speaking clock
+    bips: list of the bip timestamps detected in each track, in seconds from
+    the start of media
+    duration: duration of media analyzed, in seconds
+    stats: list of the interval statistics of each track (see
+    interval_stats), computed from bips if not provided, or of the epoch
+    folding statistics of each track (see folding_stats)
+    profile: costs of each processing stage (see Profile.as_dict), None
+    unless detection has been profiled
+    """
+    def __init__(self, tracks, matches, bips, duration, stats=None):
+        self.tracks = tracks
+        self.matches = matches
+        self.bips = bips
+        self.duration = duration
+        self._stats = stats
+        self.profile = None
+
+    @property
+    def stats(self):
+        """ interval statistics and decision score of each track, see interval_stats """
+        if self._stats is None:
+            self._stats = [bip_pattern_stats(b, self.duration) for b in self.bips]
+        return self._stats
+
+    @property
+    def confidence(self):
+        """
+        confidence of the verdict, between 0 and 1: lowest confidence of the
+        track decisions, low values denoting borderline results
+        """
+        return min([s['confidence'] for s in self.stats], default=0.)
+
+    @property
+    def verdict(self):
+        """
+        index of the speaking clock in tracks, -1 if speaking clock has not
+        been found, -2 if it has been found in more than 1 track
+        """
+        return channel_verdict(self.matches)
+
+    @property
+    def speaking_clock(self):
+        """
+        (stream, channel) track of the speaking clock, None if speaking clock
+        has not been found, or has been found in more than 1 track
+        """
+        verdict = self.verdict
+        return self.tracks[verdict] if verdict >= 0 else None
+
+    def as_dict(self):
+        """
+        JSON serializable summary of the result: verdict printed by the
+        command line interface, label and index of the speaking clock track
+        (index being the verdict property), confidence, duration analyzed,
+        and decision, amount of bips and interval statistics of each track,
+        followed by the profile of the detection if it has been profiled
+        """
+        verdict = self.verdict
+        labels = track_labels(self.tracks)
+        ret = {
+            'verdict': VERDICTS.get(verdict, 'SPEAKING_CLOCK_TRACK'),
+            'speaking_clock': labels[verdict] if verdict >= 0 else None,
+            'index': verdict,
+            'confidence': self.confidence,
+            'duration': round(self.duration, 3),
+            'tracks': [dict(track=label, match=bool(match), **stats)
+                       for label, match, stats in zip(labels, self.matches, self.stats)]}
+        if self.profile is not None:
+            ret['profile'] = self.profile
+        return ret
+
+    def __repr__(self):
+        return 'DetectionResult(tracks=%r, matches=%r, duration=%.3f)' % (
+            self.tracks, self.matches, self.duration)
+
+
+def detect(media, samplerate=None, tracks=None, decode='pipe', decoder='ffmpeg',
+           precision='float64', features='fft', early_exit=False, confidence=0.999,
+           windows=None, window_dur=180., follow=None, profile=False, tmpdir='/dev/shm/',
+           ffmpeg='ffmpeg', pattern='intervals', ffprobe=None):
+    """
+    Detect the speaking clock in a media file, or in a signal already loaded
+    in memory.
+    Args:
+    * media: full path to the media to analyze, or numpy array of shape
+      (samples,) or (samples, channels). int16 arrays are considered as 16
+      bits PCM samples.
+    * samplerate: sampling rate of the array, in Hz. Required for arrays.
+    * tracks: list of (stream, channel) audio tracks to be analyzed, see
+      select_tracks. Default: all the channels of all audio streams.
+    * decode: 'pipe' or 'file' decodes the whole media at once (see
+      decode_media), 'stream' processes it block by block, with a memory
+      usage that does not depend on media duration.
+    * decoder: 'ffmpeg', 'soundfile', 'pyav', 'auto' or a decoder object (see
+      select_decoder). Arrays are always decoded by an ArrayDecoder.
+    * precision: 'float32' keeps decoded samples as int16 when possible, and
+      processes them in single precision, halving memory usage
+    * features: frame energy computation method, see bip_frame_energies
+    * early_exit: stop decoding as soon as the verdict has been settled
+      with the required 'confidence', see early_exit_detection
+    * windows: if provided, analyze only 'windows' windows of 'window_dur'
+      seconds evenly spread over the media, see windowed_detection
+    * follow: if set, media is a file still being written, which is analyzed
+      until it has not grown for 'follow' seconds, see follow_detection
+    * profile: record the wall time, CPU time and peak memory of each
+      processing stage in the profile attribute of the result, see Profile.
+      'rss' measures the peak resident set size of each stage as well, by
+      resetting the peak of the process before each stage (Linux only).
+      Memory tracing slows down detection.
+    * tmpdir: directory used to store temporary wav files (decode='file')
+    * ffmpeg: full path to ffmpeg binary
+    * pattern: 'intervals' tests the time intervals between the bips of each
+      track (see is_bip_pattern), 'folding' folds the frame energy ratios of
+      each track modulo 60 seconds, and tests the folded minute against the
+      pattern (see EpochFolding), which needs less signal than intervals on
+      noisy tracks, so that shorter windows may be analyzed. Early exits
+      then use sequential_folded_pattern, 'confidence' being ignored.
+      Folding relies on the energy ratio of every frame, and requires 'fft'
+      or 'baseband' features (see FOLDING_FEATURES).
+    * ffprobe: full path to ffprobe binary, used by the ffmpeg decoder. If
+      None, the ffprobe binary shipped with ffmpeg is used (see ffprobe_path)
+    Returns a DetectionResult
+    """
+    if pattern not in PATTERNS:
+        raise ValueError('unknown pattern test %s' % pattern)
+    if decode not in DECODE_METHODS:
+        raise ValueError('unknown decode method %s' % decode)
+    check_pattern_features(pattern, features)
+    if profile:
+        with Profile(rss=profile == 'rss') as prof:
+            result = detect(media, samplerate, tracks, decode, decoder, precision, features,
+                            early_exit, confidence, windows, window_dur, follow, False, tmpdir,
+                            ffmpeg, pattern, ffprobe)
+            # pattern statistics are part of the analysis
+            result.stats
+        result.profile = prof.as_dict()
+        return result
+    if follow is not None:
+        for result in follow_detection(media, follow, ffmpeg, precision=precision,
+                                       tracks=tracks, features=features, pattern=pattern,
+                                       ffprobe=ffprobe):
+            pass
+        return result
+    if isinstance(media, (str, bytes, os.PathLike)):
+        check_media(media)
+    else:
+        if samplerate is None:
+            raise ValueError('samplerate is required for detecting speaking clock in arrays')
+        media = as_2d(media)
+        decoder = ArrayDecoder(samplerate, precision)
+    method = 'file' if decode == 'file' else 'pipe'
+    decoder = select_decoder(media, decoder, ffmpeg, tmpdir, method, precision, ffprobe)
+    tracks = decoder.select_tracks(media, tracks)
+
+    if windows:
+        _, duration = decoder.probe(media)
+        if duration is not None and duration > windows * window_dur:
+            return _windowed_result(media, decoder, tracks, duration, windows, window_dur,
+                                    features, method, tmpdir, ffmpeg, pattern)
+    if early_exit:
+        return _early_exit_result(media, decoder, tracks, confidence, 40000, features, pattern)
+
+    if decode == 'stream':
+        # process media block by block, using constant memory
+        detectors = stream_bips(media, ffmpeg, decoder=decoder, tracks=tracks, features=features,
+                                pattern=pattern)
+        return _streaming_result(tracks, detectors)
+    else:
+        # decode media to a 4kHz wav and store it in a numpy array
+        wav_data = decode_media(media, tmpdir, ffmpeg, 4000, decode, decoder=decoder,
+                                tracks=tracks)
+        duration = wav_data.shape[0] / 4000.
+        foldings = _foldings(tracks, pattern)
+        bips = _multichannel_bips(wav_data, features, foldings)
+    if foldings is not None:
+        return _folding_result(tracks, foldings, bips, duration)
+    return DetectionResult(tracks, [is_bip_pattern(b, duration) for b in bips], bips, duration)
+
+def _foldings(tracks, pattern):
+    """ EpochFolding of each track for the 'folding' pattern test, None otherwise """
+    if pattern != 'folding':
+        return None
+    return [EpochFolding(STEP_SEC) for _ in tracks]
+
+def _multichannel_bips(wav_data, features, foldings=None, start=0.):
+    """
+    bips of each channel of a (samples, channels) signal, as given by
+    multichannel_wavdata2bip, the frame energy ratios of each channel being
+    folded by 'foldings' if provided, the signal starting 'start' seconds
+    after the start of media
+    """
+    if foldings is None:
+        return multichannel_wavdata2bip(wav_data, features)
+    energy_1000hz, energy_all = multichannel_frame_energies(wav_data, features)
+    for folding, e1000, eall in zip(foldings, energy_1000hz, energy_all):
+        with stage('energy_ratio'):
+            energy_ratio = e1000 / eall
+        folding.add(energy_ratio, start)
+    return [energies2bip(e1000, eall) for e1000, eall in zip(energy_1000hz, energy_all)]
+
+def _folding_result(tracks, foldings, bips, duration):
+    """ DetectionResult of the epoch folding test of each track """
+    phase_scores = [folding.phase_score() for folding in foldings]
+    matches = [score > FOLDING_THRESHOLD for _, score in phase_scores]
+    stats = [folding_stats(phase, score, len(b)) for (phase, score), b in zip(phase_scores, bips)]
+    return DetectionResult(tracks, matches, bips, duration, stats)
+
+def stream_bips(infname, ffmpeg='ffmpeg', blocksize=240000, decoder='ffmpeg', precision='float64',
+                tracks=None, features='fft', pattern='intervals'):
+    """
+    Detect bips in each audio track of a media decoded block by block, with
+    a memory usage that does not depend on media duration. Frame energy
+    ratios are folded as well for the 'folding' pattern test.
+    Returns a list of StreamingBip objects, one per track
+    """
+    detectors = None
+    for block in iter_media_blocks(infname, ffmpeg, 4000, blocksize, decoder=decoder,
+                                   precision=precision, tracks=tracks):
+        if detectors is None:
+            detectors = [StreamingBip(features, pattern == 'folding')
+                         for _ in range(block.shape[1])]
+        for i, detector in enumerate(detectors):
+            detector.feed(block[:, i])
+    # media should not be empty
+    assert detectors is not None and detectors[0].nsamples > 1
+    return detectors
+
+def _streaming_result(tracks, detectors):
+    """ DetectionResult of the signal processed so far by StreamingBip detectors """
+    bips = [det.bips() for det in detectors]
+    duration = detectors[0].duration()
+    if detectors[0].folding is not None:
+        return _folding_result(tracks, [det.folding for det in detectors], bips, duration)
+    return DetectionResult(tracks, [is_bip_pattern(b, duration) for b in bips], bips, duration)
+
+def follow_detection(infname, follow=10., ffmpeg='ffmpeg', blocksize=40000, precision='float64',
+                     tracks=None, features='fft', pattern='intervals', ffprobe=None):
+    """
+    Speaking clock detection of a media file still being written, such as a
+    recording in progress. The file is decoded by a single ffmpeg process
+    waiting for new audio to be appended, and analyzed block by block,
+    keeping the state of the bip detection pipeline between blocks.
+    Yield a DetectionResult of the audio analyzed so far after each block of
+    'blocksize' samples (10 seconds by default). The last one is the final
+    result, obtained once the file has not grown for 'follow' seconds.
+    """
+    check_pattern_features(pattern, features)
+    check_media(infname)
+    decoder = FFmpegDecoder(ffmpeg, precision=precision, follow=follow, ffprobe=ffprobe)
+    tracks = decoder.select_tracks(infname, tracks)
+    detectors = None
+    for block in decoder.blocks(infname, 4000, blocksize, tracks=tracks):
+        if detectors is None:
+            detectors = [StreamingBip(features, pattern == 'folding')
+                         for _ in range(block.shape[1])]
+        for i, detector in enumerate(detectors):
+            detector.feed(block[:, i])
+        yield _streaming_result(tracks, detectors)
+    # media should not be empty
+    assert detectors is not None and detectors[0].nsamples > 1
+
+def _early_exit_result(media, decoder, tracks, confidence, blocksize, features,
+                       pattern='intervals'):
+    """ DetectionResult of early_exit_detection """
+    detectors = None
+    blocks = iter_media_blocks(media, outsr=4000, blocksize=blocksize, decoder=decoder,
+                               tracks=tracks)
+    try:
+        for block in blocks:
+            if detectors is None:
+                detectors = [StreamingBip(features, pattern == 'folding')
+                             for _ in range(block.shape[1])]
+            for i, detector in enumerate(detectors):
+                detector.feed(block[:, i])
+            if pattern == 'folding':
+                decisions = [sequential_folded_pattern(det.folding) for det in detectors]
+            else:
+                decisions = [sequential_bip_pattern(det.bips(), det.duration(), confidence)
+                             for det in detectors]
+            if None not in decisions and decisions.count(True) <= 1:
+                # stop decoding: the answer will not change, whether a single
+                # channel or no channel is a speaking clock
+                if pattern == 'folding':
+                    return _streaming_result(tracks, detectors)
+                return DetectionResult(tracks, decisions, [det.bips() for det in detectors],
+                                       detectors[0].duration())
+    finally:
+        blocks.close()
+
+    # whole media has been consumed without early decision
+    assert detectors is not None and detectors[0].nsamples > 1
+    return _streaming_result(tracks, detectors)
+
+def early_exit_detection(infname, ffmpeg='ffmpeg', confidence=0.999, blocksize=40000,
+                         decoder='ffmpeg', precision='float64', tracks=None, features='fft',
+                         pattern='intervals', ffprobe=None):
+    """
+    Speaking clock detection stopping media decoding as soon as a single
+    channel has been found to be a speaking clock, and all the other ones
+    have been found not to be, or as soon as all the channels have been
+    found not to be, with the required confidence (intervals pattern test),
+    or by sequential_folded_pattern (folding pattern test).
+    Returns the same channel number as speaking_clock_detection, and the
+    duration of media consumed in seconds.
+    """
+    check_media(infname)
+    decoder = select_decoder(infname, decoder, ffmpeg, precision=precision, ffprobe=ffprobe)
+    result = _early_exit_result(infname, decoder, decoder.select_tracks(infname, tracks),
+                                confidence, blocksize, features, pattern)
+    return result.verdict, result.duration
+
+def _windowed_result(media, decoder, tracks, duration, nwindows, window_dur, features, method,
+                     tmpdir, ffmpeg, pattern='intervals'):
+    """
+    DetectionResult of windowed_detection, for media lasting 'duration'
+    seconds, longer than the windows
+    """
+    starts = np.linspace(0, duration - window_dur, nwindows)
+    channels_bips = [[] for _ in tracks]
+    durs = []
+    # windows are folded at their position in media
+    foldings = _foldings(tracks, pattern)
+    for start in starts:
+        wav_data = decode_media(media, tmpdir, ffmpeg, 4000, method, start, window_dur,
+                                decoder, tracks=tracks)
+        for bip_lists, bips in zip(channels_bips,
+                                   _multichannel_bips(wav_data, features, foldings, start)):
+            bip_lists.append(bips)
+        durs.append(wav_data.shape[0] / 4000.)
+
+    bips = [np.concatenate([start + np.asarray(b) for start, b in zip(starts, bip_lists)])
+            for bip_lists in channels_bips]
+    if foldings is not None:
+        return _folding_result(tracks, foldings, bips, sum(durs))
+    # intervals between windows are not observed, and the amount of bips of
+    # short windows depends on their position in the minute
+    matches = [is_windowed_bip_pattern(bip_lists, durs) for bip_lists in channels_bips]
+    stats = [windowed_bip_pattern_stats(bip_lists, durs) for bip_lists in channels_bips]
+    return DetectionResult(tracks, matches, bips, sum(durs), stats)
+
+def windowed_detection(infname, tmpdir, ffmpeg, nwindows=5, window_dur=180., decode='pipe',
+                       decoder='ffmpeg', precision='float64', tracks=None, features='fft',
+                       pattern='intervals', ffprobe=None):
+    """
+    Speaking clock detection based on the analysis of 'nwindows' windows of
+    'window_dur' seconds evenly spread over the media, instead of the whole
+    media. Media shorter than the total duration of the windows are fully
+    analyzed. With the 'folding' pattern test, the frames of all the
+    windows are folded together, so that windows of 30 seconds are enough.
+    Returns the same channel number as speaking_clock_detection.
+    """
+    return detect(infname, tracks=tracks, decode=decode, decoder=decoder, precision=precision,
+                  features=features, windows=nwindows, window_dur=window_dur, tmpdir=tmpdir,
+                  ffmpeg=ffmpeg, pattern=pattern, ffprobe=ffprobe).verdict
+
+def detect_tracks(infname, tmpdir, ffmpeg, decode='pipe', decoder='ffmpeg', precision='float64',
+                  tracks=None, features='fft', ffprobe=None):
+    """
+    Tell if each audio track of a media is a speaking clock.
+    All tracks are decoded at once, so that media is read only once.
+    tracks: list of (stream, channel) audio tracks to be analyzed, see
+    select_tracks. Default: all the channels of all audio streams.
+    Returns a list of ((stream, channel), is_speaking_clock) tuples
+    """
+    result = detect(infname, tracks=tracks, decode=decode, decoder=decoder, precision=precision,
+                    features=features, tmpdir=tmpdir, ffmpeg=ffmpeg, ffprobe=ffprobe)
+    return list(zip(result.tracks, result.matches))
+
+def speaking_clock_detection(infname, tmpdir, ffmpeg, decode='pipe', decoder='ffmpeg',
+                             precision='float64', tracks=None, features='fft', ffprobe=None):
+    """
+    Returns the number of the channel corresponding to speaking clock
+    -1 if speaking clock has not been found
+    -2 if speaking clock has been found in more than 1 channel
+    precision: 'float32' keeps decoded samples as int16 when possible, and
+    processes them in single precision, halving memory usage
+    tracks: list of (stream, channel) audio tracks to be analyzed. The
+    returned number is the index of the speaking clock in the sorted list of
+    tracks (see select_tracks)
+    features: 'dft' computes the whole spectrum only for frames that may be
+    bip candidates, which is faster and gives the same result
+    """
+    return detect(infname, tracks=tracks, decode=decode, decoder=decoder, precision=precision,
+                  features=features, tmpdir=tmpdir, ffmpeg=ffmpeg, ffprobe=ffprobe).verdict
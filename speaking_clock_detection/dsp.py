@@ -0,0 +1,654 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Bip detection: 1kHz impulses of duration varying between 80 and 160 ms
+"""
+
+import numpy as np
+
+from scipy import fft
+from scipy.signal import lfilter
+from scipy.signal.windows import hamming
+
+from .segmentaxis import segment_axis
+from .profiling import stage, count
+from .patterns import EpochFolding
+
+# pre-emphasis factor used before spectrogram computation
+PREEMP_FACT = 0.97
+
+# spectrogram analysis used for bip detection: 32 ms windows, and 8 ms step
+WIN_SEC = 0.032
+STEP_SEC = 0.008
+
+# bip detection thresholds: energy ratio around 1000Hz of the frames of bip
+# candidates, bounds of the duration of candidates in seconds, and energy
+# of candidates relative to the max energy of the candidates of a channel
+RATIO_THR = 0.5
+MIN_DUR = 0.08
+MAX_DUR = 0.16
+ENERGY_THR = 0.2
+
+def work_dtype(data):
+    """
+    Floating point type used for processing a signal: int16 PCM and float32
+    signals are processed in single precision, other ones in double precision
+    """
+    if data.dtype in (np.int16, np.float32):
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+def preemp(input, p, zi=None):
+    """Pre-emphasis filter.
+    Filter state zi is returned with the filtered signal if provided."""
+    dtype = work_dtype(input)
+    if zi is None:
+        return lfilter(np.array([1., -p], dtype), np.array([1.], dtype), input)
+    return lfilter(np.array([1., -p], dtype), np.array([1.], dtype), input, zi=zi)
+
+def my_specgram(data, winlen=256, steplen=256, nfft=512):
+    """ Custom spectrogram (256 = 16ms for 16k signal) """
+    data = preemp(data, PREEMP_FACT)
+    return framed_specgram(data, winlen, steplen, nfft)
+
+def framed_specgram(data, winlen, steplen, nfft):
+    """
+    Spectrogram of an already pre-emphasized signal
+    Multichannel signals are stored as (channels, samples) arrays, and
+    result in (channels, frames, nfft / 2) spectrograms
+    """
+    w = hamming(winlen, sym=0).astype(data.dtype)
+    framed = segment_axis(data, winlen, winlen-steplen, axis=data.ndim-1) * w
+    # the FFT of real frames is computed by scipy as a real FFT whose output
+    # is mirrored: the real FFT gives the same values with half the memory
+    return np.abs(fft.rfft(framed, nfft, axis=-1)[..., 0:(nfft // 2)])
+
+def energy_idx(winlen):
+    """
+    return energy indices corresponding to 1000Hz for a signal sampled at 4KHz
+    """
+    i1000 = (1000. * winlen) / 4000.
+    return tuple([int(e) for e in (i1000-1, i1000, i1000+1)])
+
+def frame_energies(spec, winlen):
+    """
+    return the energy around 1000Hz and the total energy of each spectrogram
+    frame. Total energy of empty frames is set to 1, for ratio computation.
+    """
+    energy_1000hz = np.sum(spec[..., energy_idx(winlen)], axis=-1)
+    energy_all = np.sum(spec, axis=-1)
+    energy_1000hz[energy_all == 0] = 0
+    energy_all[energy_all == 0] = 1
+    return energy_1000hz, energy_all
+
+# frame energy computation methods
+FEATURES = ('fft', 'dft', 'gated', 'baseband')
+
+# features giving the energy ratio of every frame, which epoch folding
+# relies on: 'dft' only bounds ratios below 0.5, and 'gated' sets those of
+# gated frames to 0
+FOLDING_FEATURES = ('fft', 'baseband')
+
+def check_pattern_features(pattern, features):
+    """ raise ValueError for pattern tests not supported by features """
+    if pattern == 'folding' and features not in FOLDING_FEATURES:
+        raise ValueError('folding pattern test requires %s features, not %s'
+                         % (' or '.join(FOLDING_FEATURES), features))
+
+def dft_frame_energies(data, winlen, steplen, nfft):
+    """
+    Same as frame_energies(framed_specgram(data, winlen, steplen, nfft), winlen)
+    for the frames having an energy ratio above RATIO_THR around 1000Hz,
+    without computing the whole spectrogram. nfft should be equal to winlen, and
+    winlen be a multiple of steplen.
+    The DFT bins around 1000Hz, and the DC and Nyquist bins, are computed
+    blockwise, without framing the signal: each step of the signal belongs
+    to winlen / steplen consecutive frames, and is multiplied once, by a
+    single matrix product over contiguous samples, by the windowed DFT basis
+    of each position it takes in a frame. The DFT of a frame is the sum of
+    the products of its steps. The power of the windowed frames is obtained
+    the same way from the squared samples and the squared window.
+    Parseval's theorem then gives the power of the other bins, and a lower
+    bound of their summed magnitudes. Frames whose energy ratio may be above
+    RATIO_THR according to this bound are computed exactly with a FFT. For the
+    other ones, energy_all is a lower bound of the actual value.
+    """
+    if nfft != winlen or winlen % steplen:
+        raise ValueError('dft frame energies require nfft == winlen, multiple of steplen')
+    framed = segment_axis(data, winlen, winlen-steplen, axis=data.ndim-1)
+    nframes = framed.shape[-2]
+    nsub = winlen // steplen
+    nsteps = nframes + nsub - 1
+    w = hamming(winlen, sym=0)
+
+    # windowed basis: real and imaginary parts of the 1000Hz bins, DC and
+    # Nyquist bins, and squared window
+    n = np.arange(winlen)
+    phases = 2 * np.pi * np.outer(n, energy_idx(winlen)) / nfft
+    basis = np.column_stack((w[:, None] * np.cos(phases), -w[:, None] * np.sin(phases),
+                             w, w * np.cos(np.pi * n)))
+    nbasis = basis.shape[1]
+    # basis of the step positions in a frame, side by side
+    basis = basis.reshape(nsub, steplen, nbasis).transpose(1, 0, 2).reshape(steplen, -1)
+    squares = (w * w).reshape(nsub, steplen).T
+    steps = data[..., 0:(nsteps * steplen)].reshape(data.shape[:-1] + (nsteps, steplen))
+    partial = np.matmul(steps, basis.astype(data.dtype))
+    partial2 = np.matmul(steps * steps, squares.astype(data.dtype))
+    proj = partial[..., 0:nframes, 0:nbasis].copy()
+    power = partial2[..., 0:nframes, 0].copy()
+    for m in range(1, nsub):
+        proj += partial[..., m:(m + nframes), (m * nbasis):((m + 1) * nbasis)]
+        power += partial2[..., m:(m + nframes), m]
+
+    nidx = len(energy_idx(winlen))
+    mag = np.hypot(proj[..., 0:nidx], proj[..., nidx:(2 * nidx)])
+    energy_1000hz = np.sum(mag, axis=-1)
+    # power of bins 0 ... nfft/2 - 1, excluding the 1000Hz ones
+    dc, nyquist = proj[..., -2], proj[..., -1]
+    power = (nfft * power + dc ** 2 - nyquist ** 2) / 2 - np.sum(mag * mag, axis=-1)
+    # summed magnitudes are above the square root of summed powers
+    energy_all = energy_1000hz + np.sqrt(np.maximum(power, 0))
+
+    # margin accounting for rounding errors
+    margin = 1e-3 if data.dtype == np.float32 else 1e-9
+    exact = energy_1000hz * (1. / RATIO_THR + margin) > energy_all
+    if np.any(exact):
+        spec = np.abs(fft.rfft(framed[exact] * w.astype(data.dtype), nfft, axis=-1))
+        energy_1000hz[exact], energy_all[exact] = frame_energies(spec[:, 0:(nfft // 2)], winlen)
+    energy_1000hz[energy_all == 0] = 0
+    energy_all[energy_all == 0] = 1
+    return energy_1000hz, energy_all
+
+# gated frame energies: fraction of the power of a frame around 1000Hz
+# above which its spectrum is computed (see band_power_ratio), and amount
+# of frames computed on each side of such a frame
+GATE_RATIO = 0.075
+GATE_MARGIN = 1
+
+def band_power_ratio(data, winlen, steplen):
+    """
+    Fraction of the power of each frame found around 1000Hz, for signals
+    sampled at 4kHz, winlen being a multiple of steplen and steplen a
+    multiple of 4. The signal is shifted by -1000Hz, which only takes sign
+    changes at a quarter of the sampling rate, and summed over each step,
+    which keeps about 125Hz around 1000Hz.
+    A 1000Hz sine has a ratio of 0.5, white noise 1 / steplen, and frames
+    without power a ratio of 0.
+    """
+    nsteps = (data.shape[-1] - winlen) // steplen + winlen // steplen
+    quads = data[..., 0:(nsteps * steplen)].reshape(data.shape[:-1] + (nsteps, steplen // 4, 4))
+    # shifted samples: x[n] * (-i)^n
+    real = np.sum(quads[..., 0] - quads[..., 2], axis=-1)
+    imag = np.sum(quads[..., 3] - quads[..., 1], axis=-1)
+    band = (real * real + imag * imag) / steplen
+    power = np.sum(quads * quads, axis=(-2, -1))
+    # sums over the steps of each frame
+    nframes = nsteps - winlen // steplen + 1
+    band = sum(band[..., i:(i + nframes)] for i in range(winlen // steplen))
+    power = sum(power[..., i:(i + nframes)] for i in range(winlen // steplen))
+    return band / np.where(power > 0, power, 1)
+
+def gated_frame_energies(data, winlen, steplen, nfft, return_gated=False):
+    """
+    Same as frame_energies(framed_specgram(data, winlen, steplen, nfft), winlen)
+    for the frames that may have an energy ratio above RATIO_THR (0.5) around
+    1000Hz, without computing the spectrum of the other frames.
+    A first stage, costing about one pass over the samples, keeps the
+    frames whose band_power_ratio is above GATE_RATIO, and GATE_MARGIN
+    frames on each side of them. Frames having an energy ratio above 0.5
+    have at least a quarter of their power in the 1000Hz bins, that is a
+    band_power_ratio of about 0.125 (0.15 at least on adversarial mixtures
+    of tones and noise). Their spectrum is then computed as with 'fft'.
+    Other frames, including silent ones, get the energies of empty frames:
+    0 around 1000Hz, and 1 in total.
+    return_gated: also return the fraction of frames gated out, whose
+    spectrum has not been computed. The amount of frames gated out is
+    counted as well in the 'gated_frames' counter of the active profile, if
+    any, see profiling.count.
+    """
+    framed = segment_axis(data, winlen, winlen-steplen, axis=data.ndim-1)
+    energy_1000hz = np.zeros(framed.shape[:-1], data.dtype)
+    energy_all = np.ones(framed.shape[:-1], data.dtype)
+    count('frames', energy_all.size)
+    if not np.any(data):
+        count('gated_frames', energy_all.size)
+        return (energy_1000hz, energy_all, 1.) if return_gated else (energy_1000hz, energy_all)
+
+    ratio = band_power_ratio(data, winlen, steplen)
+    keep = ratio > GATE_RATIO
+    zero = ratio == 0
+    if np.any(zero):
+        # frames having samples too small for their power to be represented
+        keep[zero] = np.any(framed[zero], axis=-1)
+    gate = keep.copy()
+    for i in range(1, GATE_MARGIN + 1):
+        keep[..., i:] |= gate[..., :-i]
+        keep[..., :-i] |= gate[..., i:]
+    ngated = energy_all.size - np.count_nonzero(keep)
+    count('gated_frames', ngated)
+    if np.any(keep):
+        w = hamming(winlen, sym=0).astype(data.dtype)
+        spec = np.abs(fft.rfft(framed[keep] * w, nfft, axis=-1)[:, 0:(nfft // 2)])
+        energy_1000hz[keep], energy_all[keep] = frame_energies(spec, winlen)
+    if return_gated:
+        return energy_1000hz, energy_all, ngated / float(max(energy_all.size, 1))
+    return energy_1000hz, energy_all
+
+# baseband frame energies: sampling rate of the 1000Hz band shifted to
+# baseband, and normalized band amplitude over level of a frame taken as
+# the equivalent of an energy ratio of RATIO_THR of the spectrogram
+BASEBAND_RATE = 250
+BASEBAND_RATIO = 0.75
+
+def baseband_envelopes(data, rate=BASEBAND_RATE):
+    """
+    1000Hz band and broadband power of a signal sampled at 4kHz, at 'rate'
+    Hz. The 1000Hz band is shifted to baseband by complex mixing, which
+    only takes sign changes at a quarter of the sampling rate, and low-pass
+    filtered by summing blocks of 4000 / rate samples, as is the power of
+    the signal. Both are computed in a single pass over the samples.
+    Returns the complex baseband signal and the power of each block, as
+    (blocks,) or (channels, blocks) arrays
+    """
+    size = 4000 // rate
+    nblocks = data.shape[-1] // size
+    blocks = data[..., 0:(nblocks * size)].reshape(data.shape[:-1] + (nblocks, size))
+    # real and imaginary parts of x[n] * (-i)^n
+    mix = np.tile(np.array([[1, 0], [0, -1], [-1, 0], [0, 1]], data.dtype), (size // 4, 1))
+    parts = np.matmul(blocks, mix)
+    return parts[..., 0] + 1j * parts[..., 1], np.einsum('...i,...i->...', blocks, blocks)
+
+def baseband_frame_energies(data, winlen, steplen, nfft):
+    """
+    Approximation of frame_energies(framed_specgram(data, winlen, steplen, nfft), winlen)
+    computed from the baseband envelopes of the signal (see
+    baseband_envelopes) instead of its spectrogram: an order of magnitude
+    fewer values are processed per second of signal.
+    For each frame, the amplitude of the 1000Hz band and the level of the
+    signal are obtained by weighting the envelopes with the analysis
+    window. The band amplitude is normalized so that a 1000Hz sine gets
+    the value of its level, and scaled so that a ratio of BASEBAND_RATIO
+    becomes an energy ratio of RATIO_THR. Silent frames get the energies of
+    empty frames: 0 around 1000Hz, and 1 in total.
+    winlen and steplen should be multiples of 4000 / BASEBAND_RATE, and nfft
+    is not used.
+    """
+    size = 4000 // BASEBAND_RATE
+    band, power = baseband_envelopes(data)
+    # weight of each block in the analysis window
+    w = np.mean(hamming(winlen, sym=0).reshape(-1, size), axis=1).astype(data.dtype)
+    overlap = (winlen - steplen) // size
+    band = np.abs(np.matmul(segment_axis(band, len(w), overlap, axis=band.ndim-1),
+                            w.astype(band.dtype)))
+    level = np.sqrt(np.matmul(segment_axis(power, len(w), overlap, axis=power.ndim-1), w))
+    energy_1000hz = band * (RATIO_THR / BASEBAND_RATIO / np.sqrt(size / 2 * np.sum(w)))
+    energy_1000hz = energy_1000hz.astype(data.dtype)
+    energy_1000hz[level == 0] = 0
+    level[level == 0] = 1
+    return energy_1000hz, level
+
+def bip_frame_energies(data, winlen, steplen, nfft, features='fft'):
+    """
+    return the energy around 1000Hz and the total energy of each frame of an
+    already pre-emphasized signal, as (frames,) arrays for single channel
+    signals, and (channels, frames) arrays for (channels, samples) signals
+    features: 'fft' computes the whole spectrogram of each frame, 'dft' only
+    computes it for frames that may be bip candidates (see dft_frame_energies),
+    and 'gated' for frames having enough power around 1000Hz (see
+    gated_frame_energies). 'baseband' approximates frame energies from the
+    1000Hz band shifted to baseband (see baseband_frame_energies).
+    """
+    if features == 'fft':
+        with stage('spectrogram'):
+            spec = framed_specgram(data, winlen, steplen, nfft)
+        with stage('energy_ratio'):
+            return frame_energies(spec, winlen)
+    if features == 'dft':
+        with stage('spectrogram'):
+            return dft_frame_energies(data, winlen, steplen, nfft)
+    if features == 'gated':
+        with stage('spectrogram'):
+            return gated_frame_energies(data, winlen, steplen, nfft)
+    if features == 'baseband':
+        with stage('spectrogram'):
+            return baseband_frame_energies(data, winlen, steplen, nfft)
+    raise ValueError('unknown features %s: should be one of %s' % (features, FEATURES))
+
+def contiguous_regions(booltab):
+    """Finds contiguous True regions of the boolean array "condition". Returns
+    a 2D array where the first column is the start index of the region and the
+    second column is duration"""
+
+    # Find the indicies of changes in "condition"
+    d = np.diff(booltab)
+    idx, = d.nonzero()
+
+    # We need to start things after the change in "condition". Therefore,
+    # we'll shift the index by 1 to the right.
+    idx += 1
+
+    if booltab[0]:
+        # If the start of condition is True prepend a 0
+        idx = np.r_[0, idx]
+
+    if booltab[-1]:
+        # If the end of condition is True, append the length of the array
+        idx = np.r_[idx, booltab.size] # Edit
+
+    # Reshape the result into two columns
+    idx.shape = (-1,2)
+    return idx[:, 0], idx[:, 1]-idx[:, 0]
+
+def valid_bip_durations(dur, min_dur=MIN_DUR, max_dur=MAX_DUR):
+    """
+    tell which candidates, expressed in number of frames, have a duration
+    between min_dur and max_dur seconds
+    """
+    dur_sec = (dur -1) * STEP_SEC + WIN_SEC
+    return np.logical_and(dur_sec > min_dur, dur_sec < max_dur)
+
+
+class CandidateEnergyFilter:
+    """
+    Keep candidates associated to an energy above 'ratio' (20% by default)
+    of the max energy found in candidates.
+    Candidates can be added incrementally: those that are already below this
+    fraction of the max energy found so far are discarded immediately, since
+    the max energy can only increase.
+    """
+    def __init__(self, ratio=ENERGY_THR):
+        self.ratio = ratio
+        self.max_energy = -np.inf
+        self.idx = []
+        self.energy = []
+
+    def add(self, idx, energy):
+        """ add candidates start indices and corresponding mean energies """
+        self.idx.extend(idx)
+        self.energy.extend(energy)
+        if len(energy) > 0 and np.max(energy) > self.max_energy:
+            self.max_energy = np.max(energy)
+        thr = self.ratio * self.max_energy
+        if len(self.energy) > 0 and min(self.energy) <= thr:
+            kept = [(i, e) for i, e in zip(self.idx, self.energy) if e > thr]
+            self.idx = [i for i, _ in kept]
+            self.energy = [e for _, e in kept]
+
+    def result(self, idx=(), energy=()):
+        """
+        return the start indices of valid candidates.
+        Extra candidates may be provided without being added to the filter.
+        """
+        idx = self.idx + list(idx)
+        energy = self.energy + list(energy)
+        if len(energy) == 0:
+            return np.array([], dtype=np.int64)
+        thr = self.ratio * max(energy)
+        return np.array([i for i, e in zip(idx, energy) if e > thr], dtype=np.int64)
+
+
+def wavdata2bip(wavdata, features='fft'):
+    """
+    return a list of temporal indices corresponding to the detected bips
+    wav signal is assumed to be sampled at 4Kz
+    int16 and float32 signals are processed in single precision
+    features: frame energy computation method, see bip_frame_energies
+    """
+    # spectrogram with 32 ms windows, and 8 ms step, see blockwise_frame_energies
+    energy_1000hz, energy_all = blockwise_frame_energies(wavdata, features)
+    return energies2bip(energy_1000hz, energy_all)
+
+# amount of frames processed at once by blockwise_frame_energies, all
+# channels included: temporary arrays of a few MB stay in CPU cache
+BATCH_FRAMES = 2 ** 12
+
+def blockwise_frame_energies(data, features='fft', batch=BATCH_FRAMES):
+    """
+    Energy around 1000Hz and total energy of each frame of a (samples,) or
+    planar (channels, samples) signal sampled at 4kHz, with 32 ms windows
+    and 8 ms step.
+    Pre-emphasis, framing and frame energies are computed by slices of
+    'batch' frames, all channels included, and each slice is reduced to its
+    frame energies right away: the spectrogram of the whole signal is never
+    stored, and temporary arrays do not depend on the signal duration.
+    Each slice is pre-emphasized from the sample preceding it, which gives
+    the same values as the pre-emphasis of the whole signal.
+    Returns two (frames,) or (channels, frames) arrays
+    """
+    winlen = int(WIN_SEC * 4000)
+    step = int(STEP_SEC * 4000)
+    nsamples = data.shape[-1]
+    nframes = 1 + (nsamples - winlen) // step
+    batch = max(1, batch // (data.shape[0] if data.ndim == 2 else 1))
+    # sample bounds of each slice of frames: signals shorter than a frame
+    # are passed as is, and rejected by segment_axis
+    bounds = [(i * step, (min(i + batch, nframes) - 1) * step + winlen)
+              for i in range(0, nframes, batch)] or [(0, nsamples)]
+    energies = []
+    for lo, hi in bounds:
+        with stage('preemphasis'):
+            first = max(lo - 1, 0)
+            chunk = preemp(data[..., first:hi], PREEMP_FACT)[..., (lo - first):]
+        # frames are built on contiguous copies of the slices of each channel
+        energies.append(bip_frame_energies(np.ascontiguousarray(chunk), winlen, step, winlen,
+                                           features))
+    if len(energies) == 1:
+        return energies[0]
+    energy_1000hz = np.concatenate([e for e, _ in energies], axis=-1)
+    energy_all = np.concatenate([e for _, e in energies], axis=-1)
+    return energy_1000hz, energy_all
+
+def multichannel_frame_energies(wav_data, features='fft'):
+    """
+    Energy around 1000Hz and total energy of each frame of each channel of a
+    (samples, channels) signal sampled at 4kHz, as computed by wavdata2bip.
+    Pre-emphasis, framing and frame energies are computed for all channels
+    at once, by slices of BATCH_FRAMES frames, see blockwise_frame_energies.
+    Returns two (channels, frames) arrays
+    """
+    return blockwise_frame_energies(wav_data.T, features)
+
+def multichannel_wavdata2bip(wav_data, features='fft'):
+    """
+    wavdata2bip applied to each channel of a (samples, channels) signal.
+    Frame energies of all channels are computed at once, see
+    multichannel_frame_energies, and only bip candidates selection is done
+    channel by channel. Detected bips are the same as those obtained with
+    wavdata2bip.
+    Returns a list of bip lists, one per channel
+    """
+    energy_1000hz, energy_all = multichannel_frame_energies(wav_data, features)
+    return [energies2bip(e1000, eall) for e1000, eall in zip(energy_1000hz, energy_all)]
+
+def energies2bip(energy_1000hz, energy_all, ratio_thr=RATIO_THR, min_dur=MIN_DUR,
+                 max_dur=MAX_DUR, energy_thr=ENERGY_THR):
+    """
+    return a list of temporal indices corresponding to the bips detected in
+    a single channel, given the energy around 1000Hz and the total energy
+    of each frame.
+    Thresholds: frame energy ratio around 1000Hz 'ratio_thr', candidate
+    duration bounds 'min_dur' and 'max_dur' in seconds, and candidate energy
+    relative to the max energy of candidates 'energy_thr'
+    """
+    # bip detection at the frame level
+    # candidates should have an energy ratio > ratio_thr around the 1000Hz frequency
+    with stage('energy_ratio'):
+        energy_ratio = energy_1000hz / energy_all
+
+    with stage('regions'):
+        # get bip candidates
+        idx, dur = contiguous_regions(energy_ratio > ratio_thr)
+
+        # keep candidates having duration between min_dur and max_dur seconds
+        valid_durs = valid_bip_durations(dur, min_dur, max_dur)
+        idx = idx[valid_durs]
+        dur = dur[valid_durs]
+
+        if len(idx) == 0:
+            return []
+
+        # keep candidates associated to an energy above 20% of the max energy found in candidates
+        candidate_energy = [np.mean(energy_all[i:(i+d)]) for i, d in zip(idx, dur)]
+        energy_filter = CandidateEnergyFilter(energy_thr)
+        energy_filter.add(idx, candidate_energy)
+        idx = energy_filter.result()
+
+    return idx * STEP_SEC
+
+
+class StreamingEnergies:
+    """
+    Stateful pre-emphasis and framing of a single channel signal sampled at
+    4kHz, processed block by block.
+    Pre-emphasis filter state and frames overlap are carried from one block
+    to the next, so that frame energies are the same as those computed by
+    wavdata2bip on the whole signal.
+    int16 and float32 signals are processed in single precision.
+    features: frame energy computation method, see bip_frame_energies
+    """
+    def __init__(self, features='fft'):
+        self.features = features
+        self.winlen = int(WIN_SEC * 4000)
+        self.step = int(STEP_SEC * 4000)
+        # pre-emphasis filter state, set according to the first block type
+        self.zi = None
+        # pre-emphasized samples that have not been framed yet
+        self.tail = None
+        # amount of samples and frames processed so far
+        self.nsamples = 0
+        self.nframes = 0
+
+    def energies(self, data):
+        """
+        process a new block of samples, and return the energy around 1000Hz
+        and the total energy of the frames it completes, the first of them
+        being frame number self.nframes. Returns None if no frame has been
+        completed. self.nframes is not updated.
+        """
+        self.nsamples += len(data)
+        if self.zi is None:
+            self.zi = np.zeros(1, work_dtype(data))
+            self.tail = np.zeros(0, work_dtype(data))
+        with stage('preemphasis'):
+            data, self.zi = preemp(data, PREEMP_FACT, self.zi)
+            data = np.concatenate((self.tail, data))
+        if len(data) < self.winlen:
+            self.tail = data
+            return None
+        nframes = 1 + (len(data) - self.winlen) // self.step
+        self.tail = data[nframes * self.step:]
+        data = data[:(nframes - 1) * self.step + self.winlen]
+        return bip_frame_energies(data, self.winlen, self.step, self.winlen, self.features)
+
+    def duration(self):
+        """ duration of processed signal in seconds """
+        return self.nsamples / 4000.
+
+
+class StreamingBip(StreamingEnergies):
+    """
+    Stateful version of wavdata2bip, processing a single channel signal
+    sampled at 4kHz block by block.
+    Pre-emphasis filter state, frames overlap and unfinished bip candidates
+    are carried from one block to the next: memory usage only depends on the
+    size of the blocks, and detected bips are the same as those obtained
+    with wavdata2bip on the whole signal.
+    int16 and float32 signals are processed in single precision.
+    features: frame energy computation method, see bip_frame_energies
+    folding: if True, frame energy ratios are also folded by an EpochFolding,
+    stored in the folding attribute (None otherwise)
+    """
+    def __init__(self, features='fft', folding=False):
+        StreamingEnergies.__init__(self, features)
+        self.folding = EpochFolding(STEP_SEC) if folding else None
+        # bip candidate not finished at the end of the last block:
+        # start frame, and list of frame energies (None if too long)
+        self.open_start = None
+        self.open_energies = None
+        self.energy_filter = CandidateEnergyFilter()
+        # longest region that may have a valid duration
+        self.max_frames = int(np.ceil((MAX_DUR - WIN_SEC) / STEP_SEC)) + 1
+
+    def feed(self, data):
+        """ process a new block of samples """
+        energies = self.energies(data)
+        if energies is None:
+            return
+        energy_1000hz, energy_all = energies
+        with stage('energy_ratio'):
+            energy_ratio = energy_1000hz / energy_all
+        with stage('regions'):
+            self._add_regions(energy_ratio > RATIO_THR, energy_all)
+        if self.folding is not None:
+            self.folding.add(energy_ratio)
+        self.nframes += len(energy_all)
+
+    def _add_regions(self, booltab, energy_all):
+        """ update bip candidates with the frames of a new block """
+        idx, dur = contiguous_regions(booltab)
+        idx = list(idx)
+        dur = list(dur)
+
+        if self.open_start is not None:
+            if len(idx) > 0 and idx[0] == 0:
+                # candidate continues in this block
+                self._extend_open(energy_all[:dur[0]])
+                idx.pop(0)
+                dur.pop(0)
+                if len(idx) == 0 and booltab[-1]:
+                    # candidate lasts the whole block
+                    return
+            self._close_open()
+
+        if len(idx) > 0 and booltab[-1]:
+            # last candidate may continue in the next block
+            self.open_start = self.nframes + idx[-1]
+            self.open_energies = []
+            self._extend_open(energy_all[idx[-1]:])
+            idx.pop()
+            dur.pop()
+
+        idx = np.array(idx, dtype=np.int64)
+        dur = np.array(dur, dtype=np.int64)
+        valid_durs = valid_bip_durations(dur)
+        idx = idx[valid_durs]
+        dur = dur[valid_durs]
+        candidate_energy = [np.mean(energy_all[i:(i+d)]) for i, d in zip(idx, dur)]
+        self.energy_filter.add(idx + self.nframes, candidate_energy)
+
+    def _extend_open(self, energies):
+        """ add frames to the unfinished candidate """
+        if self.open_energies is None:
+            return
+        if len(self.open_energies) + len(energies) > self.max_frames:
+            # too long to be a bip, frame energies are not needed anymore
+            self.open_energies = None
+        else:
+            self.open_energies = np.concatenate((self.open_energies, energies))
+
+    def _open_candidate(self):
+        """
+        return the unfinished candidate start index and mean energy as lists,
+        which are empty if there is no such candidate with a valid duration
+        """
+        if self.open_energies is None or \
+           not valid_bip_durations(np.array([len(self.open_energies)]))[0]:
+            return [], []
+        return [self.open_start], [np.mean(self.open_energies)]
+
+    def _close_open(self):
+        """ the unfinished candidate is over: filter it """
+        self.energy_filter.add(*self._open_candidate())
+        self.open_start = None
+        self.open_energies = None
+
+    def bips(self):
+        """
+        return a list of temporal indices corresponding to the bips detected
+        in the signal processed so far
+        """
+        # the unfinished candidate lasts until the end of the signal processed so far
+        ret = self.energy_filter.result(*self._open_candidate()) * STEP_SEC
+        if len(ret) == 0:
+            return []
+        return ret
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Compact frame features of media, from which bips and speaking clock
+patterns can be detected again with other thresholds, without decoding
+the media.
+
+For each channel, features are made of:
+* the energy ratio around 1000Hz of each frame, quantized on 16 bits
+* the total energy of each frame relative to its max, as float16
+* the exact contiguous regions of frames having an energy ratio above the
+  default ratio threshold (RATIO_THR, 0.5):
+  start frame, duration in frames and mean total energy
+Bips detected with the default ratio threshold use the exact regions, and
+are the same as those of detect. Other ratio thresholds use the quantized
+series.
+Features take about 400 bytes per second of signal and per channel once
+compressed, instead of 32kB for 4kHz float64 samples.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+
+from .decode import ArrayDecoder, as_2d, check_media, select_decoder, decode_media
+from .dsp import (STEP_SEC, RATIO_THR, MIN_DUR, MAX_DUR, ENERGY_THR, multichannel_frame_energies,
+                  contiguous_regions, valid_bip_durations, check_pattern_features,
+                  CandidateEnergyFilter)
+from .patterns import (TOLERANCE, SHORT_TOLERANCE, PATTERNS, is_bip_pattern, bip_pattern_stats,
+                       folded_pattern, folding_stats)
+from .detection import DetectionResult
+from .cache import media_fingerprint, detector_key
+
+# energy ratio threshold of the exact regions: the default bip detection one
+REGIONS_RATIO = RATIO_THR
+# quantization of energy ratios
+RATIO_SCALE = 2**16 - 1
+
+class ChannelFeatures:
+    """
+    Frame features of a single channel
+    ratio: uint16 quantized energy ratio around 1000Hz of each frame
+    energy: float16 total energy of each frame, divided by 'scale'
+    regions: (start frame, duration in frames, mean energy) of the regions of
+    frames having an energy ratio above REGIONS_RATIO, as a (n, 3) array
+    """
+    def __init__(self, ratio, energy, scale, regions):
+        self.ratio = ratio
+        self.energy = energy
+        self.scale = scale
+        self.regions = regions
+
+    @classmethod
+    def from_energies(cls, energy_1000hz, energy_all):
+        """ features of the frame energies computed by bip_frame_energies """
+        energy_ratio = energy_1000hz / energy_all
+        idx, dur = contiguous_regions(energy_ratio > REGIONS_RATIO)
+        regions = np.array([(i, d, np.mean(energy_all[i:(i+d)])) for i, d in zip(idx, dur)],
+                           dtype=np.float64).reshape(-1, 3)
+        scale = float(np.max(energy_all)) if len(energy_all) > 0 else 1.
+        ratio = np.round(np.clip(energy_ratio, 0, 1) * RATIO_SCALE).astype(np.uint16)
+        return cls(ratio, (energy_all / scale).astype(np.float16), scale, regions)
+
+    def candidates(self, ratio_thr=REGIONS_RATIO):
+        """
+        start frame, duration in frames and mean energy of the regions of
+        frames having an energy ratio above ratio_thr
+        """
+        if ratio_thr == REGIONS_RATIO:
+            return (self.regions[:, 0].astype(np.int64), self.regions[:, 1].astype(np.int64),
+                    self.regions[:, 2])
+        idx, dur = contiguous_regions(self.ratio > ratio_thr * RATIO_SCALE)
+        # mean energies of all regions from a cumulative sum
+        cumsum = np.concatenate(([0.], np.cumsum(self.energy, dtype=np.float64)))
+        return idx, dur, (cumsum[idx + dur] - cumsum[idx]) * self.scale / np.maximum(dur, 1)
+
+    def bips(self, ratio_thr=RATIO_THR, min_dur=MIN_DUR, max_dur=MAX_DUR, energy_thr=ENERGY_THR):
+        """ bips detected with the given thresholds, see energies2bip """
+        idx, dur, energy = self.candidates(ratio_thr)
+        valid_durs = valid_bip_durations(dur, min_dur, max_dur)
+        if not np.any(valid_durs):
+            return []
+        energy_filter = CandidateEnergyFilter(energy_thr)
+        energy_filter.add(idx[valid_durs], energy[valid_durs])
+        return energy_filter.result() * STEP_SEC
+
+
+class MediaFeatures:
+    """
+    Frame features of the (stream, channel) audio tracks of a media
+    tracks: list of tracks
+    channels: list of ChannelFeatures, one per track
+    duration: duration of the media analyzed, in seconds
+    features: frame energy computation method used. Energy ratios below
+    REGIONS_RATIO of frames computed with 'dft' are upper bounds, and those
+    of frames gated out by 'gated' are 0, so that lower ratio thresholds require
+    'fft' features. 'baseband' ratios approximate spectrogram ones.
+    """
+    def __init__(self, tracks, channels, duration, features='fft'):
+        self.tracks = tracks
+        self.channels = channels
+        self.duration = duration
+        self.features = features
+
+    def detect(self, ratio_thr=RATIO_THR, min_dur=MIN_DUR, max_dur=MAX_DUR,
+               energy_thr=ENERGY_THR, tolerance=TOLERANCE, short_tolerance=SHORT_TOLERANCE,
+               pattern='intervals'):
+        """
+        DetectionResult obtained with the given thresholds, see energies2bip
+        and is_bip_pattern. Default thresholds lead to the result of detect.
+        pattern: 'folding' tests the quantized energy ratios of each channel
+        by epoch folding instead (see EpochFolding), tolerances being ignored.
+        It requires features giving the ratio of every frame, see
+        FOLDING_FEATURES.
+        """
+        if pattern not in PATTERNS:
+            raise ValueError('unknown pattern test %s' % pattern)
+        check_pattern_features(pattern, self.features)
+        if self.features != 'fft' and ratio_thr < REGIONS_RATIO:
+            raise ValueError('ratio thresholds below %.1f require fft features' % REGIONS_RATIO)
+        bips = [c.bips(ratio_thr, min_dur, max_dur, energy_thr) for c in self.channels]
+        if pattern == 'folding':
+            folded = [folded_pattern(c.ratio / float(RATIO_SCALE), STEP_SEC)
+                      for c in self.channels]
+            return DetectionResult(self.tracks, [match for match, _, _ in folded], bips,
+                                   self.duration, [folding_stats(phase, score, len(b)) for
+                                                   (_, phase, score), b in zip(folded, bips)])
+        matches = [is_bip_pattern(b, self.duration, tolerance, short_tolerance) for b in bips]
+        stats = [bip_pattern_stats(b, self.duration, tolerance, short_tolerance) for b in bips]
+        return DetectionResult(self.tracks, matches, bips, self.duration, stats)
+
+    def save(self, path):
+        """ save features to a compressed .npz file """
+        arrays = {}
+        for i, c in enumerate(self.channels):
+            arrays.update({'ratio_%d' % i: c.ratio, 'energy_%d' % i: c.energy,
+                           'regions_%d' % i: c.regions})
+        header = {'tracks': [list(t) for t in self.tracks], 'duration': self.duration,
+                  'features': self.features, 'scales': [c.scale for c in self.channels]}
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, header=np.array(json.dumps(header)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """ load features saved by save """
+        with np.load(path) as npz:
+            header = json.loads(str(npz['header']))
+            channels = [ChannelFeatures(npz['ratio_%d' % i], npz['energy_%d' % i], scale,
+                                        npz['regions_%d' % i])
+                        for i, scale in enumerate(header['scales'])]
+        return cls([tuple(t) for t in header['tracks']], channels, header['duration'],
+                   header['features'])
+
+
+def extract_features(media, samplerate=None, tracks=None, decode='pipe', decoder='ffmpeg',
+                     precision='float64', features='fft', tmpdir='/dev/shm/', ffmpeg='ffmpeg',
+                     ffprobe=None):
+    """
+    Decode a media, or use a signal already loaded in memory, and compute
+    the frame features of its tracks. Arguments are those of detect, decode
+    being 'pipe' or 'file'.
+    Returns a MediaFeatures
+    """
+    if decode not in ('pipe', 'file'):
+        raise ValueError('unknown decode method %s' % decode)
+    if isinstance(media, (str, bytes, os.PathLike)):
+        check_media(media)
+    else:
+        if samplerate is None:
+            raise ValueError('samplerate is required for computing features of arrays')
+        media = as_2d(media)
+        decoder = ArrayDecoder(samplerate, precision)
+    decoder = select_decoder(media, decoder, ffmpeg, tmpdir, decode, precision, ffprobe)
+    tracks = decoder.select_tracks(media, tracks)
+    wav_data = decode_media(media, tmpdir, ffmpeg, 4000, decode, decoder=decoder, tracks=tracks)
+    energy_1000hz, energy_all = multichannel_frame_energies(wav_data, features)
+    channels = [ChannelFeatures.from_energies(e1000, eall)
+                for e1000, eall in zip(energy_1000hz, energy_all)]
+    return MediaFeatures(tracks, channels, wav_data.shape[0] / 4000., features)
+
+
+class FeatureStore:
+    """
+    Directory storing the features of media files, named after the media
+    fingerprint and the feature extraction parameters (see
+    cache.media_fingerprint), so that features are computed once per media
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, media, options):
+        """ path of the features of a media extracted with extract_features options """
+        key = media_fingerprint(media) + detector_key(options, extract_features)
+        key += '%s:%d' % (REGIONS_RATIO, RATIO_SCALE)
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.npz')
+
+    def get(self, media, refresh=False, **options):
+        """
+        features of a media file, extracted with extract_features options,
+        loaded from the store, or extracted and stored if they have not been
+        stored yet (or if refresh is True)
+        """
+        path = self.path(media, options)
+        if not refresh and os.path.exists(path):
+            return MediaFeatures.load(path)
+        ret = extract_features(media, **options)
+        # atomic update, the store may be shared by several processes
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        ret.save(tmp)
+        os.replace(tmp, path)
+        return ret
+
+def stored_detect(media, features_dir, refresh=False, pattern='intervals', **options):
+    """
+    detect based on the features of a media file stored in the FeatureStore
+    at 'features_dir', which are extracted and stored first if needed.
+    pattern: pattern test, see MediaFeatures.detect
+    options: extract_features keyword arguments
+    """
+    check_pattern_features(pattern, options.get('features', 'fft'))
+    return FeatureStore(features_dir).get(media, refresh, **options).detect(pattern=pattern)
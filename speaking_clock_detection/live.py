@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Live monitoring of speaking clocks in streams: satellite or IP feeds, named
+pipes or standard input, decoded by ffmpeg as they are received.
+Each channel is analyzed in a rolling window, and an event is emitted
+whenever its speaking clock status changes.
+"""
+
+import time
+import struct
+import numpy as np
+
+from .decode import FFmpegPipe, pcm_samples, track_labels
+from .dsp import STEP_SEC, WIN_SEC, StreamingEnergies, energies2bip
+from .patterns import is_bip_pattern
+
+
+class RollingDetector(StreamingEnergies):
+    """
+    Speaking clock detection in the last 'window' seconds of a single
+    channel signal sampled at 4kHz, processed block by block.
+    Only the frame energies of the window are kept, so that memory and CPU
+    usage per second of signal do not depend on the duration processed.
+    features: frame energy computation method, see bip_frame_energies
+    """
+    def __init__(self, window=60., features='fft'):
+        StreamingEnergies.__init__(self, features)
+        self.window = window
+        self.window_frames = int(round((window - WIN_SEC) / STEP_SEC)) + 1
+        self.energy_1000hz = np.zeros(0)
+        self.energy_all = np.zeros(0)
+
+    def feed(self, data):
+        """ process a new block of samples """
+        energies = self.energies(data)
+        if energies is None:
+            return
+        self.nframes += len(energies[1])
+        self.energy_1000hz = np.concatenate((self.energy_1000hz, energies[0]))
+        self.energy_all = np.concatenate((self.energy_all, energies[1]))
+        self.energy_1000hz = self.energy_1000hz[-self.window_frames:]
+        self.energy_all = self.energy_all[-self.window_frames:]
+
+    def bips(self):
+        """ bips detected in the window, in seconds from the start of signal """
+        first = self.nframes - len(self.energy_all)
+        return first * STEP_SEC + np.asarray(energies2bip(self.energy_1000hz, self.energy_all))
+
+    def status(self):
+        """
+        Tell if the window is a speaking clock pattern. Returns None until
+        'window' seconds of signal have been processed.
+        """
+        if len(self.energy_all) < self.window_frames:
+            return None
+        return is_bip_pattern(self.bips(), self.window)
+
+
+class FFmpegLivePipe(FFmpegPipe):
+    """
+    ffmpeg process decoding the channels of an audio stream of a live input
+    (any input supported by ffmpeg, '-' for standard input), and writing a
+    wav stream sampled at 'outsr' Hz to its standard output.
+    Input is not probed, since probing would consume the data of pipes: the
+    amount of channels is read from the wav header.
+    """
+    def __init__(self, infname, ffmpeg='ffmpeg', outsr=4000, stream=0):
+        stdin = infname in ('-', 'pipe:', 'pipe:0')
+        self.cmd = [ffmpeg] + ([] if stdin else ['-nostdin']) + ['-v', 'error'] + \
+            ['-i', 'pipe:0' if stdin else infname, '-map', '0:a:%d' % stream,
+             '-ar', str(outsr), '-f', 'wav', '-acodec', 'pcm_s16le', '-flush_packets', '1', '-']
+        self._start()
+        try:
+            self.nchannels = self._read_header()
+        except BaseException:
+            self.close(kill=True)
+            raise
+        self.tracks = [(stream, c) for c in range(self.nchannels)]
+        self.frame_bytes = 2 * self.nchannels
+        self.duration = None
+
+    def _read(self, nbytes):
+        buf = bytearray(nbytes)
+        if self.readinto(buf) < nbytes:
+            # ffmpeg failed before writing the header
+            self.close()
+            raise EOFError('no audio decoded from live input')
+        return buf
+
+    def _read_header(self):
+        """ parse wav header, and return the amount of channels """
+        riff = self._read(12)
+        assert riff[:4] == b'RIFF' and riff[8:] == b'WAVE', 'invalid wav stream'
+        nchannels = None
+        while True:
+            chunk_id, size = struct.unpack('<4sI', self._read(8))
+            if chunk_id == b'data':
+                assert nchannels is not None, 'wav stream without format'
+                return nchannels
+            data = self._read(size + size % 2)
+            if chunk_id == b'fmt ':
+                nchannels = struct.unpack('<H', data[2:4])[0]
+
+
+def live_events(infname, ffmpeg='ffmpeg', stream=0, channels=None, window=60., hop=1.,
+                features='fft', precision='float64'):
+    """
+    Monitor speaking clocks in a live input, and yield an event whenever the
+    status of a channel changes, the first status of each channel being
+    known once 'window' seconds have been received.
+    * infname: any input supported by ffmpeg (UDP or RTP URL, named pipe,
+      file...), '-' for standard input
+    * stream: audio stream to monitor
+    * channels: list of the channels of this stream to monitor, all by default
+    * window: duration in seconds of the rolling analysis window
+    * hop: duration in seconds of the signal read between two verdicts,
+      which bounds the latency of verdicts
+    Events are dicts with fields: 'time' of the end of the window in seconds
+    from the start of the input, wall clock 'timestamp' in seconds since
+    the epoch, 'track' label, 'speaking_clock' status, and amount of 'bips'
+    detected in the window.
+    Returns when the input ends, raising CalledProcessError if ffmpeg failed
+    """
+    pipe = FFmpegLivePipe(infname, ffmpeg, 4000, stream)
+    try:
+        channels = list(range(pipe.nchannels)) if channels is None else channels
+        labels = track_labels([pipe.tracks[c] for c in channels])
+        detectors = [RollingDetector(window, features) for _ in channels]
+        statuses = [None for _ in channels]
+        blocksize = int(hop * 4000)
+        while True:
+            buf = bytearray(blocksize * pipe.frame_bytes)
+            pos = pipe.readinto(buf)
+            # the last block may end in the middle of a sample frame
+            pos -= pos % pipe.frame_bytes
+            if pos == 0:
+                break
+            pcm = np.frombuffer(buf, dtype='<i2', count=pos // 2).reshape(-1, pipe.nchannels)
+            block = pcm_samples(pcm, precision)
+            for i, (channel, detector) in enumerate(zip(channels, detectors)):
+                detector.feed(block[:, channel])
+                status = detector.status()
+                if status is not None and status != statuses[i]:
+                    statuses[i] = status
+                    yield {'time': round(detector.duration(), 3), 'timestamp': time.time(),
+                           'track': labels[i], 'speaking_clock': bool(status),
+                           'bips': len(detector.bips())}
+    except BaseException:
+        pipe.close(kill=True)
+        raise
+    pipe.close()
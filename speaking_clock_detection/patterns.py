@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Speaking clock bip patterns: 0 10 20 30 40 57 58 59, leading to diff bip
+pattern of 17, 3*1; 4*10. Patterns are either tested from the time intervals
+between bips, or by epoch folding of the frame energy ratios.
+"""
+
+import numpy as np
+
+from .profiling import stage
+
+# intervals pattern test: bounds of the amount of time intervals between
+# bips relative to the ideal amount, excluded for signals lasting at least
+# SHORT_DUR seconds and included for shorter ones, and factor by which the
+# valid intervals (1, 10 or 17 seconds) should outnumber the other ones
+TOLERANCE = (0.8, 1.2)
+SHORT_TOLERANCE = (0.3, 1.5)
+SHORT_DUR = 60.
+VALID_FACTOR = 4
+
+# sequential test: probability of a valid interval for a speaking clock and
+# otherwise, and seconds without any bip counted as an invalid interval
+P_CLOCK = 0.9
+P_OTHER = 0.5
+MAX_GAP = 20.
+
+def is_bip_pattern(bip_list, dur, tolerance=TOLERANCE, short_tolerance=SHORT_TOLERANCE):
+    """
+    Tell if a bip list seems to be a speaking clock pattern
+    tolerance, short_tolerance: see is_interval_pattern
+    """
+
+    with stage('pattern'):
+        if len(bip_list) == 0: # no bip found
+            return False
+
+        # get time interval between bips
+        dbip = np.int32(np.round(np.diff(bip_list)))
+        return is_interval_pattern(dbip, dur, 0, tolerance, short_tolerance)
+
+
+def is_windowed_bip_pattern(bip_lists, durs):
+    """
+    Tell if bip lists found in several distinct windows of a media, of
+    respective durations 'durs', seem to be a speaking clock pattern
+    """
+
+    with stage('pattern'):
+        if sum([len(bip_list) for bip_list in bip_lists]) == 0: # no bip found
+            return False
+
+        # time intervals between bips are only available within windows
+        dbip = np.concatenate([np.int32(np.round(np.diff(bip_list)))
+                               for bip_list in bip_lists if len(bip_list) > 0])
+        # the first bip of each window does not lead to any time interval
+        return is_interval_pattern(dbip, sum(durs), len(durs) - 1,
+                                   expected=windowed_interval_bounds(durs))
+
+
+def is_interval_pattern(dbip, dur, nmissing=0, tolerance=TOLERANCE,
+                        short_tolerance=SHORT_TOLERANCE, expected=None):
+    """
+    Tell if the rounded time intervals between bips found in 'dur' seconds of
+    signal seem to be a speaking clock pattern. 'nmissing' is the amount of
+    intervals that could not be observed, when dur is the total duration of
+    several distinct windows.
+    tolerance: bounds of the amount of intervals relative to the ideal
+    amount, excluded, for signals lasting at least SHORT_DUR seconds
+    short_tolerance: bounds for shorter signals, included
+    expected: (lowest, highest) ideal amounts of intervals, when they depend
+    on the position of the pattern in the signal (see
+    windowed_interval_bounds), instead of 8 per minute minus nmissing
+    """
+
+    # count the amount of valid and invalid time intervals
+    nb1 = np.sum(dbip == 1)
+    nb10 = np.sum(dbip == 10)
+    nb17 = np.sum(dbip == 17)
+    nbother = len(dbip) - nb1 - nb10 - nb17
+
+    # in ideal case, there should be 8 bips per minute, this is not systematic
+    est_low, est_high = expected_intervals(dur, nmissing, expected)
+    # condition for valid bip pattern:
+    # * amount of valid bips > VALID_FACTOR * amount of invalid bips
+    # * 0.8 ideal number of bips < nb bip founds < 1.2 ideal number of bips
+    if dur < SHORT_DUR:
+        # more tolerance for small durations
+        return ((nb1 + nb10 + nb17) > (VALID_FACTOR * nbother)) and len(dbip) >= (est_low * short_tolerance[0]) and len(dbip) <= (est_high * short_tolerance[1])
+    return ((nb1 + nb10 + nb17) > VALID_FACTOR * nbother) and len(dbip) > (est_low * tolerance[0]) and len(dbip) < (est_high * tolerance[1])
+
+
+def expected_intervals(dur, nmissing=0, expected=None):
+    """
+    (lowest, highest) ideal amounts of intervals between bips in 'dur'
+    seconds of signal: 'expected' if provided, 8 per minute minus the
+    'nmissing' intervals that could not be observed otherwise
+    """
+    if expected is not None:
+        return expected
+    est_bips = dur / 60. * 8 - nmissing
+    return est_bips, est_bips
+
+
+def window_interval_bounds(dur):
+    """
+    Lowest and highest amounts of time intervals between the bips of a
+    speaking clock observed in a window of 'dur' seconds, over all the
+    positions of the window relative to the minute: windows lasting 30
+    seconds may contain from 1 to 5 intervals, depending on their position.
+    """
+    seconds = np.array(CLOCK_SECONDS, dtype=np.float64)
+    # bips of enough minutes to cover a window starting in the first one
+    nminutes = int(np.ceil(dur / CLOCK_PERIOD)) + 1
+    bips = (np.arange(nminutes)[:, None] * CLOCK_PERIOD + seconds).ravel()
+    # the amount of bips in [start, start + dur) only changes when a window
+    # bound crosses a bip: test the starts just before and after each change
+    changes = np.concatenate((seconds, (seconds - dur) % CLOCK_PERIOD))
+    starts = np.concatenate((changes, changes + 1e-6, changes - 1e-6)) % CLOCK_PERIOD
+    nbips = np.searchsorted(bips, starts + dur) - np.searchsorted(bips, starts)
+    nintervals = np.maximum(nbips - 1, 0)
+    return int(np.min(nintervals)), int(np.max(nintervals))
+
+
+def windowed_interval_bounds(durs):
+    """
+    Lowest and highest amounts of time intervals between the bips of a
+    speaking clock observed in distinct windows of respective durations
+    'durs', see window_interval_bounds
+    """
+    bounds = [window_interval_bounds(dur) for dur in durs]
+    return sum([low for low, _ in bounds]), sum([high for _, high in bounds])
+
+
+def interval_stats(dbip, dur, nbips, nmissing=0, tolerance=TOLERANCE,
+                   short_tolerance=SHORT_TOLERANCE, expected=None):
+    """
+    Statistics of the rounded time intervals between the 'nbips' bips found
+    in 'dur' seconds of signal, explaining the decision of
+    is_interval_pattern (same arguments). Returns a dict with:
+    * bips: amount of bips
+    * intervals_1, intervals_10, intervals_17: amounts of valid intervals
+    * invalid_intervals: amount of other intervals
+    * invalid_ratio: invalid intervals / intervals, None without intervals
+    * expected_bips: ideal amount of intervals, 8 per minute of signal, or
+      middle of the 'expected' bounds
+    * count_ratio: intervals / expected_bips
+    * score: margin of the decision, between -1 and 1, positive for a
+      speaking clock: minimum of the margins of the invalid ratio to its
+      threshold 1 / (1 + VALID_FACTOR), and of the count ratio to the tolerance bounds, each
+      margin being 1 for an ideal pattern, and 0 at the threshold
+    * confidence: absolute value of the score, 0 for borderline decisions
+    """
+    with stage('pattern'):
+        nb1 = int(np.sum(dbip == 1))
+        nb10 = int(np.sum(dbip == 10))
+        nb17 = int(np.sum(dbip == 17))
+        nbother = len(dbip) - nb1 - nb10 - nb17
+        est_low, est_high = expected_intervals(dur, nmissing, expected)
+        est_bips = (est_low + est_high) / 2.
+        lo, hi = short_tolerance if dur < SHORT_DUR else tolerance
+
+        # valid pattern: invalid intervals < 20% of intervals
+        invalid_ratio = nbother / len(dbip) if len(dbip) > 0 else None
+        max_invalid = 1. / (1 + VALID_FACTOR)
+        valid_margin = (max_invalid - invalid_ratio) / max_invalid \
+            if nbips > 0 and len(dbip) > 0 else -1.
+        count_ratio = len(dbip) / est_bips if est_bips > 0 else np.inf
+        # count ratios to the bounds of the expected amount
+        low_ratio = len(dbip) / est_low if est_low > 0 else np.inf
+        high_ratio = len(dbip) / est_high if est_high > 0 else np.inf
+        count_margin = min((low_ratio - lo) / (1. - lo), (hi - high_ratio) / (hi - 1.))
+        score = float(np.clip(min(valid_margin, count_margin), -1., 1.))
+        return {'bips': int(nbips), 'intervals_1': nb1, 'intervals_10': nb10, 'intervals_17': nb17,
+                'invalid_intervals': nbother,
+                'invalid_ratio': None if invalid_ratio is None else round(invalid_ratio, 4),
+                'expected_bips': round(est_bips, 3),
+                'count_ratio': round(float(count_ratio), 4) if est_bips > 0 else None,
+                'score': round(score, 4), 'confidence': round(abs(score), 4)}
+
+def bip_pattern_stats(bip_list, dur, tolerance=TOLERANCE, short_tolerance=SHORT_TOLERANCE):
+    """ interval_stats of a bip list, explaining the decision of is_bip_pattern """
+    dbip = np.int32(np.round(np.diff(bip_list))) if len(bip_list) > 0 else np.zeros(0)
+    return interval_stats(dbip, dur, len(bip_list), 0, tolerance, short_tolerance)
+
+def windowed_bip_pattern_stats(bip_lists, durs):
+    """ interval_stats of bip lists, explaining the decision of is_windowed_bip_pattern """
+    dbip = np.concatenate([np.zeros(0)] + [np.int32(np.round(np.diff(bip_list)))
+                                           for bip_list in bip_lists if len(bip_list) > 0])
+    return interval_stats(dbip, sum(durs), sum([len(b) for b in bip_lists]), len(durs) - 1,
+                          expected=windowed_interval_bounds(durs))
+
+
+def bip_sequential_llr(bip_list, dur, p_clock=P_CLOCK, p_other=P_OTHER, max_gap=MAX_GAP):
+    """
+    Log-likelihood ratio between the speaking clock hypothesis and the
+    alternative hypothesis, for bips observed on 'dur' seconds of signal.
+    Observations are the time intervals between bips, which are valid
+    (1, 10 or 17 seconds) with probability p_clock for a speaking clock,
+    and p_other otherwise. Each 'max_gap' seconds without any bip counts as
+    an additional invalid interval, so that silent channels are rejected.
+    """
+    with stage('pattern'):
+        bip_list = np.asarray(bip_list)
+        if len(bip_list) == 0:
+            nvalid, ninvalid = 0, 0
+            gaps = np.array([dur])
+        else:
+            dbip = np.diff(bip_list)
+            nvalid = np.sum(np.isin(np.int32(np.round(dbip)), (1, 10, 17)))
+            ninvalid = len(dbip) - nvalid
+            gaps = np.r_[bip_list[0], dbip, dur - bip_list[-1]]
+        ninvalid += np.sum(np.floor(gaps / max_gap))
+        return nvalid * np.log(p_clock / p_other) + \
+            ninvalid * np.log((1 - p_clock) / (1 - p_other))
+
+def sequential_bip_pattern(bip_list, dur, confidence=0.999):
+    """
+    Sequential test telling if a bip list, observed on the 'dur' first
+    seconds of a media, is a speaking clock pattern.
+    Returns True or False once the test has reached the expected confidence,
+    None if more signal is required to decide.
+    """
+    alpha = 1. - confidence
+    llr = bip_sequential_llr(bip_list, dur)
+    # decision should be consistent with the one obtained on the whole media
+    if llr >= np.log((1. - alpha) / alpha) and is_bip_pattern(bip_list, dur):
+        return True
+    if llr <= np.log(alpha / (1. - alpha)) and not is_bip_pattern(bip_list, dur):
+        return False
+    return None
+
+# seconds of each minute starting with a bip, and period of the pattern
+CLOCK_SECONDS = (0, 10, 20, 30, 40, 57, 58, 59)
+CLOCK_PERIOD = 60.
+
+# pattern tests: time intervals between bips, or epoch folding of frame
+# energy ratios
+PATTERNS = ('intervals', 'folding')
+
+# epoch folding: duration in seconds of the start of bips, summed at each
+# bip second, and time after which bips are over, amount of bip seconds
+# needed to make a pattern, score above which a channel is a speaking clock,
+# and score below which it is not once a whole period has been folded
+FOLDING_BIP_DUR = 0.08
+FOLDING_GUARD = 0.18
+FOLDING_MIN_BIPS = 3
+FOLDING_THRESHOLD = 8.
+FOLDING_REJECT = 4.
+
+
+class EpochFolding:
+    """
+    Epoch folding of the energy ratios around 1000Hz of the frames of a
+    single channel, spaced by 'step' seconds, modulo the period of the
+    speaking clock pattern: ratios are summed per phase of the minute, so
+    that the bips of a speaking clock add up minute after minute, while
+    other sounds spread over all phases.
+    Frames may be added block by block, or at any time offset, such as
+    separate windows of a media.
+    """
+    def __init__(self, step):
+        self.step = step
+        self.nphases = int(round(CLOCK_PERIOD / step))
+        # amount, sum and sum of squares of the ratios of each phase
+        self.counts = np.zeros(self.nphases)
+        self.sums = np.zeros(self.nphases)
+        self.squares = np.zeros(self.nphases)
+        # index of the frame following the last added one
+        self.nframes = 0
+
+    def add(self, energy_ratio, start=None):
+        """
+        fold the energy ratios of consecutive frames, the first of them
+        starting 'start' seconds after the start of the media (just after
+        the frames added so far by default)
+        """
+        with stage('pattern'):
+            energy_ratio = np.asarray(energy_ratio, np.float64)
+            first = self.nframes if start is None else int(round(start / self.step))
+            phases = (first + np.arange(len(energy_ratio))) % self.nphases
+            self.counts += np.bincount(phases, minlength=self.nphases)
+            self.sums += np.bincount(phases, energy_ratio, self.nphases)
+            self.squares += np.bincount(phases, energy_ratio ** 2, self.nphases)
+            self.nframes = first + len(energy_ratio)
+
+    def circular_sums(self, values, width):
+        """ sums of 'width' consecutive phases of 'values', from each phase """
+        cumsum = np.concatenate(([0.], np.cumsum(np.r_[values, values[:width]])))
+        return cumsum[width:(width + self.nphases)] - cumsum[:self.nphases]
+
+    def scores(self):
+        """
+        matched filter score of each phase of the pattern, the phase being
+        the position of the bip of second 0 in the folded minute.
+        The folded ratios, centered on their mean, are summed over
+        FOLDING_BIP_DUR seconds from each phase, minus the mean of the sums
+        just before and FOLDING_GUARD seconds after, so that sounds longer
+        than bips do not match, and divided by the square root of the amount
+        of frames summed. These sums are normalized by their robust standard
+        deviation over all phases, or by the standard deviation of frame
+        ratios if larger, as ratios are mostly null on channels without
+        1000Hz content.
+        The mean sum found at the 52 seconds of the minute where a speaking
+        clock has no bip is subtracted from the sums found at its 8 bip
+        seconds, so that sounds repeated every second do not match. The
+        score is the lowest of these differences, as a speaking clock has
+        all its bips, times the square root of their amount. Only the
+        seconds covered by the folded frames are used, so that less than a
+        minute may be tested, the score being null with less than
+        FOLDING_MIN_BIPS bip seconds.
+        """
+        with stage('pattern'):
+            total = np.sum(self.counts)
+            if total == 0:
+                return np.zeros(self.nphases)
+            mean = np.sum(self.sums) / total
+            width = max(1, int(round(FOLDING_BIP_DUR / self.step)))
+            guard = int(round(FOLDING_GUARD / self.step))
+            box = self.circular_sums(self.sums - self.counts * mean, width)
+            box -= (np.roll(box, width) + np.roll(box, -guard)) / 2.
+            nbox = self.circular_sums(self.counts, width)
+            covered = nbox > 0
+            box = box / np.sqrt(np.maximum(nbox, 1))
+            deviation = np.sqrt(max(np.sum(self.squares) / total - mean ** 2, 0.))
+            spread = max(1.4826 * np.median(np.abs(box[covered] - np.median(box[covered]))),
+                         deviation)
+            if spread == 0:
+                return np.zeros(self.nphases)
+            box = box * covered / spread
+
+            offsets = [int(round(sec / self.step)) for sec in range(int(round(CLOCK_PERIOD)))]
+            off_sum = np.zeros(self.nphases)
+            off_count = np.zeros(self.nphases)
+            on = []
+            for sec, offset in enumerate(offsets):
+                if sec in CLOCK_SECONDS:
+                    on.append(np.where(np.roll(covered, -offset), np.roll(box, -offset), np.inf))
+                else:
+                    off_sum += np.roll(box, -offset)
+                    off_count += np.roll(covered, -offset)
+            n_on = np.sum(np.isfinite(on), axis=0)
+            lowest = np.min(on, axis=0) - off_sum / np.maximum(off_count, 1)
+            return np.where(n_on >= FOLDING_MIN_BIPS, lowest, 0.) * np.sqrt(n_on)
+
+    def complete(self):
+        """ tell if every phase of the period has been folded """
+        return bool(np.all(self.counts > 0))
+
+    def phase_score(self):
+        """
+        best phase of the pattern, in seconds: bips are expected at times
+        phase + 0, 10, 20, 30, 40, 57, 58 and 59 seconds modulo 60 from the
+        start of the media, and its matched filter score (see scores)
+        """
+        scores = self.scores()
+        best = int(np.argmax(scores))
+        return round(best * self.step, 3), round(float(scores[best]), 4)
+
+def folded_pattern(energy_ratio, step, threshold=FOLDING_THRESHOLD):
+    """
+    Epoch folding test of the energy ratios around 1000Hz of the frames of
+    a single channel, spaced by 'step' seconds (see EpochFolding).
+    Returns (match, phase, score), match telling if the best phase has a
+    score above 'threshold'
+    """
+    folding = EpochFolding(step)
+    folding.add(energy_ratio)
+    phase, score = folding.phase_score()
+    return score > threshold, phase, score
+
+def sequential_folded_pattern(folding, threshold=FOLDING_THRESHOLD, reject=FOLDING_REJECT):
+    """
+    Sequential epoch folding test of the frames folded so far by an
+    EpochFolding: True once the score exceeds 'threshold', False once a
+    whole period has been folded with a score below 'reject', None if the
+    decision is still pending
+    """
+    _, score = folding.phase_score()
+    if score > threshold:
+        return True
+    if folding.complete() and score < reject:
+        return False
+    return None
+
+def folding_stats(phase, score, nbips=None, threshold=FOLDING_THRESHOLD):
+    """
+    statistics explaining an epoch folding decision, with the keys of
+    interval_stats: 'score' is the margin of the folding score to the
+    threshold relative to the threshold, between -1 and 1
+    """
+    margin = float(np.clip((score - threshold) / threshold, -1., 1.))
+    return {'bips': nbips, 'phase': phase, 'folding_score': score,
+            'score': round(margin, 4), 'confidence': round(abs(margin), 4)}
+
+def channel_verdict(matches):
+    """
+    Returns the number of the channel corresponding to speaking clock
+    given the pattern decision obtained for each channel
+    -1 if speaking clock has not been found
+    -2 if speaking clock has been found in more than 1 channel
+    """
+    ret = [i for i, match in enumerate(matches) if match]
+    if len(ret) == 0:
+        return -1
+    elif len(ret) == 1:
+        return ret[0]
+    return -2
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Per-stage profiling of speaking clock detection: wall time, CPU time, peak
+traced memory and peak resident set size of media probing, decoding,
+loading of decoded samples, pre-emphasis, spectrogram, energy ratio, region
+extraction and pattern test.
+
+Processing functions delimit their stages with 'stage', which only records
+something when a Profile is active in the current thread, and returns a
+shared context doing nothing otherwise, so that profiling costs nothing
+when it is disabled.
+"""
+
+import sys
+import time
+import threading
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows: CPU time and memory of subprocesses are not reported
+    resource = None
+
+# stages, in processing order
+STAGES = ('probe', 'decode', 'load', 'preemphasis', 'spectrogram', 'energy_ratio', 'regions',
+          'pattern')
+
+# maxrss unit of getrusage
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+_local = threading.local()
+
+
+class _NoStage:
+    """ context manager of stages when profiling is disabled """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_STAGE = _NoStage()
+
+def stage(name):
+    """
+    context manager delimiting a processing stage, see STAGES. Its costs are
+    recorded by the Profile active in the current thread, if any.
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return _NO_STAGE
+    return _Stage(profile, name)
+
+def count(name, n):
+    """
+    add n to the counter 'name' of the Profile active in the current thread,
+    if any, such as the amount of frames gated out by 'gated' features
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile.counters[name] = profile.counters.get(name, 0) + int(n)
+
+def _peak_rss():
+    """ peak resident set size of the process in bytes, None if unknown (Linux only) """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def _reset_peak_rss():
+    """ reset the peak resident set size of the process, return False if not supported """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _child_usage():
+    """ CPU time in seconds and max RSS in bytes of the terminated subprocesses """
+    if resource is None:
+        return 0., 0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss * RSS_UNIT
+
+
+class _Stage:
+    """ a stage being profiled """
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile._enter()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.child_cpu = _child_usage()[0]
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        child_cpu = _child_usage()[0] - self.child_cpu
+        self.profile._exit(self.name, wall, cpu, child_cpu)
+        return False
+
+
+class Profile:
+    """
+    Wall time, CPU time, CPU time of subprocesses (such as ffmpeg), peak
+    traced memory and peak resident set size of each stage run while the
+    profile is active, which is done by using it as a context manager in the
+    thread running detection.
+    Memory is traced with tracemalloc, which accounts for NumPy arrays, and
+    slows down processing: it may be disabled with memory=False. Peak
+    memory is the highest amount of traced memory while a stage is running,
+    including the memory allocated before it (such as decoded samples).
+    Peaks of each stage require Python >= 3.9, and are peaks since the
+    profile activation with older versions.
+    Peak resident set sizes of each stage are only measured with rss=True:
+    they are obtained by resetting the peak of the whole process before each
+    stage, which is only supported on Linux, and affects any other
+    measurement of the peak of the process. They include the memory of the
+    interpreter and of the libraries. The max resident set size of the
+    process is reported in any case.
+    """
+    def __init__(self, memory=True, rss=False):
+        self.memory = memory
+        self.rss = rss
+        # name -> [calls, wall, cpu, child cpu, peak memory, peak rss]
+        self.stages = {}
+        # name -> value, see count
+        self.counters = {}
+        self.wall = self.cpu = self.child_cpu = 0.
+        self.max_rss = self.child_max_rss = None
+        # (peak memory, peak rss) of the stages being run, when stages are nested
+        self._peaks = []
+        self._tracing = False
+
+    def __enter__(self):
+        if getattr(_local, 'profile', None) is not None:
+            raise RuntimeError('a profile is already active in this thread')
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        if self.rss:
+            # peak of the process before profiling
+            self.max_rss = _peak_rss()
+            self.rss = self.max_rss is not None and _reset_peak_rss()
+        _local.profile = self
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._child_cpu = _child_usage()[0]
+        return self
+
+    def __exit__(self, *exc):
+        self.wall += time.perf_counter() - self._wall
+        self.cpu += time.process_time() - self._cpu
+        child_cpu, self.child_max_rss = _child_usage()
+        self.child_cpu += child_cpu - self._child_cpu
+        if self.rss:
+            # the peak of the process has been reset by stages
+            self.max_rss = max([self.max_rss, _peak_rss()] + [s[5] for s in self.stages.values()])
+        elif resource is not None:
+            self.max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+        _local.profile = None
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        return False
+
+    def _current_peaks(self):
+        """ peak traced memory and peak rss since they have been reset """
+        traced = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+        return traced, _peak_rss() if self.rss else 0
+
+    def _enter(self):
+        """ start a stage """
+        if self._peaks:
+            # peaks of the enclosing stage so far
+            self._peaks[-1] = [max(p) for p in zip(self._peaks[-1], self._current_peaks())]
+        if tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        if self.rss:
+            _reset_peak_rss()
+        self._peaks.append((0, 0))
+
+    def _exit(self, name, wall, cpu, child_cpu):
+        """ account a stage that is over """
+        peaks = [max(p) for p in zip(self._peaks.pop(), self._current_peaks())]
+        if self._peaks:
+            self._peaks[-1] = [max(p) for p in zip(self._peaks[-1], peaks)]
+        counts = self.stages.setdefault(name, [0, 0., 0., 0., 0, 0])
+        counts[0] += 1
+        counts[1] += wall
+        counts[2] += cpu
+        counts[3] += child_cpu
+        counts[4] = max(counts[4], peaks[0])
+        counts[5] = max(counts[5], peaks[1])
+
+    def as_dict(self):
+        """
+        JSON serializable profile: total wall, CPU and subprocesses CPU times
+        in seconds, max resident set sizes of the process and of its
+        subprocesses in bytes (None if unknown), and amount of calls, wall,
+        CPU and subprocesses CPU times, peak traced memory and peak resident
+        set size (None if not measured) of each stage that has been run, in
+        processing order. 'other' is the wall time spent outside of the
+        stages, and 'counters' the values counted during processing.
+        """
+        names = [s for s in STAGES if s in self.stages] + \
+            sorted(s for s in self.stages if s not in STAGES)
+        stages = {}
+        for name in names:
+            calls, wall, cpu, child_cpu, peak, peak_rss = self.stages[name]
+            stages[name] = {'calls': calls, 'wall': round(wall, 6), 'cpu': round(cpu, 6),
+                            'child_cpu': round(child_cpu, 6),
+                            'peak_memory': peak if self.memory else None,
+                            'peak_rss': peak_rss if self.rss else None}
+        return {'wall': round(self.wall, 6), 'cpu': round(self.cpu, 6),
+                'child_cpu': round(self.child_cpu, 6), 'max_rss': self.max_rss,
+                'child_max_rss': self.child_max_rss,
+                'other': round(self.wall - sum(s['wall'] for s in stages.values()), 6),
+                'stages': stages, 'counters': dict(self.counters)}
+
+def format_profile(profile):
+    """ text table of a profile, as returned by Profile.as_dict """
+    def mb(nbytes):
+        return '%.1f' % (nbytes / 2.**20) if nbytes is not None else '-'
+    lines = ['%-13s %6s %10s %10s %13s %14s %14s' % (
+        'stage', 'calls', 'wall (s)', 'cpu (s)', 'child cpu (s)', 'peak mem (MB)',
+        'peak RSS (MB)')]
+    for name, s in profile['stages'].items():
+        lines.append('%-13s %6d %10.3f %10.3f %13.3f %14s %14s' % (
+            name, s['calls'], s['wall'], s['cpu'], s['child_cpu'], mb(s['peak_memory']),
+            mb(s.get('peak_rss'))))
+    lines.append('%-13s %6s %10.3f' % ('other', '', profile['other']))
+    lines.append('%-13s %6s %10.3f %10.3f %13.3f' % ('total', '', profile['wall'], profile['cpu'],
+                                                    profile['child_cpu']))
+    lines.append('max RSS: %s MB, subprocesses max RSS: %s MB' % (
+        mb(profile['max_rss']), mb(profile['child_max_rss'])))
+    counters = profile.get('counters', {})
+    if counters.get('frames'):
+        lines.append('frames gated out: %d of %d (%.1f%%)' % (
+            counters.get('gated_frames', 0), counters['frames'],
+            100. * counters.get('gated_frames', 0) / counters['frames']))
+    return '\n'.join(lines)
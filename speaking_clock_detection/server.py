@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Speaking clock detection server: detection jobs are received over HTTP, on
+a localhost TCP port or a Unix domain socket, and processed by a pool of
+worker processes started once for all, with NumPy and SciPy already
+imported.
+
+Requests:
+* POST /detect with a JSON object holding the 'media' path to analyze, and
+  optionally detection options overriding the server ones (see
+  REQUEST_OPTIONS). The response is the detect_job JSON object, whose
+  'index' field is the value returned by speaking_clock_detection.
+* GET /health returns the server status.
+"""
+
+import os
+import json
+import socket
+import threading
+import http.client
+from concurrent.futures import ProcessPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+from .decode import parse_tracks
+from .batch import detect_job
+
+# detection options that may be set by each request
+REQUEST_OPTIONS = ('tracks', 'decode', 'decoder', 'precision', 'features', 'pattern',
+                   'early_exit', 'confidence', 'windows', 'window_dur', 'profile', 'refresh')
+
+def _warm_up():
+    """ run in each worker process once started """
+    return os.getpid()
+
+class DetectionService:
+    """
+    Pool of 'jobs' worker processes (default: number of CPUs), accepting at
+    most 'queue_depth' detection jobs waiting for a free worker.
+    options: default cached_detect keyword arguments
+    """
+    def __init__(self, jobs=None, queue_depth=16, options=None):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.queue_depth = queue_depth
+        self.options = dict(options or {})
+        self.executor = ProcessPoolExecutor(self.jobs)
+        self.slots = threading.BoundedSemaphore(self.jobs + queue_depth)
+        self.lock = threading.Lock()
+        self.pending = 0
+        # start worker processes before the first request
+        pids = [self.executor.submit(_warm_up) for _ in range(self.jobs)]
+        for pid in pids:
+            pid.result()
+
+    def submit(self, media, options=None):
+        """
+        Submit a detection job, overriding default options with 'options'.
+        Returns a future of the detect_job result, or None if the queue is
+        full.
+        """
+        if not self.slots.acquire(blocking=False):
+            return None
+        with self.lock:
+            self.pending += 1
+        job_options = dict(self.options)
+        job_options.update(options or {})
+        future = self.executor.submit(detect_job, media, job_options)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self.lock:
+            self.pending -= 1
+        self.slots.release()
+
+    def status(self):
+        """ JSON serializable status of the service """
+        with self.lock:
+            pending = self.pending
+        return {'status': 'ok', 'jobs': self.jobs, 'queue_depth': self.queue_depth,
+                'pending': pending}
+
+    def shutdown(self):
+        """ wait for submitted jobs, and stop worker processes """
+        self.executor.shutdown(wait=True)
+
+
+class DetectionRequestHandler(BaseHTTPRequestHandler):
+    """ HTTP interface of the DetectionService of the server """
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._reply(404, {'error': 'unknown path %s' % self.path})
+        self._reply(200, self.server.service.status())
+
+    def do_POST(self):
+        if self.path != '/detect':
+            return self._reply(404, {'error': 'unknown path %s' % self.path})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            media = request.pop('media')
+            unknown = set(request) - set(REQUEST_OPTIONS)
+            if unknown:
+                raise ValueError('unknown options %s' % ', '.join(sorted(unknown)))
+            if isinstance(request.get('tracks'), str):
+                request['tracks'] = parse_tracks(request['tracks'])
+        except (ValueError, KeyError, TypeError, AttributeError) as err:
+            return self._reply(400, {'error': 'bad request: %s: %s' % (type(err).__name__, err)})
+
+        future = self.server.service.submit(media, request)
+        if future is None:
+            return self._reply(503, {'error': 'queue is full'})
+        self._reply(200, future.result())
+
+    def _reply(self, code, obj):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix domain socket clients have no address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+
+class DetectionHTTPServer(ThreadingMixIn, HTTPServer):
+    """ detection server listening on a TCP (host, port) address """
+    def __init__(self, address, service):
+        self.service = service
+        HTTPServer.__init__(self, address, DetectionRequestHandler)
+
+
+class UnixDetectionHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """ detection server listening on a Unix domain socket """
+    def __init__(self, path, service):
+        self.service = service
+        UnixStreamServer.__init__(self, path, DetectionRequestHandler)
+
+    def server_close(self):
+        UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def serve(server):
+    """
+    Serve requests until shutdown() is called, for instance by a signal
+    handler. Then wait for the requests being processed, and stop the
+    worker processes.
+    """
+    try:
+        server.serve_forever()
+    finally:
+        # joins the threads handling requests
+        server.server_close()
+        server.service.shutdown()
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """ HTTP connection over a Unix domain socket """
+    def __init__(self, path, timeout=None):
+        http.client.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def remote_detect(media, address, timeout=None, **options):
+    """
+    Ask a detection server listening on 'address' to analyze a media.
+    address: (host, port) tuple, or path to a Unix domain socket
+    options: detection options, see REQUEST_OPTIONS
+    Returns the HTTP status code and the JSON response of the server
+    """
+    if isinstance(address, tuple):
+        conn = http.client.HTTPConnection(address[0], address[1], timeout=timeout)
+    else:
+        conn = UnixHTTPConnection(address, timeout)
+    try:
+        request = dict(options, media=media)
+        conn.request('POST', '/detect', json.dumps(request),
+                     {'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read().decode('utf-8'))
+    finally:
+        conn.close()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Evaluation of a grid of detection thresholds over a labeled corpus, based
+on stored frame features (see features).
+
+Features of each media are loaded once, and reduced to the bip candidates
+found with each ratio threshold of the grid. The other thresholds are then
+evaluated all at once with NumPy broadcasting: candidate durations and
+energies are compared to every duration bounds and energy threshold, the
+time intervals between the kept candidates are computed for every
+combination, and pattern tolerances are applied to the resulting counts.
+Decisions are the same as those of MediaFeatures.detect.
+"""
+
+import itertools
+import numpy as np
+
+from .decode import track_labels
+from .dsp import WIN_SEC, STEP_SEC, RATIO_THR, MIN_DUR, MAX_DUR, ENERGY_THR
+from .patterns import TOLERANCE, SHORT_TOLERANCE, SHORT_DUR, VALID_FACTOR
+from .features import REGIONS_RATIO, FeatureStore
+
+# confusion counts reported for each set of thresholds
+OUTCOMES = ('correct', 'missed', 'false_alarm', 'wrong_track', 'multiple')
+
+def load_labels(path):
+    """
+    Read a labeled corpus: one media per line, followed by the label of its
+    speaking clock track as printed by speaking_clock_detection (such as 1
+    or 2:0), or NONE if it has no speaking clock.
+    Returns a list of (media, label) tuples, label being None for NONE
+    """
+    ret = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            media, label = line.rsplit(None, 1)
+            ret.append((media, None if label.upper() == 'NONE' else label))
+    return ret
+
+
+class SweepMedia:
+    """
+    Features of a labeled media reduced to what the sweep needs: for each
+    ratio threshold, the start (in seconds), duration (in frames) and mean
+    energy of the candidates of each channel.
+    expected: index of the speaking clock track, -1 if there is none
+    """
+    def __init__(self, media_features, label, ratio_thrs):
+        if media_features.features != 'fft' and min(ratio_thrs) < REGIONS_RATIO:
+            raise ValueError('ratio thresholds below %.1f require fft features' % REGIONS_RATIO)
+        labels = track_labels(media_features.tracks)
+        if label is not None and label not in labels:
+            raise ValueError('track %s not found in %s' % (label, ', '.join(labels)))
+        self.expected = labels.index(label) if label is not None else -1
+        self.duration = media_features.duration
+        self.candidates = []
+        for ratio_thr in ratio_thrs:
+            channels = []
+            for c in media_features.channels:
+                idx, dur, energy = c.candidates(ratio_thr)
+                channels.append((idx * STEP_SEC, dur, energy))
+            self.candidates.append(channels)
+
+
+def load_corpus(labels, features_dir, ratio_thrs=(RATIO_THR,), **options):
+    """
+    Yield a SweepMedia for each (media, label) tuple, based on the features
+    stored in the FeatureStore at 'features_dir', which are extracted and
+    stored first if needed.
+    options: extract_features keyword arguments
+    """
+    store = FeatureStore(features_dir)
+    for media, label in labels:
+        yield SweepMedia(store.get(media, **options), label, ratio_thrs)
+
+def channel_counts(starts, dur, energy, min_durs, max_durs, energy_thrs):
+    """
+    Amount of bips, and amount of valid time intervals between consecutive
+    bips (1, 10 or 17 seconds), detected in a channel for each combination
+    of candidate duration bounds and energy threshold.
+    Returns two (min_durs, max_durs, energy_thrs) arrays
+    """
+    shape = (len(min_durs), len(max_durs), len(energy_thrs))
+    if len(starts) == 0:
+        return np.zeros(shape, dtype=np.int64), np.zeros(shape, dtype=np.int64)
+    dur_sec = (dur - 1) * STEP_SEC + WIN_SEC
+    # (min_dur, max_dur, candidate)
+    valid = (dur_sec > min_durs[:, None, None]) & (dur_sec < max_durs[None, :, None])
+    # energy filter: relative to the max energy of the valid candidates
+    max_energy = np.max(np.where(valid, energy, -np.inf), axis=-1)
+    with np.errstate(invalid='ignore'):
+        thr = energy_thrs[:, None] * max_energy[:, :, None, None]
+        # (min_dur, max_dur, energy_thr, candidate)
+        kept = valid[:, :, None, :] & (energy > thr)
+
+    # previous kept candidate of each candidate, -1 if none
+    positions = np.where(kept, np.arange(len(starts)), -1)
+    last = np.maximum.accumulate(positions, axis=-1)
+    prev = np.concatenate((np.full(shape + (1,), -1), last[..., :-1]), axis=-1)
+    dbip = np.int32(np.round(starts - starts[np.maximum(prev, 0)]))
+    interval = kept & (prev >= 0)
+    nvalid = np.sum(interval & ((dbip == 1) | (dbip == 10) | (dbip == 17)), axis=-1)
+    return np.sum(kept, axis=-1), nvalid
+
+def pattern_matches(nbips, nvalid, dur, tolerances, short_tolerances):
+    """
+    is_interval_pattern decisions given the amounts of bips and of valid
+    intervals of a channel, for each set of pattern tolerances.
+    Returns an array of shape nbips.shape + (tolerances, short_tolerances)
+    """
+    ndbip = np.maximum(nbips - 1, 0)
+    nother = ndbip - nvalid
+    est_bips = dur / 60. * 8
+    ret = (nbips > 0) & (nvalid > VALID_FACTOR * nother)
+    ndbip = ndbip[..., None]
+    if dur < SHORT_DUR:
+        lo, hi = short_tolerances[:, 0], short_tolerances[:, 1]
+        ret = ret[..., None] & (ndbip >= est_bips * lo) & (ndbip <= est_bips * hi)
+        return np.broadcast_to(ret[..., None, :], ret.shape[:-1] + (len(tolerances), len(lo)))
+    lo, hi = tolerances[:, 0], tolerances[:, 1]
+    ret = ret[..., None] & (ndbip > est_bips * lo) & (ndbip < est_bips * hi)
+    return np.broadcast_to(ret[..., None], ret.shape + (len(short_tolerances),))
+
+def threshold_sweep(corpus, ratio_thrs=(RATIO_THR,), min_durs=(MIN_DUR,), max_durs=(MAX_DUR,),
+                    energy_thrs=(ENERGY_THR,), tolerances=(TOLERANCE,),
+                    short_tolerances=(SHORT_TOLERANCE,)):
+    """
+    Evaluate every combination of thresholds (see MediaFeatures.detect)
+    over a corpus of SweepMedia, which may be any iterable, such as the
+    generator returned by load_corpus.
+    Returns a list of dicts, one per combination, with the thresholds, the
+    accuracy, and the amount of media with each outcome (see OUTCOMES):
+    speaking clock track or absence correctly found, speaking clock missed,
+    found in a media without speaking clock, found in a wrong track, or
+    found in several tracks.
+    """
+    min_durs, max_durs, energy_thrs = [np.asarray(a, dtype=np.float64)
+                                       for a in (min_durs, max_durs, energy_thrs)]
+    tolerances = np.asarray(tolerances, dtype=np.float64).reshape(-1, 2)
+    short_tolerances = np.asarray(short_tolerances, dtype=np.float64).reshape(-1, 2)
+    shape = (len(ratio_thrs), len(min_durs), len(max_durs), len(energy_thrs), len(tolerances),
+             len(short_tolerances))
+    counts = {name: np.zeros(shape, dtype=np.int64) for name in OUTCOMES}
+
+    nmedia = 0
+    for media in corpus:
+        nmedia += 1
+        nmatches = np.zeros(shape, dtype=np.int64)
+        first = np.full(shape, -1)
+        for i, channels in enumerate(media.candidates):
+            for track, (starts, dur, energy) in enumerate(channels):
+                nbips, nvalid = channel_counts(starts, dur, energy, min_durs, max_durs,
+                                               energy_thrs)
+                matches = pattern_matches(nbips, nvalid, media.duration, tolerances,
+                                          short_tolerances)
+                nmatches[i] += matches
+                first[i][(first[i] < 0) & matches] = track
+        # channel_verdict of each combination
+        verdict = np.where(nmatches == 0, -1, np.where(nmatches == 1, first, -2))
+        if media.expected >= 0:
+            counts['correct'] += verdict == media.expected
+            counts['missed'] += verdict == -1
+            counts['wrong_track'] += (verdict >= 0) & (verdict != media.expected)
+        else:
+            counts['correct'] += verdict == -1
+            counts['false_alarm'] += verdict >= 0
+        counts['multiple'] += verdict == -2
+
+    ret = []
+    for index in itertools.product(*[range(n) for n in shape]):
+        ret.append(dict(
+            ratio_thr=float(ratio_thrs[index[0]]), min_dur=float(min_durs[index[1]]),
+            max_dur=float(max_durs[index[2]]), energy_thr=float(energy_thrs[index[3]]),
+            tolerance=tuple(tolerances[index[4]].tolist()),
+            short_tolerance=tuple(short_tolerances[index[5]].tolist()),
+            accuracy=float(counts['correct'][index]) / max(nmedia, 1),
+            **{name: int(counts[name][index]) for name in OUTCOMES}))
+    return ret
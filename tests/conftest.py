@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#
+""" Synthetic signals shared by the tests """
+
+import numpy as np
+import soundfile
+import pytest
+
+from speaking_clock_detection.patterns import CLOCK_SECONDS
+
+def clock_signal(dur, samplerate=4000, offset=0., bip_dur=0.1, seed=0):
+    """
+    'dur' seconds of a speaking clock: 1kHz bips at CLOCK_SECONDS of each
+    minute, the first minute starting 'offset' seconds after the start of
+    the signal, over a low level white noise
+    """
+    rng = np.random.RandomState(seed)
+    ret = 0.01 * rng.randn(int(dur * samplerate))
+    t = np.arange(int(bip_dur * samplerate)) / float(samplerate)
+    bip = 0.5 * np.sin(2 * np.pi * 1000 * t)
+    for minute in range(-1, int(dur // 60) + 1):
+        for sec in CLOCK_SECONDS:
+            start = int(round((offset + minute * 60 + sec) * samplerate))
+            if 0 <= start and start + len(bip) <= len(ret):
+                ret[start:(start + len(bip))] += bip
+    return ret
+
+def noise_signal(dur, samplerate=4000, seed=1):
+    """ 'dur' seconds of white noise """
+    return 0.1 * np.random.RandomState(seed).randn(int(dur * samplerate))
+
+@pytest.fixture
+def clock_media(tmp_path):
+    """
+    Write 4kHz stereo WAV files, and return their (path, label) tuples:
+    speaking clock on the second channel, on the first channel, in a signal
+    shorter than a minute, or NONE
+    """
+    ret = []
+    for i, (channels, label) in enumerate([
+            ((noise_signal(130), clock_signal(130, offset=3.)), '1'),
+            ((clock_signal(90, offset=25.), noise_signal(90, seed=2)), '0'),
+            ((noise_signal(45, seed=3), clock_signal(45, offset=12.)), '1'),
+            ((noise_signal(70, seed=4), noise_signal(70, seed=5)), None)]):
+        path = str(tmp_path / ('media%d.wav' % i))
+        soundfile.write(path, np.stack(channels, axis=1), 4000, subtype='PCM_16')
+        ret.append((path, label))
+    return ret
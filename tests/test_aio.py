@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+#
+""" asyncio detection, compared to the synchronous one """
+
+import shutil
+import asyncio
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from speaking_clock_detection import aio
+from speaking_clock_detection.decode import decode_media
+
+pytestmark = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not found')
+
+async def detect_all(paths, **options):
+    return await asyncio.gather(*[aio.detect(path, **options) for path in paths])
+
+def test_detect(clock_media):
+    paths = [path for path, _ in clock_media]
+    results = asyncio.run(detect_all(paths))
+    assert [result.as_dict()['speaking_clock'] for result in results] == \
+        [label for _, label in clock_media]
+    # detections waiting for a shared semaphore, and bips detected by threads
+    async def main():
+        semaphore = asyncio.Semaphore(1)
+        with ThreadPoolExecutor(2) as executor:
+            return await detect_all(paths, semaphore=semaphore, executor=executor,
+                                    precision='float32')
+    assert [result.matches for result in asyncio.run(main())] == \
+        [result.matches for result in results]
+
+@pytest.mark.parametrize('tracks', [None, [(0, 1)]])
+def test_decode_media(clock_media, tracks):
+    media = clock_media[1][0]
+    ret = asyncio.run(aio.decode_media(media, tracks=tracks, start=10., duration=30.))
+    np.testing.assert_array_equal(ret, decode_media(media, tracks=tracks, start=10.,
+                                                    duration=30.))
+
+def test_detect_errors(clock_media, tmp_path):
+    with pytest.raises(AssertionError):
+        asyncio.run(aio.detect(str(tmp_path / 'missing.wav')))
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(aio.detect(clock_media[0][0], ffprobe=str(tmp_path / 'ffprobe')))
+    with pytest.raises(ValueError):
+        asyncio.run(aio.detect(clock_media[0][0], tracks=[(1, None)]))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#
+""" Batch detection with a pool of processes """
+
+import os
+import multiprocessing
+import pytest
+
+from speaking_clock_detection import batch
+from speaking_clock_detection.batch import iter_media_paths, batch_detection
+from speaking_clock_detection.cache import cached_detect
+
+def test_iter_media_paths(clock_media, tmp_path):
+    paths = [path for path, _ in clock_media]
+    file_list = tmp_path / 'list.txt'
+    file_list.write_text('\n'.join(paths[:2]) + '\n\n')
+    assert list(iter_media_paths([str(tmp_path)])) == sorted(paths + [str(file_list)])
+    assert list(iter_media_paths(paths[3:], str(file_list))) == paths[3:] + paths[:2]
+
+@pytest.mark.parametrize('jobs, max_pending', [(1, None), (2, 1), (2, 3)])
+def test_batch_detection(clock_media, tmp_path, jobs, max_pending):
+    paths = [path for path, _ in clock_media] + [str(tmp_path / 'missing.wav')]
+    results = list(batch_detection(iter(paths), jobs, max_pending, decoder='soundfile',
+                                   cache=str(tmp_path / 'cache.db')))
+    assert sorted(ret['media'] for ret in results) == sorted(paths)
+    results = dict((ret['media'], ret) for ret in results)
+    for path, label in clock_media:
+        assert results[path]['error'] is None
+        assert results[path]['speaking_clock'] == label
+    assert results[paths[-1]]['verdict'] is None
+    assert results[paths[-1]]['error']
+
+def crashing_detect(media, **options):
+    """ cached_detect, killing the worker process on media named crash """
+    if os.path.basename(media).startswith('crash'):
+        os._exit(1)
+    return cached_detect(media, **options)
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='workers do not inherit the patched detection')
+def test_batch_broken_pool(clock_media, monkeypatch):
+    monkeypatch.setattr(batch, 'cached_detect', crashing_detect)
+    paths = [clock_media[0][0], 'crash.wav', clock_media[1][0], clock_media[2][0]]
+    results = list(batch_detection(paths, 1, 1, decoder='soundfile'))
+    # the pool is restarted after the crash, and the next media are processed
+    assert [ret['media'] for ret in results] == paths
+    assert results[1]['error'].startswith('BrokenProcessPool')
+    assert [ret['speaking_clock'] for ret in results] == ['1', None, '0', '1']
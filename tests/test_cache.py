@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+""" Result cache keys, invalidated by any change of the detector """
+
+import pytest
+
+from speaking_clock_detection import cache, dsp, patterns, features
+from speaking_clock_detection.cache import (ResultCache, default_arguments, detector_key,
+                                            cached_detect)
+
+# thresholds of the detection functions, by argument name
+THRESHOLDS = {'ratio_thr': (dsp, 'RATIO_THR'), 'min_dur': (dsp, 'MIN_DUR'),
+              'max_dur': (dsp, 'MAX_DUR'), 'energy_thr': (dsp, 'ENERGY_THR'),
+              'tolerance': (patterns, 'TOLERANCE'),
+              'short_tolerance': (patterns, 'SHORT_TOLERANCE'),
+              'p_clock': (patterns, 'P_CLOCK'), 'p_other': (patterns, 'P_OTHER'),
+              'max_gap': (patterns, 'MAX_GAP')}
+
+def test_detector_key_options():
+    key = detector_key({})
+    assert detector_key({'features': 'fft', 'decode': 'pipe'}) == key
+    assert detector_key({'tmpdir': '/tmp', 'ffprobe': 'ffprobe', 'profile': True}) == key
+    assert detector_key({'features': 'dft'}) != key
+    assert detector_key({'pattern': 'folding'}) != key
+
+@pytest.mark.parametrize('module, name, value', [
+    (cache, 'DETECTOR_VERSION', cache.DETECTOR_VERSION + 1),
+    (dsp, 'PREEMP_FACT', 0.95),
+    (dsp, 'RATIO_THR', 0.4),
+    (dsp, 'MAX_DUR', 0.2),
+    (dsp, 'ENERGY_THR', 0.3),
+    (patterns, 'TOLERANCE', (0.7, 1.3)),
+    (patterns, 'SHORT_DUR', 30.),
+    (patterns, 'VALID_FACTOR', 3),
+    (patterns, 'P_CLOCK', 0.8),
+    (dsp, 'GATE_RATIO', 0.1),
+    (dsp, 'BASEBAND_RATIO', 0.7),
+    (patterns, 'FOLDING_THRESHOLD', 7.),
+    (patterns, 'CLOCK_SECONDS', (0, 10, 20, 30, 40, 50, 57, 58, 59))])
+def test_detector_key_constants(monkeypatch, module, name, value):
+    key = detector_key({})
+    monkeypatch.setattr(module, name, value)
+    assert detector_key({}) != key
+
+@pytest.mark.parametrize('func', [
+    dsp.energies2bip, dsp.valid_bip_durations, patterns.is_bip_pattern,
+    patterns.bip_sequential_llr, patterns.is_interval_pattern, patterns.interval_stats,
+    patterns.bip_pattern_stats, features.ChannelFeatures.candidates,
+    features.ChannelFeatures.bips, features.MediaFeatures.detect])
+def test_thresholds_are_constants(func):
+    # editing a threshold constant changes both the detector and its key
+    defaults = default_arguments(func)
+    assert set(defaults) & set(THRESHOLDS)
+    for name in set(defaults) & set(THRESHOLDS):
+        module, constant = THRESHOLDS[name]
+        assert defaults[name] is getattr(module, constant)
+    assert default_arguments(dsp.CandidateEnergyFilter)['ratio'] is dsp.ENERGY_THR
+
+def test_cached_detect_threshold(monkeypatch, clock_media, tmp_path):
+    # streaming detection reads the candidate ratio threshold when it runs
+    results = ResultCache(str(tmp_path / 'cache.db'))
+    media = clock_media[0][0]
+    assert cached_detect(media, results, decoder='soundfile', decode='stream').matches == \
+        [False, True]
+    monkeypatch.setattr(dsp, 'RATIO_THR', 0.99)
+    result = cached_detect(media, results, decoder='soundfile', decode='stream')
+    assert result.matches == [False, False]
+    assert len(results) == 2
+
+def test_cached_detect(monkeypatch, clock_media, tmp_path):
+    results = ResultCache(str(tmp_path / 'cache.db'))
+    media = clock_media[0][0]
+    result = cached_detect(media, results, decoder='soundfile')
+    assert result.matches == [False, True]
+    assert len(results) == 1
+    assert cached_detect(media, results, decoder='soundfile').matches == result.matches
+    assert len(results) == 1
+    monkeypatch.setattr(cache, 'DETECTOR_VERSION', cache.DETECTOR_VERSION + 1)
+    assert cached_detect(media, results, decoder='soundfile').matches == result.matches
+    assert len(results) == 2
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+""" Audio track selection, and in-process decoders compared to ffmpeg """
+
+import shutil
+import subprocess
+import numpy as np
+import soundfile
+import pytest
+
+from speaking_clock_detection.decode import (decode_media, parse_tracks, select_tracks,
+                                             track_labels, map_args)
+from speaking_clock_detection.dsp import wavdata2bip
+
+from conftest import clock_signal, noise_signal
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not found')
+
+@requires_ffmpeg
+@pytest.mark.parametrize('samplerate', [4000, 8000, 16000, 44100, 48000])
+def test_soundfile_decoder(samplerate, tmp_path):
+    path = str(tmp_path / 'media.wav')
+    signal = np.stack((clock_signal(70, samplerate, offset=7.), noise_signal(70, samplerate)),
+                      axis=1)
+    soundfile.write(path, signal, samplerate, subtype='PCM_16')
+    ref = decode_media(path, decoder='ffmpeg')
+    ret = decode_media(path, decoder='soundfile')
+    assert ret.shape == ref.shape == (70 * 4000, 2)
+    if samplerate == 4000:
+        np.testing.assert_array_equal(ret, ref)
+    else:
+        # resample_poly and ffmpeg resampling filters differ slightly
+        assert np.max(np.abs(ret - ref)) < 0.05
+    for channel in range(2):
+        np.testing.assert_array_equal(wavdata2bip(ret[:, channel]),
+                                      wavdata2bip(ref[:, channel]))
+
+def test_select_tracks():
+    assert select_tracks([2, 1]) == [(0, 0), (0, 1), (1, 0)]
+    assert select_tracks([2, 1], parse_tracks('1,0:1')) == [(0, 1), (1, 0)]
+    assert select_tracks([2], [(0, 1), (0, None)]) == [(0, 0), (0, 1)]
+    for tracks in ([(1, None)], [(0, 2)], [(-1, 0)]):
+        with pytest.raises(ValueError):
+            select_tracks([2], tracks)
+
+def test_track_labels():
+    assert track_labels([(0, 0), (0, 1)]) == ['0', '1']
+    assert track_labels([(1, 0)]) == ['1:0']
+    assert track_labels([(0, 1), (1, 0)]) == ['0:1', '1:0']
+
+def test_map_args():
+    # a whole stream is mapped without filters
+    assert map_args([(0, 0), (0, 1)], [2], 4000) == ['-map', '0:a:0', '-ar', '4000']
+    assert map_args([(1, 0)], [2, 1], 8000) == ['-map', '0:a:1', '-ar', '8000']
+    # some channels of a stream are selected by pan
+    assert map_args([(0, 1)], [2], 4000) == [
+        '-filter_complex', '[0:a:0]pan=1c|c0=c1,aresample=4000,aformat=channel_layouts=1c[a0]',
+        '-map', '[a0]']
+    # several streams are merged by amerge
+    assert map_args([(0, 1), (1, 0), (1, 1)], [2, 2], 4000) == [
+        '-filter_complex',
+        '[0:a:0]pan=1c|c0=c1,aresample=4000,aformat=channel_layouts=1c[a0];'
+        '[0:a:1]aresample=4000,aformat=channel_layouts=2c[a1];[a0][a1]amerge=inputs=2[a]',
+        '-map', '[a]']
+
+@requires_ffmpeg
+@pytest.mark.parametrize('tracks', [None, [(0, 1)], [(1, 0)], [(0, 1), (1, None)]])
+def test_decode_tracks(tracks, tmp_path):
+    # media with a stereo and a mono audio stream
+    channels = [clock_signal(20, offset=7.), noise_signal(20), noise_signal(20, seed=2)]
+    paths = [str(tmp_path / 'stereo.wav'), str(tmp_path / 'mono.wav')]
+    soundfile.write(paths[0], np.stack(channels[:2], axis=1), 4000, subtype='PCM_16')
+    soundfile.write(paths[1], channels[2], 4000, subtype='PCM_16')
+    media = str(tmp_path / 'media.mkv')
+    subprocess.check_call(['ffmpeg', '-nostdin', '-v', 'error', '-i', paths[0], '-i', paths[1],
+                           '-map', '0', '-map', '1', '-c:a', 'pcm_s16le', media])
+    ref = np.stack([soundfile.read(paths[s], always_2d=True)[0][:, c]
+                    for s, c in select_tracks([2, 1], tracks)], axis=1)
+    np.testing.assert_array_equal(decode_media(media, tracks=tracks), ref)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+""" detect arguments checks, features of the pattern tests, and confidence of results """
+
+import numpy as np
+import pytest
+
+from speaking_clock_detection.detection import detect
+from speaking_clock_detection.features import extract_features
+from speaking_clock_detection.patterns import interval_stats, is_interval_pattern
+
+from conftest import clock_signal, noise_signal
+
+@pytest.mark.parametrize('features', ['dft', 'gated'])
+def test_folding_rejects_bounded_features(features):
+    signal = np.stack((noise_signal(70), clock_signal(70)), axis=1)
+    with pytest.raises(ValueError):
+        detect(signal, 4000, features=features, pattern='folding')
+    media_features = extract_features(signal, 4000, features=features)
+    assert media_features.detect().matches == [False, True]
+    with pytest.raises(ValueError):
+        media_features.detect(pattern='folding')
+
+@pytest.mark.parametrize('features', ['fft', 'baseband'])
+def test_folding_features(features):
+    signal = np.stack((noise_signal(70), clock_signal(70)), axis=1)
+    assert detect(signal, 4000, features=features, pattern='folding').matches == [False, True]
+
+def test_unknown_decode_method():
+    signal = clock_signal(70)
+    with pytest.raises(ValueError):
+        detect(signal, 4000, decode='pipes')
+    with pytest.raises(ValueError):
+        extract_features(signal, 4000, decode='stream')
+    assert detect(signal, 4000, decode='stream').matches == [True]
+
+@pytest.mark.parametrize('options', [{}, {'pattern': 'folding'}, {'windows': 3, 'window_dur': 20.},
+                                     {'early_exit': True}])
+def test_confidence_stats(clock_media, options):
+    for media, label in clock_media:
+        result = detect(media, decoder='soundfile', **options)
+        summary = result.as_dict()
+        assert summary['speaking_clock'] == label
+        assert summary['confidence'] == result.confidence == \
+            min(track['confidence'] for track in summary['tracks'])
+        for track in summary['tracks']:
+            # the score is positive for a speaking clock, and its margin is the confidence
+            assert track['match'] == (track['track'] == label)
+            assert track['score'] > 0 if track['match'] else track['score'] <= 0
+            assert track['confidence'] == abs(track['score'])
+            assert 0 <= track['confidence'] <= 1
+
+def test_interval_stats(clock_media):
+    media, label = clock_media[0]
+    stats = detect(media, decoder='soundfile').stats
+    clock = stats[int(label)]
+    assert clock['invalid_intervals'] == 0
+    assert clock['intervals_1'] + clock['intervals_10'] + clock['intervals_17'] == \
+        clock['bips'] - 1
+    assert clock['expected_bips'] == round(130 / 60. * 8, 3)
+    assert stats[1 - int(label)]['bips'] == 0
+    assert stats[1 - int(label)]['score'] == -1.
+    # decisions and scores of random intervals agree, scores being null at
+    # the included bounds of short signals
+    rng = np.random.RandomState(0)
+    for _ in range(1000):
+        dur = rng.choice([30., 45., 60., 120., 300.])
+        dbip = rng.choice([1, 10, 17, 3, 5], size=rng.randint(0, int(dur / 60 * 13) + 2),
+                          p=[.3, .3, .2, .1, .1] if rng.rand() < .5 else [.4, .4, .2, 0, 0])
+        score = interval_stats(dbip, dur, len(dbip) + 1)['score']
+        assert score >= 0 if is_interval_pattern(dbip, dur) else score <= 0
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+""" Frame energies, compared to those of the whole signal spectrogram """
+
+import numpy as np
+import pytest
+
+from speaking_clock_detection.dsp import (FEATURES, PREEMP_FACT, STEP_SEC, MIN_DUR, preemp,
+                                          my_specgram, frame_energies, blockwise_frame_energies,
+                                          gated_frame_energies, wavdata2bip)
+from speaking_clock_detection.profiling import Profile
+from speaking_clock_detection.patterns import is_bip_pattern
+
+from conftest import clock_signal, noise_signal
+
+def spectrogram_energies(data):
+    """ frame energies of the spectrogram of the whole signal """
+    return frame_energies(my_specgram(data, 128, 32, 128), 128)
+
+@pytest.mark.parametrize('batch', [1, 7, 1000, 2 ** 12, 10 ** 6])
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_blockwise_frame_energies(batch, dtype):
+    data = np.stack((clock_signal(20, offset=5.), noise_signal(20))).astype(dtype)
+    energies = blockwise_frame_energies(data, batch=batch)
+    rtol = 1e-4 if dtype == np.float32 else 1e-10
+    for channel in range(2):
+        for ret, ref in zip([e[channel] for e in energies], spectrogram_energies(data[channel])):
+            assert ret.dtype == dtype
+            np.testing.assert_allclose(ret, ref, rtol=rtol, atol=rtol * np.max(ref))
+
+@pytest.mark.parametrize('nsamples', [128, 129, 160, 161])
+def test_blockwise_frame_energies_short(nsamples):
+    data = clock_signal(1)[0:nsamples]
+    for ret, ref in zip(blockwise_frame_energies(data, batch=1), spectrogram_energies(data)):
+        np.testing.assert_allclose(ret, ref, rtol=1e-10)
+
+def test_blockwise_frame_energies_no_frame():
+    data = clock_signal(1)[0:127]
+    with pytest.raises(ValueError):
+        spectrogram_energies(data)
+    with pytest.raises(ValueError):
+        blockwise_frame_energies(data)
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_dft_frame_energies(dtype):
+    data = np.stack((clock_signal(20, offset=5.), noise_signal(20),
+                     clock_signal(20, offset=9.) + noise_signal(20, seed=2))).astype(dtype)
+    ref_1000hz, ref_all = [np.stack(e) for e in zip(*map(spectrogram_energies, data))]
+    energy_1000hz, energy_all = blockwise_frame_energies(data, 'dft')
+    rtol = 1e-4 if dtype == np.float32 else 1e-10
+    # exact energies of bip candidates, lower bound of the total energy of other frames
+    candidates = ref_1000hz / ref_all > 0.5
+    assert np.any(candidates)
+    np.testing.assert_array_equal(energy_1000hz / energy_all > 0.5, candidates)
+    np.testing.assert_allclose(energy_1000hz, ref_1000hz, rtol=rtol, atol=rtol * np.max(ref_1000hz))
+    np.testing.assert_allclose(energy_all[candidates], ref_all[candidates], rtol=rtol)
+    assert np.all(energy_all <= ref_all * (1 + rtol))
+
+def pcm16(signal):
+    """ 16 bits PCM samples of a signal in [-1, 1] """
+    return np.round(np.clip(signal, -1, 1) * 32767).astype(np.int16)
+
+@pytest.mark.parametrize('features', FEATURES)
+@pytest.mark.parametrize('signal', ['clock', 'noisy_clock', 'noise'])
+def test_single_precision_bips(features, signal):
+    # int16 and float32 samples are processed in single precision
+    samples = {'clock': clock_signal(130, offset=3.),
+               'noisy_clock': clock_signal(130, offset=3.) + 0.8 * noise_signal(130),
+               'noise': noise_signal(130)}[signal]
+    pcm = pcm16(samples)
+    ref = wavdata2bip(pcm / 32768., features)
+    if signal != 'noise':
+        assert len(ref) > 0
+    for data in (pcm, (pcm / 32768.).astype(np.float32)):
+        bips = wavdata2bip(data, features)
+        assert len(bips) == len(ref)
+        np.testing.assert_allclose(bips, ref)
+
+@pytest.mark.parametrize('signal', ['clock', 'noisy_clock', 'noise'])
+def test_baseband_bips(signal):
+    # baseband envelopes find the bips of the spectrogram within a frame
+    # step, and more of the bips of a noisy clock, whose starts are shifted
+    # by noise
+    samples = {'clock': clock_signal(130, offset=3.),
+               'noisy_clock': clock_signal(130, offset=3.) + 0.8 * noise_signal(130),
+               'noise': noise_signal(130)}[signal]
+    ref = np.asarray(wavdata2bip(samples, 'fft'))
+    bips = np.asarray(wavdata2bip(samples, 'baseband'))
+    tolerance = MIN_DUR / 2 if signal == 'noisy_clock' else STEP_SEC
+    for bip in ref:
+        assert np.min(np.abs(bips - bip)) <= tolerance
+    if signal != 'noisy_clock':
+        assert len(bips) == len(ref)
+    assert bool(is_bip_pattern(bips, 130.)) == (signal != 'noise')
+
+def test_gated_fraction():
+    # frames gated out are reported without any active profile
+    signal = preemp(np.concatenate((clock_signal(60, offset=3.), np.zeros(4000 * 20),
+                                    noise_signal(20))), PREEMP_FACT)
+    energy_1000hz, energy_all, gated = gated_frame_energies(signal, 128, 32, 128,
+                                                            return_gated=True)
+    ref = gated_frame_energies(signal, 128, 32, 128)
+    np.testing.assert_array_equal(energy_1000hz, ref[0])
+    np.testing.assert_array_equal(energy_all, ref[1])
+    assert 0.9 < gated < 1.
+    assert gated == np.mean((energy_1000hz == 0) & (energy_all == 1))
+    with Profile(memory=False, rss=False) as profile:
+        gated_frame_energies(signal, 128, 32, 128)
+    assert profile.counters['gated_frames'] == round(gated * len(energy_all))
+    assert gated_frame_energies(np.zeros(4000), 128, 32, 128, return_gated=True)[2] == 1.
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+""" Rolling window detection and wav stream parsing of live inputs """
+
+import io
+import shutil
+import struct
+import numpy as np
+import pytest
+
+from speaking_clock_detection.dsp import wavdata2bip
+from speaking_clock_detection.live import RollingDetector, FFmpegLivePipe, live_events
+
+from conftest import clock_signal, noise_signal
+
+class BytesLivePipe(FFmpegLivePipe):
+    """ live pipe reading a wav stream from bytes instead of ffmpeg """
+    def __init__(self, data):
+        self.stdout = io.BytesIO(data)
+
+    def readinto(self, buf, pos=0):
+        return pos + self.stdout.readinto(memoryview(buf)[pos:])
+
+    def close(self, kill=False):
+        pass
+
+def wav_header(chunks):
+    """ RIFF header followed by (chunk id, data) chunks, padded to even sizes """
+    ret = b''.join(cid + struct.pack('<I', len(data)) + data + b'\0' * (len(data) % 2)
+                   for cid, data in chunks)
+    return b'RIFF' + struct.pack('<I', 4 + len(ret)) + b'WAVE' + ret
+
+def fmt_chunk(nchannels):
+    return (b'fmt ', struct.pack('<HHIIHH', 1, nchannels, 4000, 8000 * nchannels,
+                                 2 * nchannels, 16))
+
+def test_read_header():
+    samples = struct.pack('<4h', 1, 2, 3, 4)
+    pipe = BytesLivePipe(wav_header([(b'LIST', b'odd'), fmt_chunk(2), (b'data', samples)]))
+    assert pipe._read_header() == 2
+    assert pipe._read(8) == samples
+
+@pytest.mark.parametrize('data, error', [
+    (wav_header([(b'data', b'')]), AssertionError),
+    (b'RIFF\0\0\0\0WAVE', EOFError),
+    (wav_header([fmt_chunk(1)])[:30], EOFError),
+    (wav_header([fmt_chunk(1)]).replace(b'WAVE', b'AVI '), AssertionError)])
+def test_read_header_invalid(data, error):
+    with pytest.raises(error):
+        BytesLivePipe(data)._read_header()
+
+def test_rolling_bips():
+    # bips do not depend on how the signal is split in blocks
+    signal = clock_signal(90, offset=7.)
+    detector = RollingDetector(window=90.)
+    bounds = np.cumsum(np.random.RandomState(0).randint(1, 5000, size=200))
+    for block in np.split(signal, bounds[bounds < len(signal)]):
+        detector.feed(block)
+    assert np.allclose(detector.bips(), wavdata2bip(signal))
+
+def test_rolling_status():
+    signal = np.concatenate((noise_signal(80), clock_signal(150, offset=5.),
+                             noise_signal(120, seed=3)))
+    detector = RollingDetector(window=60.)
+    changes = []
+    for i in range(0, len(signal), 4000):
+        detector.feed(signal[i:(i + 4000)])
+        status = detector.status()
+        if not changes or changes[-1][1] != status:
+            changes.append(((i + 4000) // 4000, status))
+    assert [status for _, status in changes] == [None, False, True, False]
+    # verdicts once the window is full, then within a window of clock start and end
+    assert changes[1][0] == 60
+    assert 80 < changes[2][0] <= 80 + 60
+    assert 80 + 150 < changes[3][0] <= 80 + 150 + 60
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not found')
+def test_live_events(clock_media):
+    # media0: speaking clock on the second channel only
+    events = list(live_events(clock_media[0][0]))
+    assert [(e['track'], e['speaking_clock']) for e in events[:2]] == \
+        [('0', False), ('1', True)]
+    assert [e['time'] for e in events[:2]] == [60., 60.]
+    assert all(not e['speaking_clock'] for e in events[2:])
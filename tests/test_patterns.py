@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+""" Pattern tests of bip times and of frame energy ratios """
+
+import numpy as np
+import soundfile
+import pytest
+
+from speaking_clock_detection.detection import early_exit_detection
+from speaking_clock_detection.dsp import STEP_SEC, blockwise_frame_energies, wavdata2bip
+from speaking_clock_detection.patterns import (P_CLOCK, P_OTHER, MAX_GAP, CLOCK_SECONDS,
+                                               EpochFolding, folded_pattern,
+                                               sequential_folded_pattern, bip_sequential_llr,
+                                               sequential_bip_pattern, is_interval_pattern,
+                                               is_windowed_bip_pattern, window_interval_bounds,
+                                               windowed_interval_bounds)
+
+from conftest import clock_signal, noise_signal
+
+def clock_bips(dur):
+    """ bips detected in the 'dur' first seconds of a speaking clock """
+    return [bip for bip in wavdata2bip(clock_signal(120, offset=3.)) if bip < dur]
+
+def energy_ratio(signal):
+    """ energy ratios around 1000Hz of the frames of a signal """
+    energy_1000hz, energy_all = blockwise_frame_energies(signal)
+    return energy_1000hz / energy_all
+
+def metronome_signal(dur, samplerate=4000):
+    """ 'dur' seconds of 1kHz bips at every second, over a low level white noise """
+    ret = 0.01 * np.random.RandomState(0).randn(int(dur * samplerate))
+    t = np.arange(int(0.1 * samplerate)) / float(samplerate)
+    for sec in range(int(dur)):
+        ret[(sec * samplerate):(sec * samplerate + len(t))] += 0.5 * np.sin(2 * np.pi * 1000 * t)
+    return ret
+
+@pytest.mark.parametrize('signal, match', [
+    (clock_signal(70, offset=17.), True),
+    (clock_signal(40, offset=17.), True),
+    (clock_signal(70, offset=17.) + 0.8 * noise_signal(70), True),
+    (noise_signal(70), False),
+    (metronome_signal(70), False)])
+def test_folded_pattern(signal, match):
+    found, phase, score = folded_pattern(energy_ratio(signal), STEP_SEC)
+    assert found == match
+    if match:
+        assert abs(phase - 17.) <= STEP_SEC
+
+def test_folding_blocks():
+    # folding block by block, or separate windows at their start time
+    ratio = energy_ratio(clock_signal(150, offset=17.))
+    folding = EpochFolding(STEP_SEC)
+    folding.add(ratio)
+    blocks = EpochFolding(STEP_SEC)
+    for block in np.array_split(ratio, 7):
+        blocks.add(block)
+    np.testing.assert_allclose(blocks.scores(), folding.scores())
+    windows = EpochFolding(STEP_SEC)
+    for start in (0, 90):
+        first = int(round(start / STEP_SEC))
+        windows.add(ratio[first:(first + int(round(30 / STEP_SEC)))], start)
+    assert windows.phase_score()[0] == folding.phase_score()[0] == 16.992
+
+@pytest.mark.parametrize('signal, status', [
+    (clock_signal(40, offset=17.), True),
+    (noise_signal(30), None),
+    (noise_signal(70), False),
+    (metronome_signal(70), False)])
+def test_sequential_folded_pattern(signal, status):
+    folding = EpochFolding(STEP_SEC)
+    folding.add(energy_ratio(signal))
+    assert folding.complete() == (len(signal) > 60 * 4000)
+    assert sequential_folded_pattern(folding) is status
+
+def test_bip_sequential_llr():
+    valid, invalid = np.log(P_CLOCK / P_OTHER), np.log((1 - P_CLOCK) / (1 - P_OTHER))
+    # each MAX_GAP seconds without bip is an invalid interval
+    assert bip_sequential_llr([], 3.5 * MAX_GAP) == pytest.approx(3 * invalid)
+    assert bip_sequential_llr([5., 6., 7.], 10.) == pytest.approx(2 * valid)
+    assert bip_sequential_llr([5., 8., 9.], 10.) == pytest.approx(valid + invalid)
+    # evidence accumulates with the duration of a speaking clock
+    llrs = [bip_sequential_llr(clock_bips(dur), dur) for dur in (10, 30, 60, 120)]
+    assert 0 < llrs[0] < llrs[1] < llrs[2] < llrs[3]
+    random_bips = np.sort(np.random.RandomState(0).uniform(0, 120, 30))
+    assert bip_sequential_llr(random_bips, 120.) < 0
+
+@pytest.mark.parametrize('bips, dur, decision', [
+    (clock_bips(30), 30., None),
+    (clock_bips(120), 120., True),
+    ([], 60., None),
+    ([], 100., False),
+    (np.sort(np.random.RandomState(0).uniform(0, 120, 30)), 120., False)])
+def test_sequential_bip_pattern(bips, dur, decision):
+    assert sequential_bip_pattern(bips, dur) is decision
+
+@pytest.mark.parametrize('channels, verdict', [
+    ((noise_signal(300), clock_signal(300, offset=3.)), 1),
+    ((noise_signal(300), noise_signal(300, seed=2)), -1)])
+def test_early_exit_detection(tmp_path, channels, verdict):
+    # decoding stops once every channel is decided, with or without a clock
+    path = str(tmp_path / 'media.wav')
+    soundfile.write(path, np.stack(channels, axis=1), 4000, subtype='PCM_16')
+    found, duration = early_exit_detection(path, decoder='soundfile')
+    assert found == verdict
+    assert duration < 300.
+
+@pytest.mark.parametrize('dur, bounds', [
+    (5., (0, 3)), (30., (1, 5)), (45., (2, 7)), (60., (7, 7)), (90., (9, 13)), (180., (23, 23))])
+def test_window_interval_bounds(dur, bounds):
+    assert window_interval_bounds(dur) == bounds
+    # intervals of the ideal pattern in windows starting every 10ms of the minute
+    bips = np.r_[[minute * 60. + np.array(CLOCK_SECONDS) for minute in range(5)]].ravel()
+    counts = [max(np.sum((bips >= start) & (bips < start + dur)) - 1, 0)
+              for start in np.arange(0, 60, 0.01)]
+    assert (min(counts), max(counts)) == bounds
+
+def test_windowed_bip_pattern():
+    # 3 windows of 30 seconds hold fewer intervals than 8 per minute
+    signal = clock_signal(300, offset=3.)
+    bip_lists = [wavdata2bip(signal[(start * 4000):((start + 30) * 4000)])
+                 for start in (0, 135, 270)]
+    dbip = np.concatenate([np.int32(np.round(np.diff(bips))) for bips in bip_lists])
+    assert windowed_interval_bounds([30.] * 3) == (3, 15)
+    assert is_windowed_bip_pattern(bip_lists, [30.] * 3)
+    assert not is_interval_pattern(dbip, 90., 2)
+    random_bips = [np.sort(np.random.RandomState(i).uniform(0, 30, 4)) for i in range(3)]
+    assert not is_windowed_bip_pattern(random_bips, [30.] * 3)
+    assert not is_windowed_bip_pattern([[], [], []], [30.] * 3)
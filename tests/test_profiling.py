@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+#
+""" Profiles of the processing stages of detection """
+
+import sys
+import pytest
+
+from speaking_clock_detection import profiling
+from speaking_clock_detection.detection import detect
+
+@pytest.fixture
+def resets(monkeypatch):
+    """ calls to the reset of the peak resident set size of the process """
+    calls = []
+    def reset_peak_rss():
+        calls.append(True)
+        return True
+    monkeypatch.setattr(profiling, '_reset_peak_rss', reset_peak_rss)
+    return calls
+
+def test_profile(clock_media, resets):
+    # the peak of the process is only reset on request
+    profile = detect(clock_media[0][0], decoder='soundfile', profile=True).profile
+    assert not resets
+    assert set(profile['stages']) <= set(profiling.STAGES)
+    assert {'decode', 'spectrogram', 'pattern'} <= set(profile['stages'])
+    assert all(stage['peak_rss'] is None and stage['peak_memory'] > 0
+               for stage in profile['stages'].values())
+    if sys.platform.startswith('linux'):
+        assert profile['max_rss'] > 0
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='Linux only')
+def test_profile_rss(clock_media, resets):
+    profile = detect(clock_media[0][0], decoder='soundfile', profile='rss').profile
+    assert len(resets) == 1 + sum(stage['calls'] for stage in profile['stages'].values())
+    assert all(stage['peak_rss'] > 0 for stage in profile['stages'].values())
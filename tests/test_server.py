@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+""" Detection server requests, over TCP and Unix domain sockets """
+
+import json
+import threading
+import http.client
+import pytest
+
+from speaking_clock_detection.server import (DetectionService, DetectionHTTPServer,
+                                             UnixDetectionHTTPServer, UnixHTTPConnection, serve,
+                                             remote_detect)
+
+@pytest.fixture(params=['tcp', 'unix'])
+def server(request, tmp_path):
+    """ detection server of 1 worker and 1 queued job, served by a thread """
+    service = DetectionService(jobs=1, queue_depth=1, options={'decoder': 'soundfile'})
+    if request.param == 'tcp':
+        server = DetectionHTTPServer(('127.0.0.1', 0), service)
+    else:
+        server = UnixDetectionHTTPServer(str(tmp_path / 'server.sock'), service)
+    thread = threading.Thread(target=serve, args=(server,))
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+
+def test_detect(server, clock_media):
+    for media, label in clock_media:
+        status, ret = remote_detect(media, server.server_address)
+        assert status == 200
+        assert ret['media'] == media
+        assert ret['error'] is None
+        assert ret['speaking_clock'] == label
+    status, ret = remote_detect(clock_media[0][0], server.server_address, tracks='0:0')
+    assert status == 200
+    assert ret['verdict'] == 'SPEAKING_CLOCK_NONE'
+    status, ret = remote_detect('missing.wav', server.server_address)
+    assert status == 200
+    assert ret['verdict'] is None and ret['error']
+
+@pytest.mark.parametrize('options', [{'threshold': 0.5}, {'tracks': 'a:b'}])
+def test_bad_request(server, clock_media, options):
+    status, ret = remote_detect(clock_media[0][0], server.server_address, **options)
+    assert status == 400
+    assert ret['error'].startswith('bad request')
+
+def test_queue_full(server, clock_media):
+    # jobs being processed or queued hold all the slots of the service
+    service = server.service
+    for _ in range(service.jobs + service.queue_depth):
+        assert service.slots.acquire(blocking=False)
+    status, ret = remote_detect(clock_media[0][0], server.server_address)
+    assert status == 503
+    assert ret['error'] == 'queue is full'
+    service.slots.release()
+    assert remote_detect(clock_media[0][0], server.server_address)[0] == 200
+
+def test_health(server):
+    address = server.server_address
+    if isinstance(address, tuple):
+        conn = http.client.HTTPConnection(*address)
+    else:
+        conn = UnixHTTPConnection(address)
+    try:
+        conn.request('GET', '/health')
+        response = conn.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read().decode('utf-8')) == {
+            'status': 'ok', 'jobs': 1, 'queue_depth': 1, 'pending': 0}
+        conn.request('GET', '/status')
+        response = conn.getresponse()
+        assert response.status == 404
+        response.read()
+    finally:
+        conn.close()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+#
+""" Streaming bip detection, compared to the detection on the whole signal """
+
+import numpy as np
+import pytest
+
+from speaking_clock_detection.dsp import StreamingBip, wavdata2bip
+
+from conftest import clock_signal
+
+def streaming_bips(data, blocksize, features='fft'):
+    """ bips found by a StreamingBip fed with blocks of 'blocksize' samples """
+    detector = StreamingBip(features)
+    for i in range(0, len(data), blocksize):
+        detector.feed(data[i:(i + blocksize)])
+    return detector.bips()
+
+@pytest.mark.parametrize('blocksize', [33, 127, 128, 400, 4001, 40000, 10 ** 6])
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_streaming_bip(blocksize, dtype):
+    data = clock_signal(70, offset=7.).astype(dtype)
+    ref = wavdata2bip(data)
+    assert len(ref) == 12
+    np.testing.assert_array_equal(streaming_bips(data, blocksize), ref)
+
+@pytest.mark.parametrize('blocksize', [127, 4001])
+@pytest.mark.parametrize('features', ['dft', 'gated', 'baseband'])
+def test_streaming_bip_features(blocksize, features):
+    data = clock_signal(70, offset=7.)
+    np.testing.assert_array_equal(streaming_bips(data, blocksize, features),
+                                  wavdata2bip(data, features))
+
+def test_streaming_bip_long_candidates():
+    # 1kHz tone longer than a bip, ending in another block
+    data = clock_signal(70, offset=7.)
+    data[10000:12000] += 0.5 * np.sin(2 * np.pi * 1000 * np.arange(2000) / 4000.)
+    for blocksize in (50, 500, 5000):
+        np.testing.assert_array_equal(streaming_bips(data, blocksize), wavdata2bip(data))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+""" threshold_sweep decisions, compared to those of MediaFeatures.detect """
+
+import itertools
+
+from speaking_clock_detection.decode import track_labels
+from speaking_clock_detection.dsp import RATIO_THR, MIN_DUR, MAX_DUR, ENERGY_THR
+from speaking_clock_detection.patterns import TOLERANCE, SHORT_TOLERANCE
+from speaking_clock_detection.patterns import channel_verdict
+from speaking_clock_detection.features import FeatureStore
+from speaking_clock_detection.sweep import OUTCOMES, load_corpus, threshold_sweep
+
+def test_sweep_load_corpus_generator(clock_media, tmp_path):
+    corpus = load_corpus(clock_media, str(tmp_path / 'features'), decoder='soundfile')
+    results = threshold_sweep(corpus)
+    assert len(results) == 1
+    assert results[0]['correct'] == len(clock_media)
+    assert results[0]['accuracy'] == 1.
+    # default grid point: thresholds of the detector
+    assert (results[0]['ratio_thr'], results[0]['min_dur'], results[0]['max_dur'],
+            results[0]['energy_thr'], results[0]['tolerance'], results[0]['short_tolerance']) == \
+        (RATIO_THR, MIN_DUR, MAX_DUR, ENERGY_THR, TOLERANCE, SHORT_TOLERANCE)
+
+def test_sweep_matches_detect(clock_media, tmp_path):
+    features_dir = str(tmp_path / 'features')
+    grid = dict(ratio_thrs=(0.3, 0.5, 0.7), min_durs=(0.05, 0.08), max_durs=(0.12, 0.16, 0.3),
+                energy_thrs=(0.2, 0.6), tolerances=((0.8, 1.2), (0.95, 1.05)),
+                short_tolerances=((0.3, 1.5), (0.9, 1.1)))
+    results = threshold_sweep(list(load_corpus(clock_media, features_dir, grid['ratio_thrs'],
+                                               decoder='soundfile')), **grid)
+    assert len(results) == 3 * 2 * 3 * 2 * 2 * 2
+
+    store = FeatureStore(features_dir)
+    features = [(store.get(media, decoder='soundfile'), label) for media, label in clock_media]
+    for result, thresholds in zip(results, itertools.product(*grid.values())):
+        ratio_thr, min_dur, max_dur, energy_thr, tolerance, short_tolerance = thresholds
+        assert (result['ratio_thr'], result['min_dur'], result['max_dur'], result['energy_thr'],
+                result['tolerance'], result['short_tolerance']) == thresholds
+        counts = dict.fromkeys(OUTCOMES, 0)
+        for media_features, label in features:
+            verdict = channel_verdict(media_features.detect(
+                ratio_thr, min_dur, max_dur, energy_thr, tolerance, short_tolerance).matches)
+            expected = track_labels(media_features.tracks).index(label) if label else -1
+            if verdict == expected:
+                counts['correct'] += 1
+            elif verdict == -2:
+                counts['multiple'] += 1
+            elif verdict == -1:
+                counts['missed'] += 1
+            elif expected == -1:
+                counts['false_alarm'] += 1
+            else:
+                counts['wrong_track'] += 1
+        assert {name: result[name] for name in OUTCOMES} == counts